@@ -1,17 +1,38 @@
 from cursor.path import Path
 from cursor.path import PathCollection
 from cursor.path import TimedPosition
+from cursor.path import PackedPathCollection
 
 import pathlib
+import os
+import hashlib
+import tempfile
+import time
 import json
 import base64
 import zlib
 import pyautogui
 import datetime
 import pytz
+import typing
+import numpy as np
+import wasabi
+
+log = wasabi.Printer()
 
 
 class MyJsonEncoder(json.JSONEncoder):
+    @staticmethod
+    def _num(v: float, digits: int) -> typing.Union[int, float]:
+        """
+        vertices are stored as floats, write whole numbers as ints
+        to keep the files as small as before
+        """
+        v = round(v, digits)
+        if v.is_integer():
+            return int(v)
+        return v
+
     def default(self, o):
         if isinstance(o, PathCollection):
             return {
@@ -20,10 +41,17 @@ class MyJsonEncoder(json.JSONEncoder):
             }
 
         if isinstance(o, Path):
-            return o.vertices
+            return [
+                {"x": self._num(x, 4), "y": self._num(y, 4), "ts": self._num(t, 2)}
+                for x, y, t in o.coords.tolist()
+            ]
 
         if isinstance(o, TimedPosition):
-            return {"x": round(o.x, 4), "y": round(o.y, 4), "ts": round(o.timestamp, 2)}
+            return {
+                "x": self._num(float(o.x), 4),
+                "y": self._num(float(o.y), 4),
+                "ts": self._num(float(o.timestamp), 2),
+            }
 
 
 class MyJsonDecoder(json.JSONDecoder):
@@ -89,6 +117,340 @@ class JsonCompressor:
         return decompressed
 
 
+class BinaryRecording:
+    """
+    columnar on-disk format for recordings. one json header line, padded
+    to ALIGN bytes, followed by the raw little-endian arrays:
+
+        coords  (points, 3) float64  x, y, timestamp of all paths
+        offsets (paths + 1) int64    path n is coords[offsets[n]:offsets[n + 1]]
+
+    keys are stored in the header. the paths are stored cleaned already,
+    see Loader.load_all. reading memory-maps the file copy-on-write, the
+    paths of the returned collection are views into the map
+    """
+
+    FORMAT = "cursor-recording"
+    VERSION = 1
+    SUFFIX = ".rec"
+    ALIGN = 64
+
+    def to_bytes(self, recs: dict) -> bytes:
+        packed = PackedPathCollection.from_paths(
+            recs["mouse"], timestamp=recs["mouse"].timestamp()
+        )
+        coords, offsets = packed.arrays()
+        coords = coords.astype("<f8", copy=False)
+        offsets = offsets.astype("<i8", copy=False)
+
+        header = {
+            "format": self.FORMAT,
+            "version": self.VERSION,
+            "timestamp": packed.timestamp(),
+            "paths": len(packed),
+            "points": coords.shape[0],
+            "keys": [list(k) for k in recs["keys"]],
+            "resolution": recs.get("resolution"),
+        }
+        line = json.dumps(header).encode("utf-8")
+        padding = -(len(line) + 1) % self.ALIGN
+        line += b" " * padding + b"\n"
+
+        return line + coords.tobytes() + offsets.tobytes()
+
+    def write(self, fname: pathlib.Path, recs: dict) -> None:
+        with open(fname.as_posix(), "wb") as fp:
+            fp.write(self.to_bytes(recs))
+
+    def __parse_header(self, line: bytes, name: str) -> dict:
+        try:
+            header = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise RuntimeError(f"{name} is not a binary recording")
+
+        if header.get("format") != self.FORMAT:
+            raise RuntimeError(f"{name} is not a binary recording")
+        if header["version"] > self.VERSION:
+            raise RuntimeError(
+                f"{name} has version {header['version']}, "
+                f"only {self.VERSION} is supported"
+            )
+
+        return header
+
+    def header(self, fname: pathlib.Path) -> typing.Tuple[dict, int]:
+        """
+        :return: the header and the byte offset of the coordinates
+        """
+        with open(fname.as_posix(), "rb") as fp:
+            line = fp.readline()
+
+        return self.__parse_header(line, fname.as_posix()), len(line)
+
+    def from_bytes(self, buffer: bytes) -> dict:
+        """
+        reads a recording from memory, the counterpart of to_bytes()
+        """
+        start = buffer.index(b"\n") + 1
+        header = self.__parse_header(buffer[:start], "buffer")
+        points = header["points"]
+
+        coords = np.frombuffer(buffer, dtype="<f8", count=points * 3, offset=start)
+        offsets = np.frombuffer(
+            buffer, dtype="<i8", count=header["paths"] + 1, offset=start + points * 24
+        )
+
+        packed = PackedPathCollection(
+            coords.reshape(points, 3).copy(), offsets, timestamp=header["timestamp"]
+        )
+        return {
+            "mouse": packed.unpack(),
+            "keys": [tuple(k) for k in header["keys"]],
+            "resolution": header.get("resolution"),
+        }
+
+    def read(self, fname: pathlib.Path) -> dict:
+        header, start = self.header(fname)
+        points = header["points"]
+
+        if points > 0:
+            coords = np.memmap(
+                fname, dtype="<f8", mode="c", offset=start, shape=(points, 3)
+            )
+        else:
+            coords = np.empty((0, 3), dtype=np.float64)
+        offsets = np.fromfile(
+            fname.as_posix(),
+            dtype="<i8",
+            count=header["paths"] + 1,
+            offset=start + points * 3 * 8,
+        )
+
+        packed = PackedPathCollection(coords, offsets, timestamp=header["timestamp"])
+        return {
+            "mouse": packed.unpack(),
+            "keys": [tuple(k) for k in header["keys"]],
+            "resolution": header.get("resolution"),
+        }
+
+
+class SegmentedRecording:
+    """
+    append-only log of a recording in progress. every append() adds one
+    zlib compressed chunk (a BinaryRecording in memory, prefixed with its
+    uint64 length) holding only what was recorded since the previous one.
+    a chunk that was cut off by a crash is ignored when reading.
+    compact() merges all chunks into a BinaryRecording
+    """
+
+    SUFFIX = ".seg"
+
+    def __init__(self, fname: pathlib.Path):
+        self.fname = fname
+
+    def append(
+        self,
+        paths: typing.List[Path],
+        keys: typing.List[tuple],
+        timestamp: float,
+        resolution: typing.Optional[list] = None,
+    ) -> None:
+        pc = PathCollection(timestamp)
+        for p in paths:
+            pc.add(p)
+        recs = {"mouse": pc, "keys": keys, "resolution": resolution}
+        chunk = zlib.compress(BinaryRecording().to_bytes(recs))
+
+        with open(self.fname.as_posix(), "ab") as fp:
+            fp.write(np.uint64(len(chunk)).astype("<u8").tobytes() + chunk)
+
+    def chunks(self) -> typing.Iterator[dict]:
+        with open(self.fname.as_posix(), "rb") as fp:
+            content = fp.read()
+
+        position = 0
+        while position + 8 <= len(content):
+            size = int(np.frombuffer(content, dtype="<u8", count=1, offset=position)[0])
+            position += 8
+            if position + size > len(content):
+                break
+            end = position + size
+            try:
+                chunk = zlib.decompress(content[position:end])
+            except zlib.error:
+                break
+            position = end
+            yield BinaryRecording().from_bytes(chunk)
+
+    def read(self) -> dict:
+        """
+        :return: all chunks merged into one recording
+        """
+        mouse = None
+        keys = []
+        resolution = None
+        for chunk in self.chunks():
+            if mouse is None:
+                mouse = chunk["mouse"]
+            else:
+                mouse.extend(chunk["mouse"])
+            keys.extend(chunk["keys"])
+            resolution = chunk["resolution"] or resolution
+
+        if mouse is None:
+            mouse = PathCollection()
+        return {"mouse": mouse, "keys": keys, "resolution": resolution}
+
+    def compact(self, target: pathlib.Path = None) -> pathlib.Path:
+        """
+        merges the chunks into a cleaned BinaryRecording next to the
+        log (or at target) and removes the log. a target that exists
+        already is kept and the chunks are appended to it
+        """
+        if target is None:
+            target = self.fname.with_suffix(BinaryRecording.SUFFIX)
+
+        recs = self.read()
+        if target.is_file():
+            # read into memory, windows can't replace a file that is mapped
+            with open(target.as_posix(), "rb") as fp:
+                existing = BinaryRecording().from_bytes(fp.read())
+            existing["mouse"].extend(recs["mouse"])
+            existing["keys"].extend(recs["keys"])
+            existing["resolution"] = recs["resolution"] or existing["resolution"]
+            recs = existing
+        recs["mouse"].clean()
+
+        fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+        os.close(fd)
+        BinaryRecording().write(pathlib.Path(tmp), recs)
+        os.replace(tmp, target)
+        self.fname.unlink()
+
+        log.good(f"Compacted {self.fname.name} > {target.name}")
+        return target
+
+
+class RecordingCache:
+    """
+    on-disk cache of decoded and cleaned json recordings, stored as
+    BinaryRecording files named after the content hash of the json file.
+    the index maps every source file to its mtime, size and content hash,
+    so unchanged files don't even have to be hashed again. the least
+    recently used entries are evicted as soon as all entries together
+    are bigger than max_bytes
+    """
+
+    INDEX = "index.json"
+
+    def __init__(self, directory: pathlib.Path = None, max_bytes: int = 2 * 1024**3):
+        self.directory = DataDirHandler().cache() if directory is None else directory
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.__index = self.__load_index()
+
+    def __load_index(self) -> dict:
+        try:
+            with open((self.directory / self.INDEX).as_posix()) as fp:
+                return json.load(fp)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def __save_index(self) -> None:
+        # write and rename, other processes never see half an index
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as fp:
+            json.dump(self.__index, fp)
+        os.replace(tmp, self.directory / self.INDEX)
+
+    @staticmethod
+    def __content_hash(fname: pathlib.Path) -> str:
+        h = hashlib.sha1()
+        with open(fname.as_posix(), "rb") as fp:
+            for chunk in iter(lambda: fp.read(1 << 20), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def entry(self, fname: pathlib.Path) -> pathlib.Path:
+        """
+        :return: where the cached version of fname is (or would be) stored
+        """
+        key = fname.resolve().as_posix()
+        stat = fname.stat()
+        known = self.__index.get(key)
+        if known is None or known[:2] != [stat.st_mtime_ns, stat.st_size]:
+            known = [stat.st_mtime_ns, stat.st_size, self.__content_hash(fname)]
+            self.__index[key] = known
+            self.__save_index()
+
+        return self.directory / (known[2] + BinaryRecording.SUFFIX)
+
+    def get(self, fname: pathlib.Path) -> typing.Optional[pathlib.Path]:
+        """
+        :return: the cached binary recording of fname, None if there is none
+        """
+        cached = self.entry(fname)
+        if not cached.is_file():
+            return None
+
+        # the mtime of an entry is its last use, see evict()
+        os.utime(cached)
+        return cached
+
+    def put(self, fname: pathlib.Path, recs: dict) -> pathlib.Path:
+        cached = self.entry(fname)
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        BinaryRecording().write(pathlib.Path(tmp), recs)
+        try:
+            os.replace(tmp, cached)
+        except PermissionError:
+            # windows refuses to replace an entry some recording still maps,
+            # that one was made from the same content and stays
+            os.remove(tmp)
+            log.warn(f"{self.__class__.__name__}: {cached.name} is in use, kept it")
+
+        self.evict()
+        return cached
+
+    def size(self) -> int:
+        return sum(f.stat().st_size for f in self.__entries())
+
+    def __entries(self) -> typing.List[pathlib.Path]:
+        return [
+            f
+            for f in self.directory.iterdir()
+            if f.is_file() and f.suffix == BinaryRecording.SUFFIX
+        ]
+
+    def evict(self) -> None:
+        """
+        deletes the least recently used entries until the cache fits
+        into max_bytes
+        """
+        entries = [(f.stat(), f) for f in self.__entries()]
+        entries.sort(key=lambda e: e[0].st_mtime_ns)
+        total = sum(st.st_size for st, _ in entries)
+
+        removed = 0
+        for st, f in entries:
+            if total <= self.max_bytes:
+                break
+            f.unlink()
+            total -= st.st_size
+            removed += 1
+
+        if removed > 0:
+            log.info(f"{self.__class__.__name__}: evicted {removed} recordings")
+
+    def clear(self) -> None:
+        for f in self.__entries():
+            f.unlink()
+        self.__index = {}
+        self.__save_index()
+
+
 class DateHandler:
     @staticmethod
     def utc_timestamp() -> float:
@@ -102,6 +464,21 @@ class DateHandler:
         return dt.strftime("%d/%m/%y %H:%M:%S.%f")
 
 
+class UtcClock:
+    """
+    utc timestamps from the monotonic clock, offset against a single utc
+    anchor taken on construction. a lot cheaper than utc_timestamp() and
+    never jumps, e.g. when the system clock is adjusted while recording
+    """
+
+    def __init__(self):
+        self._anchor = DateHandler.utc_timestamp()
+        self._monotonic = time.monotonic()
+
+    def now(self) -> float:
+        return self._anchor + (time.monotonic() - self._monotonic)
+
+
 class DataDirHandler:
     def __init__(self):
         self.BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
@@ -147,6 +524,9 @@ class DataDirHandler:
     def recordings(self) -> pathlib.Path:
         return self.data_dir / "recordings"
 
+    def cache(self) -> pathlib.Path:
+        return self.data_dir / "cache"
+
     def test_images(self) -> pathlib.Path:
         return self.test_data_dir / "jpg"
 
@@ -296,12 +296,14 @@ class Exporter:
             log.fail("Config, Name or Paths is None. Not exporting anything")
             return
 
-        # jpeg fitting roughly
-        self.paths.fit(
-            Paper.sizes[self.cfg.dimension],
-            padding_mm=self.cfg.margin,
-            cutoff_mm=self.cfg.cutoff,
-        )
+        if jpg:
+            # jpeg fitting roughly, the machine fit below
+            # overrides this, so only do it for the preview
+            self.paths.fit(
+                Paper.sizes[self.cfg.dimension],
+                padding_mm=self.cfg.margin,
+                cutoff_mm=self.cfg.cutoff,
+            )
 
         stack = inspect.stack()
         frame = stack[2]
@@ -353,7 +355,7 @@ class Exporter:
         if self.linetype_mapping and format is ExportFormat.HPGL:
             hpgl_folder = data.DataDirHandler().hpgl(self.name)
             hpgl_renderer = renderer.HPGLRenderer(
-                hpgl_folder, line_type_mapping=self.linetype_mapping
+                hpgl_folder, line_type_mapping=self.linetype_mapping, compact=True
             )
             hpgl_renderer.render(self.paths)
             hpgl_renderer.save(f"{fname}")
@@ -362,7 +364,7 @@ class Exporter:
                 hpgl_folder = data.DataDirHandler().hpgl(self.name)
 
                 hpgl_renderer = renderer.HPGLRenderer(
-                    hpgl_folder, layer_pen_mapping=self.layer_pen_mapping
+                    hpgl_folder, layer_pen_mapping=self.layer_pen_mapping, compact=True
                 )
                 hpgl_renderer.render(self.paths)
                 hpgl_renderer.save(f"{fname}")
@@ -371,7 +373,7 @@ class Exporter:
             for layer, pc in separate_layers.items():
                 if format is ExportFormat.HPGL:
                     hpgl_folder = data.DataDirHandler().hpgl(self.name)
-                    hpgl_renderer = renderer.HPGLRenderer(hpgl_folder)
+                    hpgl_renderer = renderer.HPGLRenderer(hpgl_folder, compact=True)
                     hpgl_renderer.render(pc)
                     hpgl_renderer.save(f"{fname}_{layer}")
 
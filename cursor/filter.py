@@ -5,6 +5,8 @@ import time
 import copy
 import typing
 
+import numpy as np
+
 log = wasabi.Printer()
 
 
@@ -18,6 +20,18 @@ class Sorter:
     PEN_SELECT = 7
     POINT_COUNT = 8
 
+    # metric table column for each param, see PathCollection.metrics
+    COLUMNS = {
+        SHANNON_X: "shannon_x",
+        SHANNON_Y: "shannon_y",
+        SHANNON_DIRECTION_CHANGES: "shannon_direction_changes",
+        DISTANCE: "distance",
+        HASH: None,
+        LAYER: "layer",
+        PEN_SELECT: "pen_select",
+        POINT_COUNT: "count",
+    }
+
     def __init__(self, reverse=False, param=SHANNON_X):
         self.__reverse = reverse
         self.__param = param
@@ -30,9 +44,31 @@ class Sorter:
     def param(self, v):
         self.__param = v
 
-    def sort(self, paths: typing.List):
+    @property
+    def column(self) -> typing.Optional[str]:
+        """
+        metric table column this sorter sorts by, None if there is none
+        """
+        return self.COLUMNS.get(self.__param)
+
+    def order(self, metrics: np.ndarray) -> np.ndarray:
+        """
+        :return: indices that sort the rows of a metric table the way
+        sort() sorts the paths (stable, also when reversed)
+        """
+        values = metrics[self.column]
+        if not self.__reverse:
+            return np.argsort(values, kind="stable")
+
+        # like list.sort(reverse=True): equal values keep their order
+        last = len(values) - 1
+        return (last - np.argsort(values[::-1], kind="stable"))[::-1]
+
+    def sort(self, paths: typing.List, metrics: typing.Optional[np.ndarray] = None):
         t0 = time.time()
-        if self.__param is self.SHANNON_X:
+        if metrics is not None:
+            paths[:] = [paths[i] for i in self.order(metrics).tolist()]
+        elif self.__param is self.SHANNON_X:
             paths.sort(key=lambda x: x.shannon_x, reverse=self.__reverse)
         elif self.__param is self.SHANNON_Y:
             paths.sort(key=lambda x: x.shannon_y, reverse=self.__reverse)
@@ -57,9 +93,11 @@ class Sorter:
         elapsed = time.time() - t0
         log.good(f"Sorted via {__class__.__name__} took {round(elapsed * 1000)}ms.")
 
-    def sorted(self, paths: typing.List):
+    def sorted(self, paths: typing.List, metrics: typing.Optional[np.ndarray] = None):
         t0 = time.time()
-        if self.__param is self.SHANNON_X:
+        if metrics is not None:
+            sorted_list = [paths[i] for i in self.order(metrics).tolist()]
+        elif self.__param is self.SHANNON_X:
             sorted_list = sorted(
                 paths, key=lambda x: x.shannon_x, reverse=self.__reverse
             )
@@ -95,14 +133,45 @@ class Sorter:
 
 
 class Filter:
+    # metric table columns mask() needs, see PathCollection.metrics.
+    # filters that change the paths themselves leave this empty
+    columns: typing.Tuple[str, ...] = ()
+
     def filter(self, paths):
         raise NotImplementedError("Not implemented in base class")
 
     def filtered(self, paths):
         raise NotImplementedError("Not implemented in base class")
 
+    def mask(self, metrics: np.ndarray) -> np.ndarray:
+        """
+        :return: boolean mask of the metric table rows to keep
+        """
+        raise NotImplementedError("Not implemented in base class")
+
+    def filter_metrics(self, paths: typing.List, metrics: np.ndarray) -> None:
+        """
+        same as filter() but decides on a metric table with one row per path
+        """
+        t0 = time.time()
+        len_before = len(paths)
+
+        keep = self.mask(metrics).tolist()
+        paths[:] = [p for p, k in zip(paths, keep) if k]
+
+        len_after = len(paths)
+        elapsed = time.time() - t0
+        log.good(
+            f"Filtering via {self.__class__.__name__} took {round(elapsed * 1000)}ms."
+        )
+        log.good(
+            f"{self.__class__.__name__}: reduced path count from {len_before} to {len_after}"
+        )
+
 
 class EntropyMinFilter(Filter):
+    columns = ("shannon_x", "shannon_y")
+
     def __init__(self, min_x_entropy, min_y_entropy):
         self.min_x = min_x_entropy
         self.min_y = min_y_entropy
@@ -126,8 +195,13 @@ class EntropyMinFilter(Filter):
         self.filter(copied_paths)
         return copied_paths
 
+    def mask(self, metrics: np.ndarray) -> np.ndarray:
+        return (metrics["shannon_x"] > self.min_x) & (metrics["shannon_y"] > self.min_y)
+
 
 class EntropyMaxFilter(Filter):
+    columns = ("shannon_x", "shannon_y")
+
     def __init__(self, max_x_entropy, max_y_entropy):
         self.max_x = max_x_entropy
         self.max_y = max_y_entropy
@@ -152,8 +226,13 @@ class EntropyMaxFilter(Filter):
         self.filter(copied_paths)
         return copied_paths
 
+    def mask(self, metrics: np.ndarray) -> np.ndarray:
+        return (metrics["shannon_x"] < self.max_x) & (metrics["shannon_y"] < self.max_y)
+
 
 class DirectionChangeEntropyFilter(Filter):
+    columns = ("shannon_direction_changes",)
+
     def __init__(self, min_entropy, max_entropy):
         self.min = min_entropy
         self.max = max_entropy
@@ -178,16 +257,31 @@ class DirectionChangeEntropyFilter(Filter):
         self.filter(copied_paths)
         return copied_paths
 
+    def mask(self, metrics: np.ndarray) -> np.ndarray:
+        entropy = metrics["shannon_direction_changes"]
+        return (self.max > entropy) & (entropy > self.min)
+
 
 class BoundingBoxFilter(Filter):
+    columns = ("count", "minx", "miny", "maxx", "maxy")
+
     def __init__(self, bb):
         self.bb = bb
 
     def filter(self, paths):
         paths[:] = [p for p in paths if self.bb.inside(p)]
 
+    def mask(self, metrics: np.ndarray) -> np.ndarray:
+        bounds = np.column_stack(
+            (metrics["minx"], metrics["miny"], metrics["maxx"], metrics["maxy"])
+        )
+        # empty paths are inside of everything
+        return (metrics["count"] == 0) | self.bb.inside_bounds(bounds)
+
 
 class MinPointCountFilter(Filter):
+    columns = ("count",)
+
     def __init__(self, point_count):
         self.point_count = point_count
 
@@ -209,8 +303,13 @@ class MinPointCountFilter(Filter):
         self.filter(copied_paths)
         return copied_paths
 
+    def mask(self, metrics: np.ndarray) -> np.ndarray:
+        return metrics["count"] >= self.point_count
+
 
 class MaxPointCountFilter(Filter):
+    columns = ("count",)
+
     def __init__(self, point_count):
         self.point_count = point_count
 
@@ -227,8 +326,13 @@ class MaxPointCountFilter(Filter):
             f"{__class__.__name__}: reduced path count from {len_before} to {len_after}"
         )
 
+    def mask(self, metrics: np.ndarray) -> np.ndarray:
+        return metrics["count"] <= self.point_count
+
 
 class DistanceFilter(Filter):
+    columns = ("distance",)
+
     def __init__(self, max_distance):
         self.max_distance = max_distance
 
@@ -238,8 +342,13 @@ class DistanceFilter(Filter):
         len_after = len(paths)
         log.good(f"DistanceFilter: reduced path count from {len_before} to {len_after}")
 
+    def mask(self, metrics: np.ndarray) -> np.ndarray:
+        return metrics["distance"] <= self.max_distance
+
 
 class AspectRatioFilter(Filter):
+    columns = ("aspect_ratio",)
+
     def __init__(self, min_as, max_as=sys.maxsize):
         self.min_as = min_as
         self.max_as = max_as
@@ -252,8 +361,18 @@ class AspectRatioFilter(Filter):
             f"AspectRatioFilter: reduced path count from {len_before} to {len_after}"
         )
 
+    def mask(self, metrics: np.ndarray) -> np.ndarray:
+        return (self.min_as < metrics["aspect_ratio"]) & (
+            metrics["aspect_ratio"] < self.max_as
+        )
+
 
 class DistanceBetweenPointsFilter(Filter):
+    """
+    keeps every vertex whose distance to its predecessor is within
+    min_distance and max_distance. this changes the paths themselves
+    """
+
     def __init__(self, min_distance, max_distance):
         self.min_distance = min_distance
         self.max_distance = max_distance
@@ -262,14 +381,11 @@ class DistanceBetweenPointsFilter(Filter):
         len_before = len(paths)
 
         for pa in paths:
-            verts = []
-            for pi in range(len(pa) - 1):
-                p1 = pa[pi]
-                p2 = pa[pi + 1]
-                d = p1.distance(p2)
-                if self.min_distance <= d <= self.max_distance:
-                    verts.append(p2)
-            pa.vertices = verts
+            coords = pa.coords
+            deltas = np.diff(coords[:, :2], axis=0)
+            d = np.hypot(deltas[:, 0], deltas[:, 1])
+            keep = (self.min_distance <= d) & (d <= self.max_distance)
+            pa.vertices = coords[1:][keep]
             pa.clean()
 
         len_after = len(paths)
@@ -279,6 +395,8 @@ class DistanceBetweenPointsFilter(Filter):
 
 
 class MinTravelDistanceFilter(Filter):
+    columns = ("distance",)
+
     def __init__(self, min_distance):
         self.min_distance = min_distance
 
@@ -289,3 +407,30 @@ class MinTravelDistanceFilter(Filter):
         log.good(
             f"MinDistanceFilter: reduced path count from {len_before} to {len_after}"
         )
+
+    def mask(self, metrics: np.ndarray) -> np.ndarray:
+        return metrics["distance"] > self.min_distance
+
+
+class SimplifyFilter(Filter):
+    """
+    simplifies every path instead of dropping any, see Path.simplify
+    """
+
+    def __init__(self, tolerance, method="rdp"):
+        self.tolerance = tolerance
+        self.method = method
+
+    def filter(self, paths):
+        # cursor.path imports this module
+        from cursor.path import PathCollection
+
+        pc = PathCollection()
+        for p in paths:
+            pc.add(p)
+        pc.simplify(self.tolerance, self.method)
+
+    def filtered(self, paths):
+        copied_paths = copy.deepcopy(paths)
+        self.filter(copied_paths)
+        return copied_paths
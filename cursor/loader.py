@@ -1,12 +1,17 @@
 from cursor import data
 from cursor import path
+from cursor import filter as cursor_filter
 
 import json
+import os
+import datetime
+import tempfile
+import concurrent.futures
 import time
 import wasabi
 import typing
 import pathlib
-from functools import reduce
+import sys
 
 log = wasabi.Printer()
 
@@ -16,71 +21,325 @@ class Loader:
         self,
         directory: pathlib.Path = None,
         limit_files: typing.Union[int, list[str]] = None,
+        workers: typing.Optional[int] = 1,
+        cache: typing.Union[bool, data.RecordingCache] = True,
+        rebuild_cache: bool = False,
     ):
         self._recordings = []
         self._keyboard_recordings = []
 
         if directory is not None:
-            self.load_all(directory=directory, limit_files=limit_files)
+            self.load_all(
+                directory=directory,
+                limit_files=limit_files,
+                workers=workers,
+                cache=cache,
+                rebuild_cache=rebuild_cache,
+            )
 
     def load_all(
-        self, directory: pathlib.Path, limit_files: typing.Union[int, list[str]] = None
+        self,
+        directory: pathlib.Path,
+        limit_files: typing.Union[int, list[str]] = None,
+        workers: typing.Optional[int] = 1,
+        cache: typing.Union[bool, data.RecordingCache] = True,
+        rebuild_cache: bool = False,
     ) -> None:
+        """
+        loads all recordings of directory. with workers > 1 (None: one per
+        cpu) the json recordings are decoded and cleaned in a process pool,
+        the recordings keep the order of the serial loading.
+
+        decoded json recordings are kept in a data.RecordingCache (the
+        default one under data/cache if cache is True), unchanged files are
+        read from there on the next run. cache=False bypasses it,
+        rebuild_cache=True decodes everything again and replaces the entries
+        """
         start_benchmark = time.time()
 
+        all_json_files = self.files(directory, limit_files)
+
+        if cache is True:
+            cache = data.RecordingCache()
+
+        files = [directory / f for f in all_json_files]
+
+        # binary files to read instead of decoding the json
+        sources = {}
+        for f in files:
+            binary = self.__binary_source(f, cache, rebuild_cache)
+            if binary is not None:
+                sources[f] = binary
+        log.info(f"Found {len(sources)} of {len(files)} recordings in binary form")
+
+        json_files = [f for f in files if f not in sources]
+        if workers == 1:
+            decoded = {f: self.decode(f) for f in json_files}
+        else:
+            decoded = self.__decode_parallel(json_files, workers)
+
+        for f in files:
+            if f in decoded:
+                _data = decoded[f]
+                if cache and self.is_file_and_json(f):
+                    cache.put(f, _data)
+            else:
+                _data = data.BinaryRecording().read(sources[f])
+            self.__add(f, _data)
+
+        absolut_path_count = sum(len(pc) for pc in self._recordings)
+
+        elapsed = time.time() - start_benchmark
+        log.info(
+            f"Loaded {absolut_path_count} paths from {len(self._recordings)} recordings"
+        )
+        log.info(
+            f"Loaded {len(self._keyboard_recordings)} keys from {len(all_json_files)} recordings"
+        )
+        log.info(f"This took {round(elapsed * 1000)}ms.")
+
+    @classmethod
+    def files(
+        cls,
+        directory: pathlib.Path,
+        limit_files: typing.Union[int, list[str]] = None,
+    ) -> typing.List[pathlib.Path]:
+        """
+        :return: the recording files of directory load_all() would load
+        """
         all_json_files = [
-            f for f in directory.iterdir() if self.is_file_and_json(directory / f)
+            f for f in directory.iterdir() if cls.is_file_and_json(directory / f)
         ]
 
+        # binary recordings replace the json file or the segment log
+        # they were made from, segment logs replace json files
+        binary_files = [
+            f for f in directory.iterdir() if cls.is_file_and_binary(directory / f)
+        ]
+        converted = {f.stem for f in binary_files}
+        segmented_files = [
+            f
+            for f in directory.iterdir()
+            if cls.is_file_and_segmented(directory / f) and f.stem not in converted
+        ]
+        converted |= {f.stem for f in segmented_files}
+        all_json_files = (
+            [f for f in all_json_files if cls.stem(f) not in converted]
+            + segmented_files
+            + binary_files
+        )
+
         fin = []
         if limit_files and type(limit_files) is int:
             all_json_files = all_json_files[:limit_files]
         if limit_files and type(limit_files) is list:
+            # names with or without _compressed or a file suffix all select
+            # the recording, whatever format it is in by now
+            wanted = {cls.__wanted_stem(str(name)) for name in limit_files}
             for f in all_json_files:
-                st = f.stem
-                if st in limit_files:
+                if cls.stem(f) in wanted:
                     fin.append(f)
             # all_json_files = [k for k in all_json_files if k.stem in limit_files]
             all_json_files = fin
 
-        for file in all_json_files:
-            full_path = directory / file
-            self.load_file(full_path)
+        return all_json_files
 
-        absolut_path_count = sum(len(pc) for pc in self._recordings)
+    @staticmethod
+    def __wanted_stem(name: str) -> str:
+        # timestamps contain a dot, only strip the suffixes of recordings
+        for suffix in (
+            ".json",
+            data.BinaryRecording.SUFFIX,
+            data.SegmentedRecording.SUFFIX,
+        ):
+            if name.endswith(suffix):
+                name = name[: -len(suffix)]
+                break
+        return name.replace("_compressed", "")
 
-        for pc in self._recordings:
-            pc.clean()
+    @classmethod
+    def __binary_source(
+        cls,
+        fname: pathlib.Path,
+        cache: typing.Union[bool, data.RecordingCache],
+        rebuild_cache: bool,
+    ) -> typing.Optional[pathlib.Path]:
+        """
+        :return: the binary recording to read instead of decoding fname
+        """
+        if cls.is_file_and_binary(fname):
+            return fname
+        if cache and not rebuild_cache:
+            return cache.get(fname)
+        return None
 
-        elapsed = time.time() - start_benchmark
-        log.info(
-            f"Loaded {absolut_path_count} paths from {len(self._recordings)} recordings"
-        )
-        log.info(
-            f"Loaded {len(self._keyboard_recordings)} keys from {len(all_json_files)} recordings"
-        )
-        log.info(f"This took {round(elapsed * 1000)}ms.")
+    @classmethod
+    def read(
+        cls,
+        fname: pathlib.Path,
+        cache: typing.Union[bool, data.RecordingCache] = True,
+        rebuild_cache: bool = False,
+    ) -> dict:
+        """
+        :return: the cleaned recording of a single file, without adding it
+        to the loaded recordings
+        """
+        if cache is True:
+            cache = data.RecordingCache()
+
+        binary = cls.__binary_source(fname, cache, rebuild_cache)
+        if binary is not None:
+            return data.BinaryRecording().read(binary)
+
+        _data = cls.decode(fname)
+        # segment logs are still growing, caching them doesn't pay off
+        if cache and cls.is_file_and_json(fname):
+            cache.put(fname, _data)
+        return _data
+
+    @classmethod
+    def stream(
+        cls,
+        directory: pathlib.Path,
+        limit_files: typing.Union[int, list[str]] = None,
+        filters: typing.Sequence["cursor_filter.Filter"] = (),
+        cache: typing.Union[bool, data.RecordingCache] = True,
+        rebuild_cache: bool = False,
+    ) -> typing.Iterator[path.PathCollection]:
+        """
+        yields the cleaned recordings of directory one file at a time,
+        with filters already applied. only the current recording is in
+        memory, nothing is kept by the Loader
+        """
+        if cache is True:
+            cache = data.RecordingCache()
+
+        for f in cls.files(directory, limit_files):
+            pc = cls.read(directory / f, cache, rebuild_cache)["mouse"]
+            for pathfilter in filters:
+                pc.filter(pathfilter)
+            yield pc
+
+    @classmethod
+    def stream_paths(
+        cls,
+        directory: pathlib.Path,
+        limit_files: typing.Union[int, list[str]] = None,
+        filters: typing.Sequence["cursor_filter.Filter"] = (),
+        cache: typing.Union[bool, data.RecordingCache] = True,
+        rebuild_cache: bool = False,
+    ) -> typing.Iterator[path.Path]:
+        """
+        same as stream(), but yields the single paths
+        """
+        for pc in cls.stream(directory, limit_files, filters, cache, rebuild_cache):
+            yield from pc
+
+    @staticmethod
+    def stem(path: pathlib.Path) -> str:
+        """
+        :return: the start timestamp of a recording file, same for
+        the json and the binary version of a recording
+        """
+        return path.stem.replace("_compressed", "")
+
+    @classmethod
+    def decode(cls, fname: pathlib.Path) -> dict:
+        """
+        :return: the cleaned recording of a json file or segment log
+        """
+        if cls.is_file_and_segmented(fname):
+            recs = data.SegmentedRecording(fname).read()
+        else:
+            recs = cls.read_json(fname)
+        recs["mouse"].clean()
+        return recs
+
+    @staticmethod
+    def __decode_parallel(
+        files: typing.List[pathlib.Path], workers: typing.Optional[int]
+    ) -> typing.Dict[pathlib.Path, dict]:
+        if len(files) == 0:
+            return {}
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            payloads = pool.map(_decode_json, files)
+
+            decoded = {}
+            for f, payload in zip(files, payloads):
+                packed = path.PackedPathCollection(
+                    payload["coords"],
+                    payload["offsets"],
+                    timestamp=payload["timestamp"],
+                )
+                decoded[f] = {
+                    "mouse": packed.unpack(),
+                    "keys": payload["keys"],
+                    "resolution": payload["resolution"],
+                }
+        return decoded
+
+    def load_file(self, path: pathlib.Path) -> path.PathCollection:
+        if self.is_file_and_binary(path):
+            _data = data.BinaryRecording().read(path)
+        elif self.is_file_and_segmented(path):
+            _data = data.SegmentedRecording(path).read()
+        else:
+            _data = self.read_json(path)
+
+        self.__add(path, _data)
+        return _data["mouse"]
+
+    def __add(self, path: pathlib.Path, _data: dict) -> None:
+        ts = data.DateHandler.get_timestamp_from_utc(float(self.stem(path)))
+        log.info(f"Loaded {path.name} > {ts}")
 
-    def load_file(self, path: str) -> None:
-        _fn = path.stem.replace("_compressed", "")
-        ts = data.DateHandler.get_timestamp_from_utc(float(_fn))
-        log.info(f"Loading {path.stem}.json > {ts}")
+        new_keys = [tuple(keys) for keys in _data["keys"]]
+        self._recordings.append(_data["mouse"])
+        self._keyboard_recordings.extend(new_keys)
+        log.good(f"Loaded {len(self._recordings[-1])} paths")
+        log.good(f"Loaded {len(new_keys)} keys")
 
-        new_keys = []
+    @staticmethod
+    def read_json(path: pathlib.Path) -> dict:
         with open(path.as_posix()) as json_file:
             json_string = json_file.readline()
             try:
                 jd = eval(json_string)
-                _data = data.JsonCompressor().json_unzip(jd)
+                return data.JsonCompressor().json_unzip(jd)
             except RuntimeError:
-                _data = json.loads(json_string, cls=data.MyJsonDecoder)
-            self._recordings.append(_data["mouse"])
-            for keys in _data["keys"]:
-                new_keys.append(tuple(keys))
+                return json.loads(json_string, cls=data.MyJsonDecoder)
 
-        self._keyboard_recordings.extend(new_keys)
-        log.good(f"Loaded {len(self._recordings[-1])} paths")
-        log.good(f"Loaded {len(new_keys)} keys")
+    @classmethod
+    def convert(
+        cls, directory: pathlib.Path, target: pathlib.Path = None
+    ) -> typing.List[pathlib.Path]:
+        """
+        writes a binary recording for every json recording in directory
+        that doesn't have one yet
+        :return: the written files
+        """
+        start_benchmark = time.time()
+        target = directory if target is None else target
+        target.mkdir(parents=True, exist_ok=True)
+
+        written = []
+        for f in sorted(directory.iterdir()):
+            if not cls.is_file_and_json(f):
+                continue
+            fname = target / (cls.stem(f) + data.BinaryRecording.SUFFIX)
+            if fname.exists():
+                continue
+
+            recs = cls.read_json(f)
+            recs["mouse"].clean()
+            data.BinaryRecording().write(fname, recs)
+            written.append(fname)
+            log.good(f"Converted {f.name} > {fname.name}")
+
+        elapsed = time.time() - start_benchmark
+        log.info(f"Converted {len(written)} recordings in {round(elapsed * 1000)}ms.")
+        return written
 
     @staticmethod
     def is_file_and_json(path):
@@ -89,6 +348,21 @@ class Loader:
             return True
         return False
 
+    @staticmethod
+    def is_file_and_segmented(path):
+        assert isinstance(path, pathlib.Path), "Only path objects allowed"
+        suffix = data.SegmentedRecording.SUFFIX
+        if path.is_file() and path.as_posix().endswith(suffix):
+            return True
+        return False
+
+    @staticmethod
+    def is_file_and_binary(path):
+        assert isinstance(path, pathlib.Path), "Only path objects allowed"
+        if path.is_file() and path.as_posix().endswith(data.BinaryRecording.SUFFIX):
+            return True
+        return False
+
     def all_collections(self) -> list[path.PathCollection]:
         """
         :return: a copy of all recordings
@@ -99,7 +373,10 @@ class Loader:
         """
         :return: all paths combined into one path.PathCollection
         """
-        return reduce(lambda pcol1, pcol2: pcol1 + pcol2, self._recordings)
+        pc = path.PathCollection()
+        for recording in self._recordings:
+            pc.extend(recording)
+        return pc
 
     def single(self, index):
         max_index = len(self._recordings) - 1
@@ -113,3 +390,201 @@ class Loader:
 
     def __len__(self) -> int:
         return len(self._recordings)
+
+
+class Catalog:
+    """
+    index of the recordings of a directory with per recording metadata,
+    stored next to them in FILENAME. recordings only have to be opened
+    once, when they are new or changed, queries only read the index
+
+        catalog = Catalog(DataDirHandler().recordings())
+        catalog.update()
+        stems = catalog.query(
+            since=datetime.datetime(2021, 7, 1),
+            until=datetime.datetime(2021, 8, 1),
+            min_paths=5000,
+        )
+        ll = Loader(directory=catalog.directory, limit_files=stems)
+    """
+
+    FILENAME = "catalog.index"
+    # fields query() takes min_ and max_ limits for
+    NUMERIC = ("timestamp", "paths", "points", "keys", "distance", "duration")
+
+    def __init__(self, directory: pathlib.Path):
+        self.directory = directory
+        self.__entries = self.__load()
+
+    def __load(self) -> dict:
+        try:
+            with open((self.directory / self.FILENAME).as_posix()) as fp:
+                return json.load(fp)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def __save(self) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as fp:
+            json.dump(self.__entries, fp)
+        os.replace(tmp, self.directory / self.FILENAME)
+
+    @staticmethod
+    def describe(recording: dict, fname: pathlib.Path) -> dict:
+        """
+        :return: the catalog entry of a cleaned recording
+        """
+        pc = recording["mouse"]
+        stat = fname.stat()
+        entry = {
+            "file": fname.name,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "timestamp": float(Loader.stem(fname)),
+            "paths": len(pc),
+            "points": 0,
+            "keys": len(recording["keys"]),
+            "bbox": None,
+            "distance": 0.0,
+            "resolution": recording.get("resolution"),
+            "duration": 0.0,
+        }
+        if len(pc) == 0:
+            return entry
+
+        packed = pc.pack()
+        metrics = packed.metrics(["count", "distance"])
+        bb = packed.bb()
+        timestamps = packed.points()[:, 2]
+        entry["points"] = int(metrics["count"].sum())
+        entry["distance"] = float(metrics["distance"].sum())
+        entry["bbox"] = [bb.x, bb.y, bb.x2, bb.y2]
+        entry["duration"] = float(timestamps.max() - timestamps.min())
+        return entry
+
+    def update(
+        self, cache: typing.Union[bool, data.RecordingCache] = True
+    ) -> typing.Tuple[int, int]:
+        """
+        adds new and changed recordings, drops the ones that are gone
+        :return: number of (updated, removed) entries
+        """
+        start_benchmark = time.time()
+
+        if cache is True:
+            cache = data.RecordingCache()
+
+        files = {Loader.stem(f): f for f in Loader.files(self.directory)}
+
+        updated = 0
+        for stem, f in files.items():
+            known = self.__entries.get(stem)
+            stat = f.stat()
+            if known is not None and known["file"] == f.name:
+                if [known["mtime_ns"], known["size"]] == [
+                    stat.st_mtime_ns,
+                    stat.st_size,
+                ]:
+                    continue
+
+            self.__entries[stem] = self.describe(Loader.read(f, cache), f)
+            updated += 1
+
+        removed = [stem for stem in self.__entries if stem not in files]
+        for stem in removed:
+            del self.__entries[stem]
+
+        if updated or removed:
+            self.__save()
+
+        elapsed = time.time() - start_benchmark
+        log.info(
+            f"{self.__class__.__name__}: updated {updated} and removed {len(removed)} "
+            f"recordings in {round(elapsed * 1000)}ms."
+        )
+        return updated, len(removed)
+
+    def entries(self) -> typing.List[dict]:
+        """
+        :return: all entries, oldest recording first
+        """
+        return sorted(self.__entries.values(), key=lambda e: e["timestamp"])
+
+    def query(
+        self,
+        since: typing.Union[float, datetime.datetime] = None,
+        until: typing.Union[float, datetime.datetime] = None,
+        where: typing.Callable[[dict], bool] = None,
+        **bounds,
+    ) -> typing.List[str]:
+        """
+        selects recordings by their metadata. since and until limit the
+        start of the recording (until is exclusive), bounds are inclusive
+        min_<field>/max_<field> limits, e.g. min_paths=5000 or
+        max_duration=60, where is an arbitrary test of an entry.
+        :return: the stems of the matching recordings, oldest first.
+        they can be passed as limit_files to the Loader
+        """
+        if isinstance(since, datetime.datetime):
+            since = since.timestamp()
+        if isinstance(until, datetime.datetime):
+            until = until.timestamp()
+
+        limits = []
+        for key, value in bounds.items():
+            op, _, field = key.partition("_")
+            if op not in ("min", "max") or field not in self.NUMERIC:
+                raise ValueError(f"Unknown query {key}")
+            limits.append((op, field, value))
+
+        stems = []
+        for entry in self.entries():
+            ts = entry["timestamp"]
+            if since is not None and ts < since:
+                continue
+            if until is not None and ts >= until:
+                continue
+            if not all(
+                entry[field] >= value if op == "min" else entry[field] <= value
+                for op, field, value in limits
+            ):
+                continue
+            if where is not None and not where(entry):
+                continue
+            stems.append(Loader.stem(pathlib.Path(entry["file"])))
+
+        return stems
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+
+def _decode_json(fname: pathlib.Path) -> dict:
+    """
+    process pool worker, decodes and cleans one json recording or segment
+    log. only plain arrays are sent back, pickling them is a copy of their
+    buffers
+    """
+    recs = Loader.decode(fname)
+    pc = recs["mouse"]
+
+    coords, offsets = pc.pack().arrays()
+    return {
+        "timestamp": pc.timestamp(),
+        "coords": coords,
+        "offsets": offsets,
+        "keys": [tuple(k) for k in recs["keys"]],
+        "resolution": recs.get("resolution"),
+    }
+
+
+def main():
+    """
+    converts all json recordings to binary recordings,
+    usage: cursor_convert [directory]
+    """
+    if len(sys.argv) > 1:
+        directory = pathlib.Path(sys.argv[1])
+    else:
+        directory = data.DataDirHandler().recordings()
+    Loader.convert(directory)
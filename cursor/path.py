@@ -6,6 +6,7 @@ import datetime
 import pytz
 import random
 import hashlib
+import heapq
 import wasabi
 import copy
 import typing
@@ -17,7 +18,581 @@ from scipy import spatial
 log = wasabi.Printer()
 
 
+def _translation(x: float, y: float) -> np.ndarray:
+    return np.array([[1.0, 0.0, x], [0.0, 1.0, y], [0.0, 0.0, 1.0]])
+
+
+def _scaling(x: float, y: float) -> np.ndarray:
+    return np.array([[x, 0.0, 0.0], [0.0, y, 0.0], [0.0, 0.0, 1.0]])
+
+
+def _rotation(
+    angle: float, origin: typing.Tuple[float, float] = (0.0, 0.0)
+) -> np.ndarray:
+    ox, oy = origin
+    cos = math.cos(angle)
+    sin = math.sin(angle)
+    return np.array(
+        [
+            [cos, -sin, ox - cos * ox + sin * oy],
+            [sin, cos, oy - sin * ox - cos * oy],
+            [0.0, 0.0, 1.0],
+        ]
+    )
+
+
+def _apply_affine(xy: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    return xy @ matrix[:2, :2].T + matrix[:2, 2]
+
+
+def _affine_bounds(
+    bounds: typing.Tuple[float, float, float, float], matrix: np.ndarray
+) -> typing.Optional[typing.Tuple[float, float, float, float]]:
+    """
+    bounds (minx, miny, maxx, maxy) after applying matrix, as long as
+    the matrix doesn't rotate or shear. None otherwise
+    """
+    if matrix[0, 1] != 0.0 or matrix[1, 0] != 0.0:
+        return None
+
+    minx, miny, maxx, maxy = bounds
+    x1 = minx * matrix[0, 0] + matrix[0, 2]
+    x2 = maxx * matrix[0, 0] + matrix[0, 2]
+    y1 = miny * matrix[1, 1] + matrix[1, 2]
+    y2 = maxy * matrix[1, 1] + matrix[1, 2]
+    return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+
+def _segment_entropy(labels: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    shannon entropy (base e) of the label distribution of several segments
+    at once. labels holds the segments back to back, lengths their sizes.
+    segments with less than two labels or only one class get 0
+    """
+    count = lengths.shape[0]
+    entropy = np.zeros(count)
+    if labels.shape[0] == 0:
+        return entropy
+
+    segment = np.repeat(np.arange(count), lengths)
+    order = np.lexsort((labels, segment))
+    segment = segment[order]
+    labels = labels[order]
+
+    # every run of equal labels within a segment is one class
+    new_class = np.ones(labels.shape[0], dtype=bool)
+    new_class[1:] = (segment[1:] != segment[:-1]) | (labels[1:] != labels[:-1])
+    starts = np.flatnonzero(new_class)
+    counts = np.diff(np.append(starts, labels.shape[0]))
+    class_segment = segment[starts]
+
+    probs = counts / lengths[class_segment]
+    terms = probs * np.log(probs)
+
+    classes = np.bincount(class_segment, minlength=count)
+    nonempty = classes > 0
+    first_class = np.cumsum(classes) - classes
+    entropy[nonempty] = -np.add.reduceat(terms, first_class[nonempty])
+    entropy[(classes <= 1) | (lengths <= 1)] = 0.0
+    return entropy
+
+
+def _direction_changes(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    angles in degrees between the position vectors a[i] and b[i],
+    same as Path.angle_clockwise folded to 0..180
+    """
+    dp = a[:, 0] * b[:, 0] + a[:, 1] * b[:, 1]
+    ll = np.sqrt(a[:, 0] ** 2 + a[:, 1] ** 2) * np.sqrt(b[:, 0] ** 2 + b[:, 1] ** 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inner = np.degrees(np.arccos(np.clip(dp / ll, -1.0, 1.0)))
+    inner = np.where(ll == 0.0, 0.0, inner)
+
+    det = a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]
+    angle = np.where(det < 0, inner, 360 - inner)
+    angle = np.where(angle > 180, 360 - angle, angle)
+    return angle % 360
+
+
+def _rdp_mask(xy: np.ndarray, offsets: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    ramer-douglas-peucker for many polylines at once. xy holds the vertices
+    of all polylines back to back, offsets where each one starts. every
+    round splits all open segments at their farthest vertex, so the number
+    of rounds is the recursion depth and not the number of segments
+    :return: boolean mask of the vertices to keep
+    """
+    keep = np.zeros(xy.shape[0], dtype=bool)
+    lengths = np.diff(offsets)
+    nonempty = lengths > 0
+    keep[offsets[:-1][nonempty]] = True
+    keep[offsets[1:][nonempty] - 1] = True
+
+    long = lengths > 2
+    lo = offsets[:-1][long]
+    hi = offsets[1:][long] - 1
+
+    while lo.shape[0] > 0:
+        inner = hi - lo - 1
+        first = np.cumsum(inner) - inner
+        segment = np.repeat(np.arange(lo.shape[0]), inner)
+        rows = np.repeat(lo + 1 - first, inner) + np.arange(int(inner.sum()))
+
+        a = xy[lo][segment]
+        ab = xy[hi][segment] - a
+        ap = xy[rows] - a
+        norm = np.hypot(ab[:, 0], ab[:, 1])
+        cross = np.abs(ab[:, 0] * ap[:, 1] - ab[:, 1] * ap[:, 0])
+        # distance to the line, or to the point if both ends coincide
+        distance = np.where(
+            norm > 0,
+            cross / np.where(norm > 0, norm, 1.0),
+            np.hypot(ap[:, 0], ap[:, 1]),
+        )
+
+        farthest = np.maximum.reduceat(distance, first)
+        candidates = np.flatnonzero(distance == farthest[segment])
+        _, pick = np.unique(segment[candidates], return_index=True)
+        split = rows[candidates[pick]]
+
+        far = farthest > tolerance
+        lo, hi, split = lo[far], hi[far], split[far]
+        keep[split] = True
+
+        lo = np.concatenate((lo, split))
+        hi = np.concatenate((split, hi))
+        open_ = hi - lo > 1
+        lo, hi = lo[open_], hi[open_]
+
+    return keep
+
+
+def _visvalingam_mask(xy: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    visvalingam-whyatt for a single polyline. removes the vertex with the
+    smallest effective triangle area until all remaining ones span at
+    least tolerance squared
+    :return: boolean mask of the vertices to keep
+    """
+    n = xy.shape[0]
+    keep = np.ones(n, dtype=bool)
+    if n < 3:
+        return keep
+
+    points = xy.tolist()
+
+    def area(i: int, j: int, k: int) -> float:
+        (ax, ay), (bx, by), (cx, cy) = points[i], points[j], points[k]
+        return abs((bx - ax) * (cy - ay) - (cx - ax) * (by - ay)) / 2.0
+
+    prev = list(range(-1, n - 1))
+    nxt = list(range(1, n + 1))
+    areas = [math.inf] * n
+    for i in range(1, n - 1):
+        areas[i] = area(i - 1, i, i + 1)
+    heap = [(areas[i], i) for i in range(1, n - 1)]
+    heapq.heapify(heap)
+
+    threshold = tolerance * tolerance
+    while heap:
+        a, i = heapq.heappop(heap)
+        if not keep[i] or a != areas[i]:
+            continue
+        if a >= threshold:
+            break
+        keep[i] = False
+        p, q = prev[i], nxt[i]
+        nxt[p], prev[q] = q, p
+        for j in (p, q):
+            if 0 < j < n - 1:
+                # never below the area of the vertex just removed
+                areas[j] = max(area(prev[j], j, nxt[j]), a)
+                heapq.heappush(heap, (areas[j], j))
+
+    return keep
+
+
+def _simplify_mask(
+    xy: np.ndarray, offsets: np.ndarray, tolerance: float, method: str
+) -> np.ndarray:
+    if method == "rdp":
+        return _rdp_mask(xy, offsets, tolerance)
+    if method == "visvalingam":
+        keep = np.ones(xy.shape[0], dtype=bool)
+        for start, stop in zip(offsets[:-1].tolist(), offsets[1:].tolist()):
+            keep[start:stop] = _visvalingam_mask(xy[start:stop], tolerance)
+        return keep
+    raise ValueError(f"Unknown simplification method {method}")
+
+
+def _resample(
+    coords: np.ndarray,
+    offsets: np.ndarray,
+    spacing: typing.Optional[float] = None,
+    count: typing.Optional[int] = None,
+) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    places new vertices at equal arc length on many polylines at once,
+    either spacing apart (the last segment may be shorter) or count per
+    polyline. x, y and timestamp are interpolated linearly. all polylines
+    are laid out on one arc length axis with a gap between them, so a
+    single np.interp per column covers everything
+    :return: new coords and offsets
+    """
+    if (spacing is None) == (count is None):
+        raise ValueError("Pass either spacing or count")
+    if spacing is not None and spacing <= 0:
+        raise ValueError("spacing has to be positive")
+    if count is not None and count < 1:
+        raise ValueError("count has to be at least 1")
+
+    lengths = np.diff(offsets)
+    n = lengths.shape[0]
+    steps = np.zeros(coords.shape[0])
+    if coords.shape[0] > 1:
+        deltas = np.diff(coords[:, :2], axis=0)
+        steps[1:] = np.hypot(deltas[:, 0], deltas[:, 1])
+    # no step from the last vertex of one polyline to the next one
+    steps[offsets[:-1][lengths > 0]] = 0.0
+    arc = np.cumsum(steps)
+    nonempty = lengths > 0
+    path_start = np.zeros(n)
+    path_start[nonempty] = arc[offsets[:-1][nonempty]]
+    arc_length = np.zeros(n)
+    arc_length[nonempty] = arc[offsets[1:][nonempty] - 1] - path_start[nonempty]
+
+    if spacing is not None:
+        new_lengths = np.ceil(arc_length / spacing).astype(np.int64) + 1
+    else:
+        new_lengths = np.full(n, count, dtype=np.int64)
+    new_lengths[~nonempty] = 0
+
+    new_offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(new_lengths, out=new_offsets[1:])
+    total = int(new_offsets[-1])
+    owner = np.repeat(np.arange(n), new_lengths)
+    step = np.arange(total) - new_offsets[:-1][owner]
+
+    if spacing is not None:
+        local = np.minimum(step * spacing, arc_length[owner])
+    else:
+        local = step * (arc_length[owner] / max(count - 1, 1))
+
+    # shift every polyline past the previous one, arc length is monotonic
+    gap = np.zeros(n)
+    gap[1:] = np.cumsum(arc_length[:-1] + 1.0)
+    axis = arc - path_start[np.repeat(np.arange(n), lengths)] + np.repeat(gap, lengths)
+    targets = local + gap[owner]
+
+    resampled = np.empty((total, 3))
+    for column in range(3):
+        resampled[:, column] = np.interp(targets, axis, coords[:, column])
+
+    return resampled, new_offsets
+
+
+def _travel_distance(starts: np.ndarray, ends: np.ndarray) -> float:
+    """
+    pen-up travel from the end of every path to the start of the next one
+    """
+    if starts.shape[0] < 2:
+        return 0.0
+    return float(np.hypot(*(starts[1:] - ends[:-1]).T).sum())
+
+
+def _join_chains(
+    starts: np.ndarray, ends: np.ndarray, tolerance: float, reverse: bool
+) -> typing.List[typing.List[typing.Tuple[int, bool]]]:
+    """
+    links path endpoints that are at most tolerance apart, closest pairs
+    first. every endpoint is linked at most once and links that would close
+    a loop are skipped, so the linked paths form chains. endpoint j is the
+    start of path j, j + n the end of path j - n
+    :return: chains of (path index, reversed), in order of their first path
+    """
+    n = starts.shape[0]
+    points = np.concatenate((starts, ends))
+    pairs = spatial.cKDTree(points).query_pairs(tolerance, output_type="ndarray")
+
+    if len(pairs) > 0:
+        a, b = pairs[:, 0], pairs[:, 1]
+        usable = a % n != b % n
+        if not reverse:
+            # only the end of one path onto the start of another
+            usable &= (a < n) != (b < n)
+        pairs = pairs[usable]
+        distances = np.hypot(*(points[pairs[:, 0]] - points[pairs[:, 1]]).T)
+        pairs = pairs[np.argsort(distances, kind="stable")]
+
+    link = [-1] * (2 * n)
+    parent = list(range(n))
+
+    def root(p: int) -> int:
+        while parent[p] != p:
+            parent[p] = parent[parent[p]]
+            p = parent[p]
+        return p
+
+    for a, b in pairs.tolist():
+        if link[a] != -1 or link[b] != -1:
+            continue
+        ra, rb = root(a % n), root(b % n)
+        if ra == rb:
+            continue
+        parent[ra] = rb
+        link[a], link[b] = b, a
+
+    chains = []
+    used = [False] * n
+    for i in range(n):
+        if used[i]:
+            continue
+        if link[i] == -1:
+            first = i
+        elif reverse and link[i + n] == -1:
+            first = i + n
+        else:
+            continue
+
+        chain = []
+        endpoint = first
+        while True:
+            p = endpoint % n
+            used[p] = True
+            flipped = endpoint >= n
+            chain.append((p, flipped))
+            out = p if flipped else p + n
+            endpoint = link[out]
+            if endpoint == -1:
+                break
+        chains.append(chain)
+
+    return chains
+
+
+def _greedy_tour(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    reverse: bool,
+    origin: typing.Optional[np.ndarray] = None,
+) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    nearest neighbour tour over the path endpoints, beginning at origin or
+    at the first path. endpoint j belongs to path j % n, endpoints >= n are
+    path ends, entering a path there means drawing it reversed. the kd-tree
+    is rebuilt from the unvisited endpoints once half of it is used up
+    :return: path order and which paths are reversed
+    """
+    n = starts.shape[0]
+    points = np.concatenate((starts, ends)) if reverse else starts
+    visited = np.zeros(n, dtype=bool)
+    order = np.empty(n, dtype=np.int64)
+    flip = np.zeros(n, dtype=bool)
+
+    alive = np.arange(points.shape[0])
+    tree = spatial.cKDTree(points)
+    dead = 0
+    current = starts[0] if origin is None else origin
+
+    for step in range(n):
+        if dead > len(alive) // 2:
+            alive = alive[~visited[alive % n]]
+            tree = spatial.cKDTree(points[alive])
+            dead = 0
+
+        k = 8
+        while True:
+            k = min(k, len(alive))
+            _, idx = tree.query(current, k=k)
+            candidates = alive[np.atleast_1d(idx)]
+            free = ~visited[candidates % n]
+            if free.any():
+                endpoint = int(candidates[np.argmax(free)])
+                break
+            k *= 4
+
+        p = endpoint % n
+        visited[p] = True
+        order[step] = p
+        flip[p] = endpoint >= n
+        current = starts[p] if flip[p] else ends[p]
+        dead += 2 if reverse else 1
+
+    return order, flip
+
+
+def _refine_tour(
+    order: np.ndarray,
+    flip: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    reverse: bool,
+    passes: int,
+    neighbours: int = 8,
+) -> None:
+    """
+    improves an open tour in place with 2-opt (only if paths may be
+    reversed) and or-opt moves of up to three consecutive paths. candidate
+    moves are limited to the nearest endpoints of every endpoint
+    """
+    n = order.shape[0]
+    if n < 3:
+        return
+
+    points = np.concatenate((starts, ends))
+    k = min(neighbours + 1, points.shape[0])
+    _, near = spatial.cKDTree(points).query(points, k=k)
+    near = near.tolist()
+    xy = points.tolist()
+    pos = np.empty(n, dtype=np.int64)
+    pos[order] = np.arange(n)
+
+    def dist(i: int, j: int) -> float:
+        return math.dist(xy[i], xy[j])
+
+    def entry(p: int) -> int:
+        return p + n if flip[p] else p
+
+    def exit_(p: int) -> int:
+        return p if flip[p] else p + n
+
+    def reverse_range(i: int, j: int) -> None:
+        stop = j + 1
+        segment = order[i:stop][::-1].copy()
+        order[i:stop] = segment
+        pos[segment] = np.arange(i, stop)
+        flip[segment] ^= True
+
+    def move_segment(i: int, length: int, after: int, reversed_: bool) -> None:
+        stop = i + length
+        segment = order[i:stop].copy()
+        if reversed_:
+            segment = segment[::-1].copy()
+            flip[segment] ^= True
+        if after >= stop:
+            lo, hi = i, after + 1
+            order[lo:hi] = np.concatenate((order[stop:hi], segment))
+        else:
+            lo, hi = after + 1, stop
+            order[lo:hi] = np.concatenate((segment, order[lo:i]))
+        pos[order[lo:hi]] = np.arange(lo, hi)
+
+    def two_opt() -> bool:
+        improved = False
+        for i in range(n - 1):
+            a, b = int(order[i]), int(order[i + 1])
+            xa, eb = exit_(a), entry(b)
+            d_ab = dist(xa, eb)
+
+            # reversing everything before or after the edge
+            last = int(order[-1])
+            first = int(order[0])
+            if dist(xa, exit_(last)) < d_ab - 1e-9:
+                reverse_range(i + 1, n - 1)
+                improved = True
+                continue
+            if dist(entry(first), eb) < d_ab - 1e-9:
+                reverse_range(0, i)
+                improved = True
+                continue
+
+            for q in near[xa]:
+                d_new = dist(xa, q)
+                if d_new >= d_ab:
+                    break
+                c = q % n
+                if c == a or c == b or q != exit_(c):
+                    continue
+                j = int(pos[c])
+                if j > i + 1:
+                    # a -> c ... b -> d
+                    old = d_ab
+                    new = d_new
+                    if j + 1 < n:
+                        d = int(order[j + 1])
+                        old += dist(q, entry(d))
+                        new += dist(eb, entry(d))
+                    if new < old - 1e-9:
+                        reverse_range(i + 1, j)
+                        improved = True
+                        break
+                elif j < i:
+                    # c -> a ... e -> b
+                    e = int(order[j + 1])
+                    old = d_ab + dist(q, entry(e))
+                    new = d_new + dist(entry(e), eb)
+                    if new < old - 1e-9:
+                        reverse_range(j + 1, i)
+                        improved = True
+                        break
+        return improved
+
+    def or_opt() -> bool:
+        improved = False
+        for length in (1, 2, 3):
+            i = 0
+            while i + length <= n:
+                stop = i + length
+                f, l_ = int(order[i]), int(order[stop - 1])
+                prev = int(order[i - 1]) if i > 0 else None
+                nxt = int(order[stop]) if stop < n else None
+
+                gain = 0.0
+                if prev is not None:
+                    gain += dist(exit_(prev), entry(f))
+                if nxt is not None:
+                    gain += dist(exit_(l_), entry(nxt))
+                if prev is not None and nxt is not None:
+                    gain -= dist(exit_(prev), entry(nxt))
+
+                # drawn as is after c, or reversed after c
+                variants = [(entry(f), exit_(l_), False)]
+                if reverse:
+                    variants.append((exit_(l_), entry(f), True))
+
+                moved = False
+                for head, tail, reversed_ in variants:
+                    for q in near[head]:
+                        d_in = dist(q, head)
+                        if d_in >= gain:
+                            break
+                        c = q % n
+                        if q != exit_(c) or c == prev:
+                            continue
+                        j = int(pos[c])
+                        if i <= j < stop:
+                            continue
+                        add = d_in
+                        if j + 1 < n:
+                            g = int(order[j + 1])
+                            add += dist(tail, entry(g)) - dist(q, entry(g))
+                        if add < gain - 1e-9:
+                            move_segment(i, length, j, reversed_)
+                            moved = True
+                            break
+                    if moved:
+                        break
+
+                improved |= moved
+                i += 1
+        return improved
+
+    for _ in range(passes):
+        improved = two_opt() if reverse else False
+        improved |= or_opt()
+        if not improved:
+            break
+
+
 class TimedPosition:
+    """
+    single point of a path. Path stores its vertices column-wise in a
+    numpy array, TimedPosition objects are only handed out as snapshots
+    of a row, changing them does not change the path they came from
+    """
+
+    __slots__ = ("x", "y", "timestamp")
+
     def __init__(self, x: float = 0.0, y: float = 0.0, timestamp: int = 0):
         self.x = x
         self.y = y
@@ -108,32 +683,40 @@ class BoundingBox:
             and self.y <= point.y <= self.y + self.w
         )
 
+    def __inside_mask(self, coords: np.ndarray) -> np.ndarray:
+        x = coords[:, 0]
+        y = coords[:, 1]
+        return (
+            (self.x <= x)
+            & (x <= self.x + self.w)
+            & (self.y <= y)
+            & (y <= self.y + self.w)
+        )
+
     def inside(
         self, data: typing.Union["TimedPosition", "Path", "PathCollection"]
     ) -> bool:
         if isinstance(data, TimedPosition):
             return self.__inside(data)
         if isinstance(data, Path):
-            for p in data:
-                if not self.__inside(p):
-                    return False
-            return True
+            return bool(self.__inside_mask(data.coords).all())
         if isinstance(data, PathCollection):
             for path in data:
-                for p in path:
-                    if not self.__inside(p):
-                        return False
+                if not self.inside(path):
+                    return False
             return True
 
+    def inside_bounds(self, bounds: np.ndarray) -> np.ndarray:
+        """
+        inside() for many paths at once, given their (N, 4) bounds
+        minx, miny, maxx, maxy
+        """
+        return self.__inside_mask(bounds[:, :2]) & self.__inside_mask(bounds[:, 2:])
+
     def mostly_inside(self, data: "Path") -> bool:
-        points_inside = 0
-        points_outside = 0
         if isinstance(data, Path):
-            for p in data:
-                if not self.__inside(p):
-                    points_outside += 1
-                else:
-                    points_inside += 1
+            points_inside = int(self.__inside_mask(data.coords).sum())
+            points_outside = len(data) - points_inside
             return points_inside > points_outside
 
     def center(self) -> typing.Tuple[float, float]:
@@ -208,14 +791,177 @@ class Path:
         self._pen_force = pen_force
         self._pen_select = pen_select
         self._is_polygon = is_polygon
-        if vertices:
-            self.vertices = list(vertices)
+        # vertices live in a (capacity, 3) float64 buffer with the columns
+        # x, y and timestamp. only the first _size rows are valid, the rest
+        # is headroom so add() doesn't reallocate for every point.
+        # translate, scale and rot are collected in _transform and only
+        # applied to the buffer once the vertices are read. _packed is set
+        # while the buffer is a view into the buffer of a packed collection,
+        # which may hold a pending transform of its own
+        self._buffer = self._to_array(vertices)
+        self._size = self._buffer.shape[0]
+        self._transform: typing.Optional[np.ndarray] = None
+        self._packed: typing.Optional[PackedPathCollection] = None
+        # derived metrics are cached until the next mutation,
+        # see _cached() and version
+        self._version = 0
+        self._cache: dict = {}
+        self._cache_key: typing.Optional[tuple] = None
+
+    @staticmethod
+    def _to_array(
+        vertices: typing.Optional[typing.Union[list, np.ndarray]] = None
+    ) -> np.ndarray:
+        if vertices is None:
+            return np.empty((0, 3), dtype=np.float64)
+
+        if isinstance(vertices, np.ndarray):
+            arr = np.asarray(vertices, dtype=np.float64)
+            if arr.ndim != 2 or arr.shape[1] not in (2, 3):
+                raise ValueError(f"Expected an (N, 2) or (N, 3) array, got {arr.shape}")
+            if arr.shape[1] == 2:
+                arr = np.column_stack((arr, np.zeros(arr.shape[0])))
+            return arr.copy()
+
+        rows = [(v.x, v.y, v.timestamp) for v in vertices]
+        if len(rows) == 0:
+            return np.empty((0, 3), dtype=np.float64)
+        return np.array(rows, dtype=np.float64)
+
+    def _set_buffer(self, buffer: np.ndarray) -> None:
+        self._buffer = buffer
+        self._size = buffer.shape[0]
+        self._transform = None
+        self._packed = None
+        self._changed()
+
+    def _bind(self, view: np.ndarray, packed: "PackedPathCollection") -> None:
+        """
+        swaps the buffer for a view with the same content inside the buffer
+        of a packed collection. cached metrics stay valid
+        """
+        self._flush()
+        valid = self._cache_key == self.__key()
+
+        self._buffer = view
+        self._size = view.shape[0]
+        self._packed = packed
+
+        if valid:
+            self._cache_key = self.__key()
+
+    def _changed(self) -> None:
+        self._version += 1
+
+    @property
+    def version(self) -> int:
+        """
+        counts up with every change to the vertices. changes made through
+        a packed collection the path is part of are counted there.
+        """
+        if self._packed is None:
+            return self._version
+        return self._version + self._packed._root._version
+
+    def __key(self) -> tuple:
+        if self._packed is None:
+            return self._version, None
+        return self._version, id(self._packed), self._packed._version
+
+    def _cached(self, name: str, compute: typing.Callable) -> typing.Any:
+        """
+        returns the metric name, computes it only if the path changed since
+        it was last computed
+        """
+        self.__validate_cache()
+        if name not in self._cache:
+            self._cache[name] = compute()
+
+        return self._cache[name]
+
+    def _remember(self, name: str, value: typing.Any) -> None:
+        """
+        stores a metric computed elsewhere, e.g. for a whole collection
+        """
+        self.__validate_cache()
+        self._cache[name] = value
+
+    def __validate_cache(self) -> None:
+        key = self.__key()
+        if self._cache_key != key:
+            self._cache.clear()
+            self._cache_key = key
+
+    def _flush(self) -> None:
+        """
+        applies pending transforms to the vertex buffer
+        """
+        if self._packed is not None:
+            self._packed._flush()
+
+        if self._transform is not None:
+            matrix = self._transform
+            self._transform = None
+            xy = self._buffer[: self._size, :2]
+            self._buffer[: self._size, :2] = _apply_affine(xy, matrix)
+
+    def _defer(self, matrix: np.ndarray) -> None:
+        self._changed()
+
+        # a transform of the packed collection came first
+        if self._packed is not None:
+            self._packed._flush()
+
+        if self._transform is None:
+            self._transform = matrix
         else:
-            self.vertices = []
+            self._transform = matrix @ self._transform
+
+    def _pending(self) -> typing.Optional[np.ndarray]:
+        """
+        the transform the buffer is still waiting for, None if up to date
+        """
+        matrix = None
+        if self._packed is not None:
+            matrix = self._packed._root._pending
+        if self._transform is not None:
+            matrix = self._transform if matrix is None else self._transform @ matrix
+        return matrix
+
+    @property
+    def _coords(self) -> np.ndarray:
+        """
+        writable view onto the valid rows of the vertex buffer
+        """
+        self._flush()
+        return self._buffer[: self._size]
+
+    @property
+    def coords(self) -> np.ndarray:
+        """
+        read-only (N, 3) view of x, y and timestamp of all vertices
+        """
+        view = self._coords.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def vertices(self) -> typing.List["TimedPosition"]:
+        """
+        vertices as a list of TimedPosition snapshots. this allocates one
+        object per point, prefer coords for anything performance related
+        """
+        return [TimedPosition(x, y, t) for x, y, t in self._coords.tolist()]
+
+    @vertices.setter
+    def vertices(self, vertices: typing.Union[list, np.ndarray]) -> None:
+        self._set_buffer(self._to_array(vertices))
 
     @property
     def hash(self) -> str:
-        return hashlib.md5(str(self.vertices).encode("utf-8")).hexdigest()
+        return self._cached(
+            "hash", lambda: hashlib.md5(self._coords.tobytes()).hexdigest()
+        )
 
     @property
     def line_type(self):
@@ -274,54 +1020,77 @@ class Path:
         self._is_polygon = is_polygon
 
     def add(self, x: float, y: float, timestamp: int = 0) -> None:
-        self.vertices.append(TimedPosition(x, y, timestamp))
-
-    def arr(self):
-        data = np.random.randint(0, 1000, size=(len(self), 2))
-
-        idx = 0
-        for p in self.vertices:
-            data[idx] = p.arr()
-            idx += 1
-
-        return data
+        if self._size == self._buffer.shape[0]:
+            capacity = max(16, self._buffer.shape[0] * 2)
+            grown = np.empty((capacity, 3), dtype=np.float64)
+            size = self._size
+            grown[:size] = self._coords
+            self._set_buffer(grown)
+            self._size = size
+        elif self._transform is not None:
+            self._flush()
+
+        self._buffer[self._size] = (x, y, timestamp)
+        self._size += 1
+        self._changed()
+
+    def arr(self) -> np.ndarray:
+        """
+        :return: a (N, 2) copy of all x, y positions
+        """
+        return self._coords[:, :2].copy()
 
     def clear(self) -> None:
-        self.vertices.clear()
+        self._set_buffer(np.empty((0, 3), dtype=np.float64))
 
     def copy(self) -> "Path":
-        return type(self)(copy.deepcopy(self.vertices))
+        return type(self)(self._coords)
 
     def reverse(self) -> None:
-        self.vertices.reverse()
+        self._set_buffer(self._coords[::-1].copy())
 
     def reversed(self) -> "Path":
-        c = copy.deepcopy(self.vertices)
-        c.reverse()
         return Path(
-            c, layer=self.layer, line_type=self.line_type, pen_velocity=self.velocity
+            self._coords[::-1],
+            layer=self.layer,
+            line_type=self.line_type,
+            pen_velocity=self.velocity,
         )
 
     def start_pos(self) -> "TimedPosition":
-        if len(self.vertices) == 0:
+        if self._size == 0:
             raise IndexError
-        return self.vertices[0]
+        return self[0]
 
     def end_pos(self) -> "TimedPosition":
-        if len(self.vertices) == 0:
+        if self._size == 0:
             raise IndexError
 
-        return self.vertices[-1]
+        return self[-1]
 
     def bb(self) -> BoundingBox:
-        minx = min(self.vertices, key=lambda pos: pos.x).x
-        miny = min(self.vertices, key=lambda pos: pos.y).y
-        maxx = max(self.vertices, key=lambda pos: pos.x).x
-        maxy = max(self.vertices, key=lambda pos: pos.y).y
-        b = BoundingBox(minx, miny, maxx, maxy)
-        return b
+        # cache the bounds, not the mutable BoundingBox
+        return BoundingBox(*self._cached("bb", self.__bounds))
+
+    def __bounds(self) -> typing.Tuple[float, float, float, float]:
+        pending = self._pending()
+        if pending is not None:
+            # bounds of the untransformed vertices, transformed afterwards
+            xy = self._buffer[: self._size, :2]
+            raw = tuple(xy.min(axis=0).tolist() + xy.max(axis=0).tolist())
+            bounds = _affine_bounds(raw, pending)
+            if bounds is not None:
+                return bounds
+
+        xy = self._coords[:, :2]
+        minx, miny = xy.min(axis=0).tolist()
+        maxx, maxy = xy.max(axis=0).tolist()
+        return minx, miny, maxx, maxy
 
     def aspect_ratio(self):
+        return self._cached("aspect_ratio", self.__aspect_ratio)
+
+    def __aspect_ratio(self) -> float:
         _bb = self.bb()
         w = _bb.w
         if _bb.w == 0.0:
@@ -334,34 +1103,35 @@ class Path:
         Calculates the summed distance between all points in sequence
         Also known as "travel distance"
         """
-        dist = 0
-
-        def calculateDistance(x1, y1, x2, y2):
-            dist = math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
-            return dist
+        return self._cached("distance", self.__distance)
 
-        for i in range(self.__len__() - 1):
-            current = self.__getitem__(i)
-            next = self.__getitem__(i + 1)
+    def __distance(self) -> float:
+        if self._size < 2:
+            return 0.0
 
-            d = calculateDistance(current.x, current.y, next.x, next.y)
-            dist += d
+        deltas = np.diff(self._coords[:, :2], axis=0)
+        return float(np.hypot(deltas[:, 0], deltas[:, 1]).sum())
 
-        return dist
+    def transform(
+        self, matrix: np.ndarray, origin: typing.Tuple[float, float] = (0.0, 0.0)
+    ) -> None:
+        """
+        applies a 3x3 affine transformation matrix relative to origin
+        to all vertices. like translate, scale and rot this is deferred
+        until the vertices are read
+        """
+        self._defer(matrix @ _translation(-origin[0], -origin[1]))
 
     def translate(self, x: float, y: float) -> None:
-        for p in self.vertices:
-            p.translate(x, y)
+        self._defer(_translation(x, y))
 
     def scale(self, x: float, y: float) -> None:
-        for p in self.vertices:
-            p.scale(x, y)
+        self._defer(_scaling(x, y))
 
     def rot(
         self, angle: float, origin: typing.Tuple[float, float] = (0.0, 0.0)
     ) -> None:
-        for p in self.vertices:
-            p.rot(angle, origin)
+        self._defer(_rotation(angle, origin))
 
     def move_to_origin(self):
         """
@@ -370,15 +1140,7 @@ class Path:
         """
 
         _bb = self.bb()
-        if _bb.x < 0:
-            self.translate(abs(_bb.x), 0.0)
-        else:
-            self.translate(-abs(_bb.x), 0.0)
-
-        if _bb.y < 0:
-            self.translate(0.0, abs(_bb.y))
-        else:
-            self.translate(0.0, -abs(_bb.y))
+        self.translate(-_bb.x, -_bb.y)
 
     def fit(self, bb: BoundingBox) -> None:
         pass
@@ -392,24 +1154,21 @@ class Path:
             start = (start.x, start.y)
             end = (end.x, end.y)
 
-        path = Path()
         end_np = self.end_pos().arr()
         start_np = self.start_pos().arr()
         new_end_np = np.array(end, dtype=float)
         new_start_np = np.array(start, dtype=float)
 
-        for point in self.vertices:
-            nparr = point.arr()
+        dir_old = np.subtract(end_np, start_np)
+        dir_new = np.subtract(new_end_np, new_start_np)
+        mag_diff = np.linalg.norm(dir_new) / np.linalg.norm(dir_old)
+        if mag_diff is np.nan:
+            mag_diff = 0.0
+        if math.isinf(mag_diff):
+            mag_diff = 1.0
 
-            dir_old = np.subtract(end_np, start_np)
-            dir_new = np.subtract(new_end_np, new_start_np)
-            mag_diff = np.linalg.norm(dir_new) / np.linalg.norm(dir_old)
-            if mag_diff is np.nan:
-                mag_diff = 0.0
-            if math.isinf(mag_diff):
-                mag_diff = 1.0
-            nparr = nparr * mag_diff
-            path.add(nparr[0], nparr[1], point.timestamp)
+        path = Path(self._coords)
+        path.scale(mag_diff, mag_diff)
 
         current_end = path.end_pos().arr()
         current_start = path.start_pos().arr()
@@ -440,12 +1199,10 @@ class Path:
         ):
             angle = 2 * math.pi - angle
 
-        for p in path.vertices:
-            p.rot(angle)
+        path.rot(angle)
 
         translation = np.subtract(new_start_np, path.start_pos().arr())
-        for p in path.vertices:
-            p.translate(translation[0], translation[1])
+        path.translate(translation[0], translation[1])
 
         return path
 
@@ -484,54 +1241,25 @@ class Path:
         return False, 0.0, 0.0
 
     def interp(self, newpath: "Path", perc: float) -> "Path":
-        path = Path()
-
         maxpoint = max(len(newpath), len(self))
 
-        for i in range(maxpoint):
-            idxthis = int((float(i) / maxpoint) * len(self))
-            idxnew = int((float(i) / maxpoint) * len(newpath))
-
-            pthis = self[idxthis]
-            pnew = newpath[idxnew]
-            x_interp = self.mix(pthis.x, pnew.x, perc)
-            y_interp = self.mix(pthis.y, pnew.y, perc)
-            time_interp = self.mix(pthis.timestamp, pnew.timestamp, perc)
+        steps = np.arange(maxpoint, dtype=float) / maxpoint
+        idxthis = (steps * len(self)).astype(int)
+        idxnew = (steps * len(newpath)).astype(int)
 
-            path.add(x_interp, y_interp, int(time_interp))
+        interped = self.mix(self._coords[idxthis], newpath._coords[idxnew], perc)
+        interped[:, 2] = np.trunc(interped[:, 2])
 
-        return path
+        return Path(interped)
 
     @staticmethod
     def mix(begin: float, end: float, perc: float):
         return ((end - begin) * perc) + begin
 
     @staticmethod
-    def __entropy2(labels: list, base=None) -> float:
-        from math import log, e
-
-        """ Computes entropy of label distribution. """
-
-        n_labels = len(labels)
-
-        if n_labels <= 1:
-            return 0
-
-        value, counts = np.unique(labels, return_counts=True)
-        probs = counts / n_labels
-        n_classes = np.count_nonzero(probs)
-
-        if n_classes <= 1:
-            return 0
-
-        ent = 0.0
-
-        # Compute entropy
-        base = e if base is None else base
-        for i in probs:
-            ent -= i * log(i, base)
-
-        return ent
+    def __entropy(labels: np.ndarray) -> float:
+        """computes entropy of label distribution"""
+        return float(_segment_entropy(labels, np.array([labels.shape[0]]))[0])
 
     def direction_changes_pos_neg(self) -> typing.List[float]:
         """
@@ -539,23 +1267,10 @@ class Path:
         to the next len() = self.__len() - 1
         :return:
         """
-
-        angles = []
-        idx = 0
-        prev = 0
-        for _ in self.vertices:
-            if idx > 0:
-                f = self.vertices[idx - 1]
-                s = self.vertices[idx]
-
-                ang = math.atan2(s.y - f.y, s.x - f.x)
-                ang = math.degrees(ang)
-
-                angles.append(ang - prev)
-                prev = ang
-            idx += 1
-
-        return angles
+        delta = np.diff(self._coords[:, :2], axis=0)
+        angles = np.degrees(np.arctan2(delta[:, 1], delta[:, 0]))
+        prev = np.concatenate(([0.0], angles[:-1]))
+        return (angles - prev).tolist()
 
     @staticmethod
     def length(v: tuple[float, float]):
@@ -601,86 +1316,77 @@ class Path:
         to the next len() = self.__len() - 1
         :return:
         """
-        angles = []
-        idx = 0
-        for _ in self.vertices:
-            if idx > 0:
-                f = self.vertices[idx - 1]
-                s = self.vertices[idx]
-                angle = self.angle_clockwise(f.pos(), s.pos())
-                # angle = angle_clockwise((1, 1), (1, -1))
-
-                if angle > 180:
-                    angle = 360 - angle
-
-                # angles.append(np.deg2rad(angle) % (2 * np.pi))
-                angles.append(angle % 360)
-            idx += 1
-
-        return angles
+        xy = self._coords[:, :2]
+        return _direction_changes(xy[:-1], xy[1:]).tolist()
 
     @property
     def shannon_x(self) -> float:
-        distances = []
-
-        first = True
-        prevx = None
-        for v in self.vertices:
-            if first:
-                prevx = v.x
-                first = False
-                continue
-
-            dist = v.x - prevx
-            distances.append(dist)
+        return self._cached("shannon_x", self.__shannon_x)
 
-            prevx = v.x
-
-        entropy = self.__entropy2(distances)
-        return entropy
+    def __shannon_x(self) -> float:
+        return self.__entropy(np.diff(self._coords[:, 0]))
 
     @property
     def shannon_y(self) -> float:
-        distances = []
-
-        first = True
-        prevy = None
-        for v in self.vertices:
-            if first:
-                prevy = v.y
-                first = False
-                continue
+        return self._cached("shannon_y", self.__shannon_y)
 
-            dist = v.y - prevy
-            distances.append(dist)
-
-            prevy = v.y
-
-        entropy = self.__entropy2(distances)
-        return entropy
+    def __shannon_y(self) -> float:
+        return self.__entropy(np.diff(self._coords[:, 1]))
 
     @property
     def shannon_direction_changes(self) -> float:
-        entropy = self.__entropy2(self.direction_changes())
-        if entropy is np.nan:
-            log.fail("LOL")
-        return entropy
+        return self._cached(
+            "shannon_direction_changes", self.__shannon_direction_changes
+        )
+
+    def __shannon_direction_changes(self) -> float:
+        xy = self._coords[:, :2]
+        return self.__entropy(_direction_changes(xy[:-1], xy[1:]))
 
     def empty(self) -> bool:
-        return len(self.vertices) == 0
+        return self._size == 0
 
     def clean(self) -> None:
         """
         removes consecutive duplicates
         """
-        prev = TimedPosition()
-        self.vertices = [prev := v for v in self.vertices if prev != v]
+        coords = self._coords
+        # the first vertex is compared against a zero TimedPosition
+        prev = np.vstack((np.zeros((1, 3)), coords[:-1]))
+        keep = np.any(coords != prev, axis=1)
+        self._set_buffer(coords[keep])
+
+    def resample(
+        self, spacing: typing.Optional[float] = None, count: typing.Optional[int] = None
+    ) -> None:
+        """
+        replaces the vertices with ones at equal arc length along the path,
+        either spacing apart or count of them. first and last vertex stay
+        """
+        offsets = np.array([0, self._size], dtype=np.int64)
+        coords, _ = _resample(self._coords, offsets, spacing, count)
+        self._set_buffer(coords)
+
+    def simplify(self, tolerance: float, method: str = "rdp") -> None:
+        """
+        drops vertices that change the shape by less than tolerance, in
+        the units of the coordinates (after fit() those are plotter steps).
+        method is "rdp" (ramer-douglas-peucker) or "visvalingam", for which
+        the minimal triangle area is tolerance squared. the first and last
+        vertex are always kept
+        """
+        coords = self._coords
+        offsets = np.array([0, coords.shape[0]], dtype=np.int64)
+        keep = _simplify_mask(coords[:, :2], offsets, tolerance, method)
+        self._set_buffer(coords[keep])
 
     def limit(self) -> None:
         """
         removes points larger than 1.0
         """
-        self.vertices = [prev := v for v in self.vertices if v.x < 1.0 and v.y < 1.0]
+        coords = self._coords
+        keep = (coords[:, 0] < 1.0) & (coords[:, 1] < 1.0)
+        self._set_buffer(coords[keep])
 
     def similarity(self, _path: "Path") -> float:
         """
@@ -713,15 +1419,12 @@ class Path:
         return result[1]
 
     def centeroid(self):
-        arr = self.arr()
-        length = arr.shape[0]
-        sum_x = np.sum(arr[:, 0])
-        sum_y = np.sum(arr[:, 1])
-        return sum_x / length, sum_y / length
+        cx, cy = self._coords[:, :2].mean(axis=0).tolist()
+        return cx, cy
 
     def __repr__(self):
         rep = (
-            f"verts: {len(self.vertices)} shannx: {self.shannon_x} shanny: {self.shannon_y} "
+            f"verts: {len(self)} shannx: {self.shannon_x} shanny: {self.shannon_y} "
             f"shannchan: {self.shannon_direction_changes} layer: {self.layer} "
             f"type: {self.line_type} velocity: {self.velocity} "
             f"bb: {self.bb()}"
@@ -729,14 +1432,28 @@ class Path:
         return rep
 
     def __len__(self) -> int:
-        return len(self.vertices)
+        return self._size
 
-    def __iter__(self) -> typing.Iterator["Path"]:
-        for v in self.vertices:
-            yield v
+    def __getstate__(self) -> dict:
+        # copies get their own buffer, independent of any packed collection
+        self._flush()
+        state = self.__dict__.copy()
+        state["_buffer"] = self._buffer[: self._size]
+        state["_packed"] = None
+        return state
 
-    def __getitem__(self, item):
-        return self.vertices[item].copy()
+    def __iter__(self) -> typing.Iterator["TimedPosition"]:
+        for x, y, t in self._coords.tolist():
+            yield TimedPosition(x, y, t)
+
+    def __getitem__(
+        self, item: typing.Union[int, slice]
+    ) -> typing.Union["TimedPosition", typing.List["TimedPosition"]]:
+        if isinstance(item, slice):
+            return [TimedPosition(x, y, t) for x, y, t in self._coords[item].tolist()]
+
+        x, y, t = self._coords[item].tolist()
+        return TimedPosition(x, y, t)
 
 
 class PathCollection:
@@ -744,6 +1461,7 @@ class PathCollection:
         self, timestamp: typing.Union[float, None] = None, name: str = "noname"
     ):
         self.__paths: typing.List[Path] = []
+        self.__packed: typing.Optional[PackedPathCollection] = None
         self.__name = name
         if timestamp:
             self._timestamp = timestamp
@@ -767,8 +1485,7 @@ class PathCollection:
             self.__paths.append(p)
 
     def extend(self, pc: "PathCollection") -> None:
-        new_paths = self.__paths + pc.get_all()
-        self.__paths = new_paths
+        self.__paths.extend(pc.get_all())
 
     def clean(self) -> None:
         """
@@ -784,6 +1501,61 @@ class PathCollection:
             f"PathCollection::clean: reduced path count from {len_before} to {len(self)}"
         )
 
+    def resample(
+        self, spacing: typing.Optional[float] = None, count: typing.Optional[int] = None
+    ) -> None:
+        """
+        Path.resample for all paths in one go over the packed vertices
+        """
+        if len(self.__paths) == 0:
+            return
+
+        t0 = time.time()
+        packed = self.__shared()
+        points = packed.points()
+        lengths = packed.lengths()
+        offsets = np.zeros(lengths.shape[0] + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        coords, new_offsets = _resample(points, offsets, spacing, count)
+        buffers = np.split(coords, new_offsets[1:-1])
+        for p, buffer in zip(self.__paths, buffers):
+            p._set_buffer(buffer)
+
+        elapsed = time.time() - t0
+        log.good(
+            f"{self.__class__.__name__}: resample from {len(points)} to {len(coords)} points "
+            f"took {round(elapsed * 1000)}ms"
+        )
+
+    def simplify(self, tolerance: float, method: str = "rdp") -> None:
+        """
+        Path.simplify for all paths. rdp runs over the packed vertices of
+        all paths at once
+        """
+        if len(self.__paths) == 0:
+            return
+
+        t0 = time.time()
+        packed = self.__shared()
+        points = packed.points()
+        lengths = packed.lengths()
+        offsets = np.zeros(lengths.shape[0] + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        keep = _simplify_mask(points[:, :2], offsets, tolerance, method)
+        owner = np.repeat(np.arange(lengths.shape[0]), lengths)
+        kept = np.bincount(owner[keep], minlength=lengths.shape[0])
+        buffers = np.split(points[keep], np.cumsum(kept)[:-1])
+        for p, buffer in zip(self.__paths, buffers):
+            p._set_buffer(buffer)
+
+        elapsed = time.time() - t0
+        log.good(
+            f"{self.__class__.__name__}: simplify reduced point count from {len(points)} to {int(keep.sum())} "
+            f"in {round(elapsed * 1000)}ms"
+        )
+
     def limit(self) -> None:
         for p in self.__paths:
             p.limit()
@@ -804,24 +1576,64 @@ class PathCollection:
     def get_all(self) -> typing.List[Path]:
         return self.__paths
 
+    def pack(self) -> "PackedPathCollection":
+        """
+        moves the vertices of all paths into one shared buffer and returns
+        its ragged array representation. the paths stay usable, they are
+        views into the shared buffer afterwards. as long as no path has
+        been reallocated, collection-wide operations run over the whole
+        buffer at once.
+        """
+        self.__packed = PackedPathCollection.from_paths(
+            self.__paths, timestamp=self._timestamp, share=True
+        )
+        return self.__packed
+
+    def __shared(self) -> "PackedPathCollection":
+        """
+        the packed buffer all paths currently share, repacks if a path
+        has been added, removed or reallocated since the last pack()
+        """
+        if self.__packed is None or not self.__packed._shares(self.__paths):
+            return self.pack()
+
+        # transforms of single paths have to be applied before the ones
+        # of the collection
+        for p in self.__paths:
+            if p._transform is not None:
+                p._flush()
+
+        return self.__packed
+
     def random(self) -> Path:
         return self.__getitem__(random.randint(0, self.__len__() - 1))
 
+    def __sort_metrics(
+        self, pathsorter: "cursor_filter.Sorter"
+    ) -> typing.Optional[np.ndarray]:
+        if pathsorter.column is None or len(self.__paths) == 0:
+            return None
+        return self.metrics([pathsorter.column])
+
     def sort(self, pathsorter: "cursor_filter.Sorter") -> None:
         if isinstance(pathsorter, cursor_filter.Sorter):
-            pathsorter.sort(self.__paths)
+            pathsorter.sort(self.__paths, self.__sort_metrics(pathsorter))
         else:
             raise Exception(f"Cant sort with a class of type {type(pathsorter)}")
 
     def sorted(self, pathsorter: "cursor_filter.Sorter") -> typing.List[Path]:
         if isinstance(pathsorter, cursor_filter.Sorter):
-            return pathsorter.sorted(self.__paths)
+            return pathsorter.sorted(self.__paths, self.__sort_metrics(pathsorter))
         else:
             raise Exception(f"Cant sort with a class of type {type(pathsorter)}")
 
     def filter(self, pathfilter: "cursor_filter.Filter") -> None:
         if isinstance(pathfilter, cursor_filter.Filter):
-            pathfilter.filter(self.__paths)
+            if pathfilter.columns and len(self.__paths) > 0:
+                metrics = self.metrics(pathfilter.columns)
+                pathfilter.filter_metrics(self.__paths, metrics)
+            else:
+                pathfilter.filter(self.__paths)
         else:
             raise Exception(f"Cant filter with a class of type {type(pathfilter)}")
 
@@ -829,7 +1641,12 @@ class PathCollection:
         if isinstance(pathfilter, cursor_filter.Filter):
 
             pc = PathCollection()
-            pc.__paths = pathfilter.filtered(self.__paths)
+            if pathfilter.columns and len(self.__paths) > 0:
+                paths = list(self.__paths)
+                pathfilter.filter_metrics(paths, self.metrics(pathfilter.columns))
+                pc.__paths = copy.deepcopy(paths)
+            else:
+                pc.__paths = pathfilter.filtered(self.__paths)
             return pc
         else:
             raise Exception(f"Cant filter with a class of type {type(pathfilter)}")
@@ -837,6 +1654,12 @@ class PathCollection:
     def __len__(self) -> int:
         return len(self.__paths)
 
+    def __getstate__(self) -> dict:
+        # copies of the paths don't share a buffer anymore
+        state = self.__dict__.copy()
+        state["_PathCollection__packed"] = None
+        return state
+
     def __add__(self, other: typing.Union[list, "PathCollection"]) -> "PathCollection":
         if isinstance(other, PathCollection):
             new_paths = self.__paths + other.get_all()
@@ -948,28 +1771,53 @@ class PathCollection:
         return bb
 
     def min(self) -> typing.Tuple[float, float]:
-        all_chained = [point for path in self.__paths for point in path]
-        minx = min(all_chained, key=lambda pos: pos.x).x
-        miny = min(all_chained, key=lambda pos: pos.y).y
-        return minx, miny
+        return self.__shared().min()
 
     def max(self) -> typing.Tuple[float, float]:
-        all_chained = [point for path in self.__paths for point in path]
-        maxx = max(all_chained, key=lambda pos: pos.x).x
-        maxy = max(all_chained, key=lambda pos: pos.y).y
-        return maxx, maxy
+        return self.__shared().max()
+
+    def metrics(
+        self, columns: typing.Optional[typing.Iterable[str]] = None
+    ) -> np.ndarray:
+        """
+        per path metric table in path order, see PackedPathCollection.metrics
+        """
+        t0 = time.time()
+        table = self.__shared().metrics(columns)
+        elapsed = time.time() - t0
+        log.good(
+            f"{self.__class__.__name__}: metrics for {len(table)} paths took {round(elapsed * 1000)}ms."
+        )
+        return table
+
+    def entropies(self) -> np.ndarray:
+        """
+        shannon_x, shannon_y and shannon_direction_changes of all paths,
+        computed in one go over the packed vertices
+        :return: (N, 3) array in path order
+        """
+        packed = self.__shared()
+        metrics = np.column_stack(
+            (
+                packed.shannon_x(),
+                packed.shannon_y(),
+                packed.shannon_direction_changes(),
+            )
+        )
+        for p, row in zip(self.__paths, metrics.tolist()):
+            p._remember("shannon_x", row[0])
+            p._remember("shannon_y", row[1])
+            p._remember("shannon_direction_changes", row[2])
+        return metrics
 
     def translate(self, x: float, y: float) -> None:
-        for p in self.__paths:
-            p.translate(x, y)
+        self.__shared()._defer(_translation(x, y))
 
     def scale(self, x: float, y: float) -> None:
-        for p in self.__paths:
-            p.scale(x, y)
+        self.__shared()._defer(_scaling(x, y))
 
     def rot(self, delta: float) -> None:
-        for p in self.__paths:
-            p.rot(delta)
+        self.__shared()._defer(_rotation(delta))
 
     def log(self, str) -> None:
         log.good(f"{self.__class__.__name__}: {str}")
@@ -981,15 +1829,7 @@ class PathCollection:
         """
 
         _bb = self.bb()
-        if _bb.x < 0:
-            self.translate(abs(_bb.x), 0.0)
-        else:
-            self.translate(-abs(_bb.x), 0.0)
-
-        if _bb.y < 0:
-            self.translate(0.0, abs(_bb.y))
-        else:
-            self.translate(0.0, -abs(_bb.y))
+        self.translate(-_bb.x, -_bb.y)
 
     def fit(
         self,
@@ -1001,13 +1841,14 @@ class PathCollection:
         output_bounds: tuple[float, float, float, float] = None,
         cutoff_mm=None,
     ) -> None:
-        _bb = self.bb()
-
-        # move into positive area
-        if _bb.x != 0.0 and _bb.y != 0.0:
-            self.move_to_origin()
-
-        _bb = self.bb()
+        """
+        scales and centers all paths into the given size in one pass.
+        the bounds are computed once, moving to the origin, scaling and
+        centering are combined into a single affine transform applied
+        to all vertices.
+        """
+        packed = self.__shared()
+        _bb = packed.bb()
 
         width = size[0]
         height = size[1]
@@ -1033,8 +1874,6 @@ class PathCollection:
             padding_y = abs(height * padding_percent)
 
         # scaling
-        _bb = self.bb()
-
         _w = _bb.w
         if _w == 0.0:
             _w = 0.001
@@ -1044,12 +1883,8 @@ class PathCollection:
         xscale = (width - padding_x * 2.0) / _w
         yscale = (height - padding_y * 2.0) / _h
 
-        log.info(f"{self.__class__.__name__}: fit: scaled by {xscale:.2f} {yscale:.2f}")
-        self.scale(xscale, yscale)
-
-        # centering
-        _bb = self.bb()
-        paths_center = _bb.center()
+        # centering, the scaled paths start at the origin
+        paths_center = _bb.w * xscale / 2.0, _bb.h * yscale / 2.0
 
         output_bounds_center = width / 2.0, height / 2.0
 
@@ -1063,11 +1898,17 @@ class PathCollection:
             output_bounds_center[1] - paths_center[1],
         )
 
+        log.info(f"{self.__class__.__name__}: fit: scaled by {xscale:.2f} {yscale:.2f}")
         log.info(
             f"{self.__class__.__name__}: fit: translated by {diff[0]:.2f} {diff[1]:.2f}"
         )
 
-        self.translate(diff[0], diff[1])
+        packed.transform(
+            np.array(
+                [[xscale, 0.0, diff[0]], [0.0, yscale, diff[1]], [0.0, 0.0, 1.0]]
+            ),
+            origin=(_bb.x, _bb.y),
+        )
 
         if cutoff_mm is not None:
             cuttoff_margin_diff = padding_mm - cutoff_mm
@@ -1078,13 +1919,163 @@ class PathCollection:
             cuttoff_margin_diff_x = cuttoff_margin_diff * xy_factor[0]
             cuttoff_margin_diff_y = cuttoff_margin_diff * xy_factor[1]
 
-            cutoff_bb = self.bb()
-            cutoff_bb.x -= cuttoff_margin_diff_x
-            cutoff_bb.x2 += cuttoff_margin_diff_x
-            cutoff_bb.y -= cuttoff_margin_diff_y
-            cutoff_bb.y2 += cuttoff_margin_diff_y
+            # bounds of the fitted paths, derived from the transform
+            fitted_x = sorted((diff[0], _bb.w * xscale + diff[0]))
+            fitted_y = sorted((diff[1], _bb.h * yscale + diff[1]))
+
+            cutoff_x = fitted_x[0] - cuttoff_margin_diff_x
+            cutoff_x2 = fitted_x[1] + cuttoff_margin_diff_x
+            cutoff_y = fitted_y[0] - cuttoff_margin_diff_y
+            cutoff_y2 = fitted_y[1] + cuttoff_margin_diff_y
+
+            bounds = packed.path_bounds()
+            keep = (
+                (bounds[:, 0] >= cutoff_x)
+                & (bounds[:, 2] <= cutoff_x2)
+                & (bounds[:, 1] >= cutoff_y)
+                & (bounds[:, 3] <= cutoff_y2)
+            )
+            self.__paths = [p for p, k in zip(self.__paths, keep.tolist()) if k]
+
+    def segment_index(self, cell_size: typing.Optional[float] = None) -> "SegmentIndex":
+        """
+        grid index over the segments of all paths for intersection, bounding
+        box and nearest path queries. add paths to it as they are accepted
+        """
+        return SegmentIndex.from_paths(self.__paths, cell_size)
+
+    def travel_distance(self) -> float:
+        """
+        pen-up distance from the end of every path to the start of the next
+        """
+        if len(self.__paths) < 2:
+            return 0.0
+        return _travel_distance(*self.__shared().endpoints())
+
+    def optimize_travel(
+        self, reverse: bool = True, passes: int = 2
+    ) -> typing.Tuple[float, float]:
+        """
+        reorders the paths to shorten the pen-up travel between them. builds
+        a nearest neighbour tour with a kd-tree and refines it with 2-opt and
+        or-opt moves. with reverse=True paths may be drawn backwards. paths
+        of different layers or pens are never mixed, the groups keep the
+        order in which they first appear
+        :return: travel distance before and after
+        """
+        if len(self.__paths) < 2:
+            return 0.0, 0.0
+
+        t0 = time.time()
+        starts, ends = self.__shared().endpoints()
+        before = _travel_distance(starts, ends)
+
+        groups: typing.Dict[tuple, list] = {}
+        for i, p in enumerate(self.__paths):
+            groups.setdefault((p.layer, p.pen_select), []).append(i)
+
+        paths = []
+        origin = None
+        for indices in groups.values():
+            indices = np.array(indices)
+            _starts, _ends = starts[indices], ends[indices]
+            order, flip = _greedy_tour(_starts, _ends, reverse, origin)
+            _refine_tour(order, flip, _starts, _ends, reverse, passes)
+
+            for i, flipped in zip(indices[order].tolist(), flip[order].tolist()):
+                p = self.__paths[i]
+                if flipped:
+                    p.reverse()
+                paths.append(p)
+            last = order[-1]
+            origin = _starts[last] if flip[last] else _ends[last]
+
+        self.__paths = paths
+        after = self.travel_distance()
+
+        elapsed = time.time() - t0
+        log.good(
+            f"{self.__class__.__name__}: optimize_travel for {len(self)} paths took {round(elapsed * 1000)}ms, "
+            f"travel {round(before, 2)} -> {round(after, 2)}"
+        )
+        return before, after
+
+    def merge(self, tolerance: float = 0.0, reverse: bool = True) -> int:
+        """
+        joins paths whose end is at most tolerance away from the start of
+        another path, so they are drawn without lifting the pen. with
+        reverse=True paths are reversed where that allows a join. only
+        paths with the same layer, pen, line type, velocity and force are
+        joined, polygons are left alone. a merged path takes the place of
+        its first path
+        :return: number of saved pen lifts
+        """
+        if len(self.__paths) < 2:
+            return 0
+
+        t0 = time.time()
+        len_before = len(self)
+        starts, ends = self.__shared().endpoints()
+
+        groups: typing.Dict[tuple, list] = {}
+        for i, p in enumerate(self.__paths):
+            if p.is_polygon:
+                continue
+            key = (p.layer, p.pen_select, p.line_type, p.velocity, p.pen_force)
+            groups.setdefault(key, []).append(i)
 
-            self.__paths = [x for x in self.__paths if cutoff_bb.inside(x)]
+        # merged path for the first index of every chain, None for the rest
+        replacement: typing.Dict[int, typing.Optional[Path]] = {}
+        for indices in groups.values():
+            if len(indices) < 2:
+                continue
+            indices = np.array(indices)
+            chains = _join_chains(starts[indices], ends[indices], tolerance, reverse)
+            for chain in chains:
+                if len(chain) < 2:
+                    continue
+                members = [(int(indices[i]), flipped) for i, flipped in chain]
+                merged = self.__join(
+                    [self.__paths[i] for i, _ in members], [f for _, f in members]
+                )
+                first = min(i for i, _ in members)
+                for i, _ in members:
+                    replacement[i] = None
+                replacement[first] = merged
+
+        paths = []
+        for i, p in enumerate(self.__paths):
+            p = replacement.get(i, p)
+            if p is not None:
+                paths.append(p)
+        self.__paths = paths
+
+        elapsed = time.time() - t0
+        log.good(
+            f"{self.__class__.__name__}: merge reduced path count from {len_before} to {len(self)} "
+            f"in {round(elapsed * 1000)}ms"
+        )
+        return len_before - len(self)
+
+    @staticmethod
+    def __join(paths: typing.List[Path], flipped: typing.List[bool]) -> Path:
+        pieces = []
+        for p, f in zip(paths, flipped):
+            coords = p.coords[::-1] if f else p.coords
+            # a shared endpoint is drawn only once
+            if pieces and np.array_equal(pieces[-1][-1, :2], coords[0, :2]):
+                coords = coords[1:]
+            pieces.append(coords)
+
+        head = paths[0]
+        return Path(
+            np.concatenate(pieces),
+            layer=head.layer,
+            line_type=head.line_type,
+            pen_velocity=head.velocity,
+            pen_force=head.pen_force,
+            pen_select=head.pen_select,
+        )
 
     def reorder_tsp(self) -> None:
         """
@@ -1188,3 +2179,904 @@ class PathCollection:
         )
 
         self.__paths = list(ss.keys())
+
+
+class PackedPathCollection:
+    """
+    ragged array (CSR style) representation of a PathCollection
+
+    all vertices of all paths live in one (M, 3) buffer of x, y and
+    timestamp. the rows of path n are coords[offsets[n]:offsets[n + 1]].
+    per path properties are kept in arrays parallel to the offsets.
+
+    the paths of a collection are addressed through index, which is why
+    slicing and filtering only select from index and never copy vertices.
+    selections share the coordinate buffer with the collection they were
+    taken from, the same way numpy views do.
+
+    a PathCollection defers its translate, scale and rot calls into the
+    pending transform of its packed buffer. it is applied to all vertices
+    at once, as soon as anything reads them.
+    """
+
+    # columns of the metric table, see metrics()
+    METRICS = {
+        "count": np.int64,
+        "distance": np.float64,
+        "minx": np.float64,
+        "miny": np.float64,
+        "maxx": np.float64,
+        "maxy": np.float64,
+        "aspect_ratio": np.float64,
+        "centroid_x": np.float64,
+        "centroid_y": np.float64,
+        "shannon_x": np.float64,
+        "shannon_y": np.float64,
+        "shannon_direction_changes": np.float64,
+        "duration": np.float64,
+        "layer": object,
+        "pen_select": object,
+    }
+
+    def __init__(
+        self,
+        coords: np.ndarray,
+        offsets: np.ndarray,
+        layer: typing.Optional[np.ndarray] = None,
+        pen_select: typing.Optional[np.ndarray] = None,
+        line_type: typing.Optional[np.ndarray] = None,
+        velocity: typing.Optional[np.ndarray] = None,
+        pen_force: typing.Optional[np.ndarray] = None,
+        is_polygon: typing.Optional[np.ndarray] = None,
+        index: typing.Optional[np.ndarray] = None,
+        timestamp: typing.Optional[float] = None,
+    ):
+        self._buffer = np.asarray(coords, dtype=np.float64)
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+
+        count = self._offsets.shape[0] - 1
+        if count < 0 or self._offsets[-1] != self._buffer.shape[0]:
+            raise ValueError("offsets don't match the coordinate buffer")
+
+        def _column(values, default):
+            if values is None:
+                return np.full(count, default, dtype=object)
+            return np.asarray(values, dtype=object)
+
+        self.layer = _column(layer, None)
+        self.pen_select = _column(pen_select, None)
+        self.line_type = _column(line_type, None)
+        self.velocity = _column(velocity, None)
+        self.pen_force = _column(pen_force, None)
+        if is_polygon is None:
+            self.is_polygon = np.zeros(count, dtype=bool)
+        else:
+            self.is_polygon = np.asarray(is_polygon, dtype=bool)
+
+        if index is None:
+            self._index = np.arange(count, dtype=np.int64)
+        else:
+            self._index = np.asarray(index, dtype=np.int64)
+
+        self._timestamp = timestamp
+        self._views = None
+        self._pending: typing.Optional[np.ndarray] = None
+        # selections share buffer and pending transform with their root
+        self._root = self
+        # counts changes to the buffer, invalidates cached path metrics
+        self._version = 0
+
+    @classmethod
+    def from_paths(
+        cls,
+        paths: typing.Iterable[Path],
+        timestamp: typing.Optional[float] = None,
+        share: bool = False,
+    ) -> "PackedPathCollection":
+        """
+        packs a list of paths into one buffer. a path that is contained
+        more than once is only stored once.
+
+        with share=True every path is rebound to a view into the new buffer,
+        afterwards the paths and the packed collection work on the same
+        memory until a path has to reallocate (e.g. add() or clean())
+        """
+        unique = {}
+        unique_paths = []
+        index = []
+        for p in paths:
+            key = id(p)
+            if key not in unique:
+                unique[key] = len(unique_paths)
+                unique_paths.append(p)
+            index.append(unique[key])
+
+        lengths = np.fromiter(
+            (len(p) for p in unique_paths), dtype=np.int64, count=len(unique_paths)
+        )
+        offsets = np.zeros(len(unique_paths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        if len(unique_paths) > 0:
+            coords = np.concatenate([p._coords for p in unique_paths])
+        else:
+            coords = np.empty((0, 3), dtype=np.float64)
+
+        packed = cls(
+            coords,
+            offsets,
+            layer=[p.layer for p in unique_paths],
+            pen_select=[p.pen_select for p in unique_paths],
+            line_type=[p._line_type for p in unique_paths],
+            velocity=[p.velocity for p in unique_paths],
+            pen_force=[p.pen_force for p in unique_paths],
+            is_polygon=[bool(p.is_polygon) for p in unique_paths],
+            index=index,
+            timestamp=timestamp,
+        )
+
+        if share:
+            views = []
+            for i, p in enumerate(unique_paths):
+                view = packed._buffer[offsets[i]: offsets[i + 1]]
+                p._bind(view, packed)
+                views.append(view)
+            packed._views = views
+
+        return packed
+
+    def _shares(self, paths: typing.List[Path]) -> bool:
+        """
+        true if paths are exactly the paths this collection was packed from
+        with share=True, and none of them has reallocated its vertices since
+        """
+        if self._views is None or len(paths) != len(self._index):
+            return False
+
+        views = self._views
+        return all(p._buffer is views[i] for p, i in zip(paths, self._index.tolist()))
+
+    def _flush(self) -> None:
+        root = self._root
+        if root._pending is not None:
+            matrix = root._pending
+            root._pending = None
+            root._buffer[:, :2] = _apply_affine(root._buffer[:, :2], matrix)
+
+    def _defer(self, matrix: np.ndarray) -> None:
+        """
+        collects a transform for the whole buffer without applying it
+        """
+        root = self._root
+        root._version += 1
+        if root._pending is None:
+            root._pending = matrix
+        else:
+            root._pending = matrix @ root._pending
+
+    @property
+    def _coords(self) -> np.ndarray:
+        self._flush()
+        return self._buffer
+
+    def raw_bounds(self) -> typing.Optional[typing.Tuple[float, float, float, float]]:
+        """
+        minx, miny, maxx, maxy of all vertices, computed from the
+        untransformed buffer if the pending transform allows it
+        """
+        if self._buffer.shape[0] == 0:
+            return None
+
+        pending = self._root._pending
+        if pending is not None and self._is_full():
+            xy = self._buffer[:, :2]
+            raw = tuple(xy.min(axis=0).tolist() + xy.max(axis=0).tolist())
+            return _affine_bounds(raw, pending)
+
+        return None
+
+    @property
+    def coords(self) -> np.ndarray:
+        """
+        read-only view of the whole coordinate buffer
+        """
+        view = self._coords.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def offsets(self) -> np.ndarray:
+        view = self._offsets.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def index(self) -> np.ndarray:
+        view = self._index.view()
+        view.flags.writeable = False
+        return view
+
+    def timestamp(self) -> typing.Optional[float]:
+        return self._timestamp
+
+    def _is_full(self) -> bool:
+        count = self._offsets.shape[0] - 1
+        return len(self._index) == count and bool(
+            np.array_equal(self._index, np.arange(count))
+        )
+
+    def lengths(self) -> np.ndarray:
+        """
+        :return: vertex count for each path
+        """
+        return np.diff(self._offsets)[self._index]
+
+    def point_index(self) -> typing.Union[slice, np.ndarray]:
+        """
+        :return: rows of the coordinate buffer that belong to the selected
+        paths, in path order. a plain slice if every path is selected
+        """
+        if self._is_full():
+            return slice(None)
+
+        starts = self._offsets[:-1][self._index]
+        lengths = self.lengths()
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+
+        # for every row: start of its path minus the rows before that path
+        path_start_rows = np.cumsum(lengths) - lengths
+        return np.repeat(starts - path_start_rows, lengths) + np.arange(total)
+
+    def points(self) -> np.ndarray:
+        """
+        :return: (M, 3) vertices of all selected paths, in path order
+        """
+        return self._coords[self.point_index()]
+
+    def arrays(self) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: coords and offsets of only the selected paths, in path
+        order. always copies
+        """
+        lengths = self.lengths()
+        offsets = np.zeros(lengths.shape[0] + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return np.array(self.points()), offsets
+
+    def path_bounds(self) -> np.ndarray:
+        """
+        :return: (N, 4) array with minx, miny, maxx, maxy of every path.
+        empty paths get nan bounds
+        """
+        count = self._offsets.shape[0] - 1
+        bounds = np.full((count, 4), np.nan)
+
+        starts = self._offsets[:-1]
+        nonempty = np.diff(self._offsets) > 0
+        if nonempty.any():
+            xy = self._coords[:, :2]
+            bounds[nonempty, :2] = np.minimum.reduceat(xy, starts[nonempty], axis=0)
+            bounds[nonempty, 2:] = np.maximum.reduceat(xy, starts[nonempty], axis=0)
+
+        return bounds[self._index]
+
+    def endpoints(self) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: (N, 2) first and (N, 2) last vertex of every selected path
+        """
+        xy = self._coords[:, :2]
+        first = self._offsets[:-1][self._index]
+        last = np.maximum(self._offsets[1:][self._index] - 1, first)
+        return xy[first], xy[last]
+
+    def _pairs(self) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        :return: first and second vertex of all consecutive vertex pairs
+        within the selected paths, and the number of pairs of each path
+        """
+        points = self.points()[:, :2]
+        lengths = self.lengths()
+
+        first = np.ones(points.shape[0], dtype=bool)
+        first[np.cumsum(lengths)[lengths > 0] - 1] = False
+        rows = np.flatnonzero(first)
+
+        return points[rows], points[rows + 1], np.maximum(lengths - 1, 0)
+
+    def direction_changes(self) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        Path.direction_changes for all paths
+        :return: the angles back to back and the number of angles per path
+        """
+        a, b, counts = self._pairs()
+        return _direction_changes(a, b), counts
+
+    def shannon_x(self) -> np.ndarray:
+        a, b, counts = self._pairs()
+        return _segment_entropy(b[:, 0] - a[:, 0], counts)
+
+    def shannon_y(self) -> np.ndarray:
+        a, b, counts = self._pairs()
+        return _segment_entropy(b[:, 1] - a[:, 1], counts)
+
+    def shannon_direction_changes(self) -> np.ndarray:
+        return _segment_entropy(*self.direction_changes())
+
+    def metrics(
+        self, columns: typing.Optional[typing.Iterable[str]] = None
+    ) -> np.ndarray:
+        """
+        structured array with one row per selected path and the per path
+        metrics as columns, see METRICS. everything is computed over the
+        whole buffer at once, only for the given columns (default: all).
+        empty paths get nan bounds, centroid and aspect ratio
+        """
+        columns = list(self.METRICS if columns is None else columns)
+        unknown = [c for c in columns if c not in self.METRICS]
+        if unknown:
+            raise ValueError(f"Unknown metrics {unknown}")
+
+        table = np.empty(len(self), dtype=[(c, self.METRICS[c]) for c in columns])
+        wanted = set(columns)
+        lengths = self.lengths()
+        nonempty = lengths > 0
+
+        if "count" in wanted:
+            table["count"] = lengths
+        if "layer" in wanted:
+            table["layer"] = self.layer[self._index]
+        if "pen_select" in wanted:
+            table["pen_select"] = self.pen_select[self._index]
+
+        if wanted & {"minx", "miny", "maxx", "maxy", "aspect_ratio"}:
+            bounds = self.path_bounds()
+            for i, c in enumerate(("minx", "miny", "maxx", "maxy")):
+                if c in wanted:
+                    table[c] = bounds[:, i]
+            if "aspect_ratio" in wanted:
+                w = bounds[:, 2] - bounds[:, 0]
+                w[w == 0.0] = 0.001
+                table["aspect_ratio"] = (bounds[:, 3] - bounds[:, 1]) / w
+
+        if wanted & {"centroid_x", "centroid_y", "duration"}:
+            points = self.points()
+            starts = (np.cumsum(lengths) - lengths)[nonempty]
+            if "centroid_x" in wanted or "centroid_y" in wanted:
+                centroid = np.full((len(self), 2), np.nan)
+                if starts.shape[0] > 0:
+                    sums = np.add.reduceat(points[:, :2], starts, axis=0)
+                    centroid[nonempty] = sums / lengths[nonempty, None]
+                if "centroid_x" in wanted:
+                    table["centroid_x"] = centroid[:, 0]
+                if "centroid_y" in wanted:
+                    table["centroid_y"] = centroid[:, 1]
+            if "duration" in wanted:
+                duration = np.zeros(len(self))
+                ends = starts + lengths[nonempty] - 1
+                duration[nonempty] = points[ends, 2] - points[starts, 2]
+                table["duration"] = duration
+
+        if wanted & {"distance", "shannon_x", "shannon_y", "shannon_direction_changes"}:
+            a, b, counts = self._pairs()
+            delta = b - a
+            if "distance" in wanted:
+                distance = np.zeros(len(self))
+                has_pairs = counts > 0
+                if has_pairs.any():
+                    starts = (np.cumsum(counts) - counts)[has_pairs]
+                    hypot = np.hypot(delta[:, 0], delta[:, 1])
+                    distance[has_pairs] = np.add.reduceat(hypot, starts)
+                table["distance"] = distance
+            if "shannon_x" in wanted:
+                table["shannon_x"] = _segment_entropy(delta[:, 0], counts)
+            if "shannon_y" in wanted:
+                table["shannon_y"] = _segment_entropy(delta[:, 1], counts)
+            if "shannon_direction_changes" in wanted:
+                table["shannon_direction_changes"] = _segment_entropy(
+                    _direction_changes(a, b), counts
+                )
+
+        return table
+
+    def min(self) -> typing.Tuple[float, float]:
+        bounds = self.raw_bounds()
+        if bounds is not None:
+            return bounds[0], bounds[1]
+        if self._is_full():
+            minx, miny = self._coords[:, :2].min(axis=0).tolist()
+        else:
+            minx, miny = np.nanmin(self.path_bounds()[:, :2], axis=0).tolist()
+        return minx, miny
+
+    def max(self) -> typing.Tuple[float, float]:
+        bounds = self.raw_bounds()
+        if bounds is not None:
+            return bounds[2], bounds[3]
+        if self._is_full():
+            maxx, maxy = self._coords[:, :2].max(axis=0).tolist()
+        else:
+            maxx, maxy = np.nanmax(self.path_bounds()[:, 2:], axis=0).tolist()
+        return maxx, maxy
+
+    def bb(self) -> BoundingBox:
+        bounds = self.raw_bounds()
+        if bounds is not None:
+            return BoundingBox(*bounds)
+        mi = self.min()
+        ma = self.max()
+        return BoundingBox(mi[0], mi[1], ma[0], ma[1])
+
+    def transform(
+        self, matrix: np.ndarray, origin: typing.Tuple[float, float] = (0.0, 0.0)
+    ) -> None:
+        """
+        applies a 3x3 affine transformation matrix relative to origin
+        to all selected vertices
+        """
+        self._root._version += 1
+        rows = self.point_index()
+        xy = self._coords[rows, :2] - origin
+        self._coords[rows, :2] = xy @ matrix[:2, :2].T + matrix[:2, 2]
+
+    def translate(self, x: float, y: float) -> None:
+        self._root._version += 1
+        rows = self.point_index()
+        self._coords[rows, 0] += x
+        self._coords[rows, 1] += y
+
+    def scale(self, x: float, y: float) -> None:
+        self._root._version += 1
+        rows = self.point_index()
+        self._coords[rows, 0] *= x
+        self._coords[rows, 1] *= y
+
+    def rot(
+        self, angle: float, origin: typing.Tuple[float, float] = (0.0, 0.0)
+    ) -> None:
+        ox, oy = origin
+        cos = math.cos(angle)
+        sin = math.sin(angle)
+
+        self._root._version += 1
+        rows = self.point_index()
+        dx = self._coords[rows, 0] - ox
+        dy = self._coords[rows, 1] - oy
+
+        self._coords[rows, 0] = ox + cos * dx - sin * dy
+        self._coords[rows, 1] = oy + sin * dx + cos * dy
+
+    def path(self, item: int) -> Path:
+        """
+        :return: the path at position item. its vertices are a view into
+        the coordinate buffer, nothing is copied
+        """
+        i = int(self._index[item])
+        p = Path(
+            layer=self.layer[i],
+            line_type=self.line_type[i],
+            pen_velocity=self.velocity[i],
+            pen_force=self.pen_force[i],
+            pen_select=self.pen_select[i],
+            is_polygon=bool(self.is_polygon[i]),
+        )
+        p._set_buffer(self._buffer[self._offsets[i]: self._offsets[i + 1]])
+        p._packed = self._root
+        return p
+
+    def unpack(self) -> "PathCollection":
+        """
+        :return: a PathCollection whose paths are views into this buffer
+        """
+        pc = PathCollection(self._timestamp)
+        paths = [self.path(i) for i in range(len(self))]
+        for p in paths:
+            pc.add(p)
+
+        # the collection keeps working on this buffer, unless it is shared
+        # with another collection already
+        if self._root is self and self._views is None and self._is_full():
+            if len(pc) == len(paths):
+                self._views = [p._buffer for p in paths]
+                pc._PathCollection__packed = self
+        return pc
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __getstate__(self) -> dict:
+        self._flush()
+        state = self.__dict__.copy()
+        state["_views"] = None
+        state["_root"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._root = self
+
+    def __iter__(self) -> typing.Iterator[Path]:
+        for i in range(len(self)):
+            yield self.path(i)
+
+    def __getitem__(
+        self, item: typing.Union[int, slice, list, np.ndarray]
+    ) -> typing.Union[Path, "PackedPathCollection"]:
+        if isinstance(item, (int, np.integer)):
+            if not -len(self) <= item < len(self):
+                raise IndexError(f"Index {item} too high. Maximum is {len(self)}")
+            return self.path(item)
+
+        selected = copy.copy(self)
+        selected._index = self._index[item]
+        selected._views = None
+        selected._root = self._root
+        return selected
+
+    def __repr__(self) -> str:
+        return (
+            f"PackedPathCollection(paths={len(self)}, "
+            f"vertices={self._buffer.shape[0]})"
+        )
+
+
+def _orientation(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """
+    sign of the cross product (b - a) x (c - a) for rows of points
+    """
+    cross = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (
+        c[:, 0] - a[:, 0]
+    )
+    return np.sign(cross)
+
+
+def _segments_cross(
+    a: np.ndarray, b: np.ndarray, c: np.ndarray, d: np.ndarray
+) -> np.ndarray:
+    """
+    true where segment a-b properly crosses segment c-d. touching and
+    collinear segments don't count, like in Path.intersect
+    """
+    return (_orientation(a, b, c) * _orientation(a, b, d) < 0) & (
+        _orientation(c, d, a) * _orientation(c, d, b) < 0
+    )
+
+
+class SegmentIndex:
+    """
+    uniform grid over the segments of many paths. every segment is listed
+    in all cells its bounding box touches, queries only look at the
+    segments in the cells they touch. paths can be added one by one, e.g.
+    while greedily accepting paths that don't intersect the ones so far.
+    the index keeps the vertices paths had when they were added, later
+    transforms of the paths are not picked up
+    """
+
+    # a batch whose segments cover more cells than this on average makes
+    # a derived cell size grow, see extend()
+    REGRID_CELLS = 16
+
+    def __init__(self, cell_size: typing.Optional[float] = None):
+        # without a cell size it is derived from the added paths and grows
+        # when later segments turn out to be much longer
+        self.__cell_size = cell_size
+        self.__derived = cell_size is None
+        self.__paths: typing.List[Path] = []
+        self.__cells: typing.Dict[int, typing.List[np.ndarray]] = {}
+        self.__start = np.empty((0, 2))
+        self.__end = np.empty((0, 2))
+        self.__owner = np.empty(0, dtype=np.int64)
+        self.__size = 0
+        self.__extent: typing.Optional[typing.List[int]] = None
+
+    @classmethod
+    def from_paths(
+        cls, paths: typing.Iterable[Path], cell_size: typing.Optional[float] = None
+    ) -> "SegmentIndex":
+        index = cls(cell_size)
+        index.extend(paths)
+        return index
+
+    @property
+    def cell_size(self) -> typing.Optional[float]:
+        return self.__cell_size
+
+    def __len__(self) -> int:
+        return len(self.__paths)
+
+    @staticmethod
+    def __segments(path: Path) -> typing.Tuple[np.ndarray, np.ndarray]:
+        xy = path.coords[:, :2]
+        if xy.shape[0] == 1:
+            # a single point is kept as a segment of length zero
+            return xy, xy
+        return xy[:-1], xy[1:]
+
+    def add(self, path: Path) -> None:
+        self.extend([path])
+
+    def extend(self, paths: typing.Iterable[Path]) -> None:
+        starts, ends, owners = [], [], []
+        for p in paths:
+            if p.empty():
+                continue
+            a, b = self.__segments(p)
+            starts.append(a)
+            ends.append(b)
+            owners.append(np.full(a.shape[0], len(self.__paths), dtype=np.int64))
+            self.__paths.append(p)
+
+        if len(starts) == 0:
+            return
+
+        start = np.concatenate(starts)
+        end = np.concatenate(ends)
+        owner = np.concatenate(owners)
+
+        if self.__cell_size is None:
+            self.__cell_size = self.__fitted_cell_size(start, end)
+
+        ids = np.arange(self.__size, self.__size + start.shape[0])
+        self.__append(start, end, owner)
+        lo, hi = np.minimum(start, end), np.maximum(start, end)
+
+        if self.__derived:
+            spans = self.__cell(hi) - self.__cell(lo) + 1
+            if spans.prod(axis=1).sum() > self.REGRID_CELLS * start.shape[0]:
+                size = self.__size
+                fitted = self.__fitted_cell_size(self.__start[:size], self.__end[:size])
+                # only regrid for a real change, every regrid covers it all again
+                if fitted >= 2.0 * self.__cell_size:
+                    self.__cell_size = fitted
+                    self.__regrid()
+                    return
+
+        self.__insert(lo, hi, ids)
+
+    @staticmethod
+    def __fitted_cell_size(start: np.ndarray, end: np.ndarray) -> float:
+        """
+        twice the mean segment length, but at least big enough that the
+        cells hold about one segment each over the extent of the segments
+        """
+        length = np.hypot(*(end - start).T)
+        lo = np.minimum(start, end).min(axis=0)
+        hi = np.maximum(start, end).max(axis=0)
+        spread = math.sqrt(float(np.prod(hi - lo)) / start.shape[0])
+        size = max(2.0 * float(length.mean()), spread)
+        return size if size > 0 else 1.0
+
+    def __regrid(self) -> None:
+        self.__cells = {}
+        self.__extent = None
+        size = self.__size
+        start, end = self.__start[:size], self.__end[:size]
+        self.__insert(np.minimum(start, end), np.maximum(start, end), np.arange(size))
+
+    def __insert(self, lo: np.ndarray, hi: np.ndarray, ids: np.ndarray) -> None:
+        keys, segment = self.__cover(lo, hi, ids)
+        order = np.argsort(keys, kind="stable")
+        keys, segment = keys[order], segment[order]
+        unique, first = np.unique(keys, return_index=True)
+        for key, group in zip(unique.tolist(), np.split(segment, first[1:])):
+            self.__cells.setdefault(key, []).append(group)
+
+    @staticmethod
+    def __grow(array: np.ndarray, capacity: int, size: int) -> np.ndarray:
+        grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+        grown[:size] = array[:size]
+        return grown
+
+    def __append(self, start: np.ndarray, end: np.ndarray, owner: np.ndarray) -> None:
+        size = self.__size
+        needed = size + start.shape[0]
+        if needed > self.__start.shape[0]:
+            capacity = max(needed, 2 * self.__start.shape[0], 64)
+            self.__start = self.__grow(self.__start, capacity, size)
+            self.__end = self.__grow(self.__end, capacity, size)
+            self.__owner = self.__grow(self.__owner, capacity, size)
+
+        self.__start[size:needed] = start
+        self.__end[size:needed] = end
+        self.__owner[size:needed] = owner
+        self.__size = needed
+
+    def __cell(self, xy: np.ndarray) -> np.ndarray:
+        return np.floor(xy / self.__cell_size).astype(np.int64)
+
+    @staticmethod
+    def __key(ix: np.ndarray, iy: np.ndarray) -> np.ndarray:
+        return ix * 4294967296 + iy
+
+    def __cover(
+        self, lo: np.ndarray, hi: np.ndarray, ids: np.ndarray
+    ) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: key of every cell the boxes lo-hi touch and the id of the
+        box for each of them
+        """
+        c0 = self.__cell(lo)
+        c1 = self.__cell(hi)
+        if self.__extent is None:
+            self.__extent = c0.min(axis=0).tolist() + c1.max(axis=0).tolist()
+        else:
+            e = self.__extent
+            e[:2] = np.minimum(e[:2], c0.min(axis=0)).tolist()
+            e[2:] = np.maximum(e[2:], c1.max(axis=0)).tolist()
+
+        return self.__expand(c0, c1, ids)
+
+    def __expand(
+        self, c0: np.ndarray, c1: np.ndarray, ids: np.ndarray
+    ) -> typing.Tuple[np.ndarray, np.ndarray]:
+        w = c1[:, 0] - c0[:, 0] + 1
+        h = c1[:, 1] - c0[:, 1] + 1
+        counts = w * h
+        total = int(counts.sum())
+        box = np.repeat(np.arange(c0.shape[0]), counts)
+        first = np.cumsum(counts) - counts
+        local = np.arange(total) - first[box]
+        ix = c0[box, 0] + local % w[box]
+        iy = c0[box, 1] + local // w[box]
+        return self.__key(ix, iy), ids[box]
+
+    def __candidates(
+        self, lo: np.ndarray, hi: np.ndarray
+    ) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: pairs of query box and indexed segment that share a cell
+        """
+        if self.__size == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+
+        keys, box = self.__expand(
+            self.__cell(lo), self.__cell(hi), np.arange(lo.shape[0])
+        )
+        return self.__lookup(keys, box)
+
+    def __lookup(
+        self, keys: np.ndarray, box: np.ndarray
+    ) -> typing.Tuple[np.ndarray, np.ndarray]:
+        queries, segments = [], []
+        cells = self.__cells
+        for key, b in zip(keys.tolist(), box.tolist()):
+            groups = cells.get(key)
+            if groups is None:
+                continue
+            for group in groups:
+                segments.append(group)
+                queries.append(np.full(group.shape[0], b, dtype=np.int64))
+
+        if len(segments) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        return np.concatenate(queries), np.concatenate(segments)
+
+    def intersections(self, path: Path) -> typing.List[Path]:
+        """
+        :return: indexed paths that path crosses, in the order they were added
+        """
+        if self.__size == 0 or len(path) < 2:
+            return []
+
+        a, b = self.__segments(path)
+        query, segment = self.__candidates(np.minimum(a, b), np.maximum(a, b))
+        if query.shape[0] == 0:
+            return []
+
+        hit = _segments_cross(
+            a[query], b[query], self.__start[segment], self.__end[segment]
+        )
+        owners = np.unique(self.__owner[segment[hit]])
+        return [self.__paths[i] for i in owners.tolist()]
+
+    def intersects(self, path: Path) -> bool:
+        return len(self.intersections(path)) > 0
+
+    def query_bbox(self, bb: BoundingBox) -> typing.List[Path]:
+        """
+        :return: indexed paths with at least one segment inside or crossing
+        bb, in the order they were added
+        """
+        if self.__size == 0:
+            return []
+
+        lo = np.array([[min(bb.x, bb.x2), min(bb.y, bb.y2)]])
+        hi = np.array([[max(bb.x, bb.x2), max(bb.y, bb.y2)]])
+        _, segment = self.__candidates(lo, hi)
+        if segment.shape[0] == 0:
+            return []
+
+        a, b = self.__start[segment], self.__end[segment]
+        inside = np.zeros(segment.shape[0], dtype=bool)
+        for p in (a, b):
+            inside |= np.all((p >= lo) & (p <= hi), axis=1)
+
+        corners = np.array([lo[0], [hi[0, 0], lo[0, 1]], hi[0], [lo[0, 0], hi[0, 1]]])
+        for i in range(4):
+            c = np.broadcast_to(corners[i], a.shape)
+            d = np.broadcast_to(corners[(i + 1) % 4], a.shape)
+            inside |= _segments_cross(a, b, c, d)
+
+        owners = np.unique(self.__owner[segment[inside]])
+        return [self.__paths[i] for i in owners.tolist()]
+
+    def nearest(
+        self, point: typing.Union["TimedPosition", typing.Tuple[float, float]]
+    ) -> typing.Optional[typing.Tuple[Path, float]]:
+        """
+        looks at rings of cells around the point until no segment outside
+        of them can be closer than the closest one found
+        :return: the closest indexed path and its distance, None if empty
+        """
+        if self.__size == 0:
+            return None
+
+        if isinstance(point, TimedPosition):
+            point = (point.x, point.y)
+        xy = np.array([point], dtype=float)
+        center = self.__cell(xy)[0]
+        e = self.__extent
+        # rings beyond this one don't contain any cell of the index
+        last = int(
+            max(
+                abs(center[0] - e[0]),
+                abs(center[0] - e[2]),
+                abs(center[1] - e[1]),
+                abs(center[1] - e[3]),
+            )
+        )
+
+        best, best_distance = -1, math.inf
+        for ring in range(last + 1):
+            keys = self.__ring(center, ring)
+            _, segment = self.__lookup(keys, np.zeros(keys.shape[0], dtype=np.int64))
+            if segment.shape[0] > 0:
+                a, b = self.__start[segment], self.__end[segment]
+                ab = b - a
+                norm = (ab * ab).sum(axis=1)
+                t = np.clip(
+                    ((xy - a) * ab).sum(axis=1) / np.where(norm > 0, norm, 1.0),
+                    0.0,
+                    1.0,
+                )
+                closest = a + ab * t[:, None]
+                distance = np.hypot(*(closest - xy).T)
+                i = int(np.argmin(distance))
+                if distance[i] < best_distance:
+                    best = int(self.__owner[segment[i]])
+                    best_distance = float(distance[i])
+            # everything outside the searched square is at least this far
+            if best >= 0 and best_distance <= ring * self.__cell_size:
+                break
+
+        return self.__paths[best], best_distance
+
+    def __ring(self, center: np.ndarray, ring: int) -> np.ndarray:
+        """
+        :return: keys of the cells exactly ring cells away from center, only
+        the ones within the extent of the index
+        """
+        cx, cy = int(center[0]), int(center[1])
+        x0, y0, x1, y1 = self.__extent
+        if ring == 0:
+            if x0 <= cx <= x1 and y0 <= cy <= y1:
+                return self.__key(np.array([cx]), np.array([cy]))
+            return np.empty(0, dtype=np.int64)
+
+        # top and bottom row, then the columns between them
+        parts = []
+        xs = np.arange(max(cx - ring, x0), min(cx + ring, x1) + 1)
+        for iy in (cy - ring, cy + ring):
+            if y0 <= iy <= y1:
+                parts.append(self.__key(xs, np.full(xs.shape[0], iy)))
+        ys = np.arange(max(cy - ring + 1, y0), min(cy + ring - 1, y1) + 1)
+        for ix in (cx - ring, cx + ring):
+            if x0 <= ix <= x1:
+                parts.append(self.__key(np.full(ys.shape[0], ix), ys))
+
+        if len(parts) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(parts)
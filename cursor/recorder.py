@@ -15,17 +15,27 @@ log = wasabi.Printer()
 
 
 class Recorder:
-    _timer = True
     _mouse_recordings = path.PathCollection()
     _keyboard_recodings = []
     _current_line = path.Path()
     _started = False
     _start_time_stamp = None
     _resolution = pyautogui.size()
+    # paths and keys that are in the segment log already
+    _saved_paths = 0
+    _saved_keys = 0
+    # seconds between two writes of the segment log
+    _save_interval = 10
+    _closed = False
 
     def __init__(self):
-        self._start_time_stamp = data.DateHandler.utc_timestamp()
-        atexit.register(self.save)
+        # the input hooks only append to the current line and the key list,
+        # everything else happens in the writer thread
+        self._clock = data.UtcClock()
+        self._start_time_stamp = self._clock.now()
+        self._save_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        atexit.register(self.close)
 
         log.good("Setting up mouse hook")
         self.mouse_listener = pynput.mouse.Listener(
@@ -39,38 +49,45 @@ class Recorder:
         )
         self.key_listener.start()
 
-        save_event = threading.Event()
-        self.__save_async(save_event)
+        self._writer = threading.Thread(
+            target=self.__write_loop, name="cursor-writer", daemon=True
+        )
+        self._writer.start()
 
         log.good("Started cursor recorder")
 
     def stop(self):
-        self._timer.cancel()
-
-    def __save_async(self, f_stop):
-        self.save()
-        if not f_stop.is_set():
-            # every 10s
-            self._timer = threading.Timer(10, self.__save_async, [f_stop])
-            self._timer.start()
+        self._stop_event.set()
+        self._writer.join()
+
+    def __write_loop(self):
+        while True:
+            self.save()
+            self.__update_counter()
+            if self._stop_event.wait(self._save_interval):
+                break
+
+    def __update_counter(self):
+        global counter
+        counter = f"mouse: {len(self._mouse_recordings)} keys: {len(self._keyboard_recodings)}"
+        if icon is not None:
+            icon.update_menu()
 
     def on_move(self, x, y):
         _x = x / self._resolution[0]
         _y = y / self._resolution[1]
-        self._current_line.add(_x, _y, data.DateHandler.utc_timestamp())
+        self._current_line.add(_x, _y, self._clock.now())
 
     def on_click(self, x, y, button, pressed):
         if not self._started and pressed:
             _x = x / self._resolution[0]
             _y = y / self._resolution[1]
-            self._current_line.add(_x, _y, data.DateHandler.utc_timestamp())
+            self._current_line.add(_x, _y, self._clock.now())
             self._started = True
         elif self._started and pressed:
-            self._mouse_recordings.add(self._current_line.copy())
-            global counter, icon
-            counter = f"mouse: {len(self._mouse_recordings)} keys: {len(self._keyboard_recodings)}"
-            icon.update_menu()
-            self._current_line.clear()
+            # hand the finished line over as it is, no copy
+            line, self._current_line = self._current_line, path.Path()
+            self._mouse_recordings.add(line)
 
     def on_press(self, btn):
         try:
@@ -81,9 +98,7 @@ class Recorder:
                 log.fail(f"Couldn't save key because of {ae}")
                 return
 
-        t = (key, data.DateHandler.utc_timestamp(), 1)
-        print(t)
-        self._keyboard_recodings.append(t)
+        self._keyboard_recodings.append((key, self._clock.now(), 1))
 
     def on_release(self, btn):
         try:
@@ -94,22 +109,69 @@ class Recorder:
                 log.fail(f"Couldn't save key because of {ae}")
                 return
 
-        t = (key, data.DateHandler.utc_timestamp(), 0)
-        print(t)
-        self._keyboard_recodings.append(t)
+        self._keyboard_recodings.append((key, self._clock.now(), 0))
 
-    def save(self):
+    def __segments(self) -> data.SegmentedRecording:
         save_path = data.DataDirHandler().recordings()
         save_path.mkdir(parents=True, exist_ok=True)
+        fname = save_path / (
+            str(self._start_time_stamp) + data.SegmentedRecording.SUFFIX
+        )
+        return data.SegmentedRecording(fname)
 
-        recs = {"mouse": self._mouse_recordings, "keys": self._keyboard_recodings}
+    def save(self):
+        """
+        appends everything recorded since the last save to the segment log
+        """
+        with self._save_lock:
+            self.__append()
+
+    def __append(self):
+        saved_paths, saved_keys = self._saved_paths, self._saved_keys
+        paths = self._mouse_recordings.get_all()[saved_paths:]
+        keys = self._keyboard_recodings[saved_keys:]
+        if len(paths) == 0 and len(keys) == 0:
+            return
+
+        segments = self.__segments()
+        log.good(f"Saving mouse recordings: {len(paths)}")
+        log.good(f"Saving keyboard recordings: {len(keys)}")
+        log.good(f"Appending to {segments.fname.as_posix()}")
+
+        segments.append(paths, keys, self._start_time_stamp, list(self._resolution))
+        self._saved_paths += len(paths)
+        self._saved_keys += len(keys)
+
+    def close(self):
+        """
+        stops recording, saves the rest and compacts the segment log into a
+        binary recording. the whole session is also written as
+        <ts>_compressed.json, the recording format other tools read. only
+        the first call does anything
+        """
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+
+        self.mouse_listener.stop()
+        self.key_listener.stop()
+        self.stop()
+        self.save()
+        segments = self.__segments()
+        if segments.fname.is_file():
+            self.__save_json(segments.compact())
 
-        fname_compressed = save_path / (
-            str(self._start_time_stamp) + "_compressed.json"
+    @staticmethod
+    def __save_json(fname: pathlib.Path):
+        # read into memory, a mapped file couldn't be compacted onto later
+        with open(fname.as_posix(), "rb") as fp:
+            recs = data.BinaryRecording().from_bytes(fp.read())
+        recs = {"mouse": recs["mouse"], "keys": recs["keys"]}
+
+        fname_compressed = fname.parent / (
+            fname.name[: -len(data.BinaryRecording.SUFFIX)] + "_compressed.json"
         )
-
-        log.good(f"Saving mouse recordings: {len(self._mouse_recordings)}")
-        log.good(f"Saving keyboard recordings: {len(self._keyboard_recodings)}")
         log.good(f"Saving compressed to {fname_compressed.as_posix()}")
 
         with open(fname_compressed.as_posix(), "w") as fp:
@@ -180,7 +242,7 @@ icon = None
 
 def save_exit(icon, item):
     global rr
-    rr.save()
+    rr.close()
     icon.stop()
 
 
@@ -1,14 +1,18 @@
 import os
 import typing
+import json
+import time
+import concurrent.futures
+from xml.sax.saxutils import quoteattr
 
 from cursor.path import PathCollection
 from cursor.path import Path
+from cursor.path import PackedPathCollection
 from cursor.path import BoundingBox
 
-import svgwrite
 import pathlib
 import wasabi
-import copy
+import numpy as np
 from PIL import Image, ImageDraw
 
 log = wasabi.Printer()
@@ -37,16 +41,18 @@ class PathIterator:
 
         for p in self.paths:
             is_first_vertex = True
+            # iterating a path creates fresh positions already, only the
+            # start of the next connection needs its own copy
             for point in p:
                 if is_first_vertex:
-                    prev = copy.deepcopy(point)
+                    prev = point
                     is_first_vertex = False
 
                     continue
 
                 start = prev
-                end = copy.deepcopy(point)
-                prev = copy.deepcopy(point)
+                end = point
+                prev = point.copy()
 
                 yield start, end
 
@@ -83,37 +89,214 @@ class SvgRenderer:
         self.paths.add(p1)
 
     def save(self, filename: str):
-        bb = self.paths.bb()
-
         pathlib.Path(self.save_path).mkdir(parents=True, exist_ok=True)
 
         fname = self.save_path / (filename + ".svg")
-        self.dwg = svgwrite.Drawing(
-            fname.as_posix(), profile="tiny", size=(bb.x2 + bb.x, bb.y2 + bb.y)
+        with open(fname.as_posix(), "w") as file:
+            self.write(file)
+
+        log.good(f"Finished saving {fname}")
+
+    def write(self, out: typing.TextIO) -> None:
+        """
+        streams the drawing into any writable. every path becomes one
+        polyline, paths are grouped into one inkscape layer per layer and
+        pen, in the order the groups first appear
+        """
+        # detached copy, pack() or bb() would rebind the paths of the caller
+        packed = PackedPathCollection.from_paths(self.paths)
+        bb = packed.bb()
+        out.write(
+            '<?xml version="1.0" encoding="utf-8" ?>\n'
+            f'<svg baseProfile="tiny" height="{bb.y2 + bb.y}" version="1.2" width="{bb.x2 + bb.x}" '
+            'xmlns="http://www.w3.org/2000/svg" '
+            'xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape" '
+            'xmlns:xlink="http://www.w3.org/1999/xlink"><defs />\n'
         )
 
-        it = PathIterator(self.paths)
-        for conn in it.connections():
-            start = conn[0]
-            end = conn[1]
+        groups: typing.Dict[tuple, list] = {}
+        for i, p in enumerate(self.paths):
+            groups.setdefault((p.layer, p.pen_select), []).append(i)
 
-            self.dwg.add(
-                self.dwg.line(
-                    start.pos(),
-                    end.pos(),
-                    stroke_width=0.5,
-                    stroke=svgwrite.rgb(0, 0, 0, "%"),
-                )
+        xy = packed.points()[:, :2]
+        offsets = np.zeros(len(packed) + 1, dtype=np.int64)
+        np.cumsum(packed.lengths(), out=offsets[1:])
+        offsets = offsets.tolist()
+
+        for (layer, pen), indices in groups.items():
+            label = str(layer) if pen is None else f"{layer} pen{pen}"
+            out.write(
+                f'<g fill="none" inkscape:groupmode="layer" inkscape:label={quoteattr(label)} '
+                'stroke="rgb(0%,0%,0%)" stroke-width="0.5">\n'
             )
+            for i in indices:
+                start, stop = offsets[i], offsets[i + 1]
+                # single points have no connection
+                if stop - start < 2:
+                    continue
+                points = ("%.8g,%.8g " * (stop - start)) % tuple(
+                    xy[start:stop].ravel().tolist()
+                )
+                out.write(f'<polyline points="{points[:-1]}" />\n')
+            out.write("</g>\n")
 
-        pathlib.Path(self.save_path).mkdir(parents=True, exist_ok=True)
+        out.write("</svg>\n")
+
+
+def _circle_centres(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """
+    centres of the circles through the rows of a, b and c, not finite where
+    the three points are collinear
+    """
+    b = b - a
+    c = c - a
+    d = 2.0 * (b[:, 0] * c[:, 1] - b[:, 1] * c[:, 0])
+    bb = (b * b).sum(axis=1)
+    cc = (c * c).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ux = (c[:, 1] * bb - b[:, 1] * cc) / d
+        uy = (b[:, 0] * cc - c[:, 0] * bb) / d
+
+    return a + np.column_stack([ux, uy])
 
-        log.good(f"Finished saving {fname}")
 
-        self.dwg.save()
+def _arc_sweep(
+    xy: np.ndarray, centre: np.ndarray, tolerance: float, closed: bool = False
+) -> typing.Optional[float]:
+    """
+    :return: signed sweep in radians of the arc around centre through all of
+    xy. None if a vertex or chord midpoint leaves the circle by more than
+    tolerance or if the run turns back
+    """
+    if not np.isfinite(centre).all():
+        return None
+
+    rel = xy - centre
+    radii = np.hypot(rel[:, 0], rel[:, 1])
+    r = radii[0]
+    if np.abs(radii - r).max() > tolerance:
+        return None
+
+    steps = np.diff(np.arctan2(rel[:, 1], rel[:, 0]))
+    steps = (steps + np.pi) % (2.0 * np.pi) - np.pi
+    if not ((steps > 0.0).all() or (steps < 0.0).all()):
+        return None
+
+    # the widest step has the largest sagitta between chord and arc
+    if r * (1.0 - np.cos(np.abs(steps).max() / 2.0)) > tolerance:
+        return None
+
+    sweep = float(steps.sum())
+    if closed:
+        gap = abs(abs(sweep) - 2.0 * np.pi) * r
+        return float(np.copysign(2.0 * np.pi, sweep)) if gap <= tolerance else None
+    if abs(sweep) >= 2.0 * np.pi - 1e-6:
+        return None
+
+    return sweep
+
+
+def _fit_arc(
+    xy: np.ndarray, start: int, end: int, tolerance: float
+) -> typing.Optional[tuple]:
+    # an arc back onto its start would read as a full circle
+    if (xy[start] == xy[end]).all():
+        return None
+
+    middle = (start + end) // 2
+    centre = _circle_centres(xy[[start]], xy[[middle]], xy[[end]])[0]
+    stop = end + 1
+    sweep = _arc_sweep(xy[start:stop], centre, tolerance)
+    if sweep is None:
+        return None
+
+    return start, end, float(centre[0]), float(centre[1]), sweep
+
+
+def _fit_arcs(
+    xy: np.ndarray, tolerance: float, min_points: int = 5
+) -> typing.List[tuple]:
+    """
+    greedy arc detection along a polyline. candidate starts are screened in
+    bulk with a circle through every window of min_points vertices, each
+    candidate run then grows by doubling and bisection for as long as the
+    circle through its first, middle and last vertex holds all of it
+
+    :return: (start, end, cx, cy, sweep) per arc, end inclusive and sweep in
+    radians, positive counter-clockwise. a path that closes within tolerance
+    on a single circle is one arc with a sweep of +-2pi
+    """
+    n = len(xy)
+    if n < min_points:
+        return []
+
+    if n > min_points and np.hypot(*(xy[0] - xy[-1])) <= tolerance:
+        centre = _circle_centres(xy[[0]], xy[[n // 3]], xy[[2 * n // 3]])[0]
+        sweep = _arc_sweep(xy, centre, tolerance, closed=True)
+        if sweep is not None:
+            return [(0, n - 1, float(centre[0]), float(centre[1]), sweep)]
+
+    w = min_points - 1
+    count = n - w
+    middle = w // 2
+    stop = middle + count
+    centres = _circle_centres(xy[:count], xy[middle:stop], xy[w:])
+    half_chords = np.hypot(*np.diff(xy, axis=0).T) / 2.0
+    with np.errstate(invalid="ignore"):
+        rel = xy[:count] - centres
+        r = np.hypot(rel[:, 0], rel[:, 1])
+        ok = np.isfinite(r)
+        for k in range(w):
+            stop = k + count
+            rel = xy[k:stop] - centres
+            ok &= np.abs(np.hypot(rel[:, 0], rel[:, 1]) - r) <= tolerance
+            sagitta = r - np.sqrt(np.maximum(r * r - half_chords[k:stop] ** 2, 0.0))
+            ok &= sagitta <= tolerance
+
+    arcs = []
+    end = 0
+    for start in np.flatnonzero(ok).tolist():
+        if start < end:
+            continue
+        arc = _fit_arc(xy, start, start + w, tolerance)
+        if arc is None:
+            continue
+
+        good, bad = start + w, None
+        while True:
+            if bad is None:
+                probe = min(start + 2 * (good - start), n - 1)
+                if probe == good:
+                    break
+            else:
+                if bad - good <= 1:
+                    break
+                probe = (good + bad) // 2
+            fit = _fit_arc(xy, start, probe, tolerance)
+            if fit is None:
+                bad = probe
+            else:
+                good, arc = probe, fit
+
+        # runs that stay within tolerance of their chord are left as lines
+        _, _, cx, cy, sweep = arc
+        r = np.hypot(xy[start, 0] - cx, xy[start, 1] - cy)
+        if r * (1.0 - np.cos(min(abs(sweep), np.pi) / 2.0)) <= tolerance:
+            continue
+
+        arcs.append(arc)
+        end = good
+
+    return arcs
 
 
 class GCodeRenderer:
+    # vertices formatted per write, bounds the size of the buffered chunks
+    CHUNK_POINTS = 1 << 16
+
+    # row kinds of the program table
+    __Z_UP, __Z_DOWN, __TRAVEL, __DRAW, __ARC_CW, __ARC_CCW = range(6)
+
     def __init__(
         self,
         folder,
@@ -122,7 +305,15 @@ class GCodeRenderer:
         z_down=3.5,
         z_up=0.0,
         invert_y=True,
+        travel_g0=False,
+        arc_tolerance=None,
     ):
+        """
+        feedrates are in units per minute. travel_g0=True moves between paths
+        with G00 rapids instead of G01 at feedrate_xy. arc_tolerance replaces
+        runs of vertices on a circle with G02/G03 arcs, closed circles are
+        split into two halves
+        """
         assert isinstance(folder, pathlib.Path), "Only path objects allowed"
 
         self.save_path = folder
@@ -131,6 +322,8 @@ class GCodeRenderer:
         self.feedrate_xy = feedrate_xy
         self.feedrate_z = feedrate_z
         self.invert_y = invert_y
+        self.travel_g0 = travel_g0
+        self.arc_tolerance = arc_tolerance
         self.paths = PathCollection()
         self.bbs = []
 
@@ -147,57 +340,230 @@ class GCodeRenderer:
         assert isinstance(bb, BoundingBox), "Only BoundingBox objects allowed"
         self.bbs.append(bb)
 
-    def save(self, filename: str):
+    def save(self, filename: str) -> typing.Optional[typing.Tuple[int, float]]:
         try:
             pathlib.Path(self.save_path).mkdir(parents=True, exist_ok=True)
             fname = self.save_path / (filename + ".nc")
             with open(fname.as_posix(), "w") as file:
-                file.write(f"G01 Z0.0 F{self.feedrate_z}\n")
-                self.__append_to_file(file, 0.0, 0.0)
-                for p in self.paths:
-                    x = p.start_pos().x
-                    y = p.start_pos().y
-                    if self.invert_y:
-                        y = -y
-                    self.__append_to_file(file, x, y)
-                    file.write(f"G01 Z{self.z_down} F{self.feedrate_z}\n")
-                    for line in p.vertices:
-                        x = line.x
-                        y = line.y
-                        if self.invert_y:
-                            y = -y
-                        self.__append_to_file(file, x, y)
-                    file.write(f"G01 Z{self.z_up} F{self.feedrate_z}\n")
-
-                for bb in self.bbs:
-                    _x = bb.x
-                    _y = bb.y
-                    if self.invert_y:
-                        _y = -_y
-                    _w = bb.x2
-                    _h = bb.y2
-                    if self.invert_y:
-                        _h = -_h
-                    file.write(f"G01 Z0.0 F{self.feedrate_z}\n")
-                    self.__append_to_file(file, _x, _y)
-                    file.write(f"G01 Z{self.z_down} F{self.feedrate_z}\n")
-                    self.__append_to_file(file, _x, _h)
-                    self.__append_to_file(file, _w, _h)
-                    self.__append_to_file(file, _w, _y)
-                    self.__append_to_file(file, _x, _y)
-
-                file.write(f"G01 Z0.0 F{self.feedrate_z}\n")
-                self.__append_to_file(file, 0.0, 0.0)
-            log.good(f"Finished saving {fname}")
+                lines, seconds = self.write(file)
+            estimate = time.strftime("%H:%M:%S", time.gmtime(seconds))
+            log.good(f"Finished saving {fname}: {lines} lines, ~{estimate}")
+            return lines, seconds
         except DrawingOutOfBoundsException as e:
             log.fail(f"Couldn't generate GCode- Out of Bounds with position {e}")
 
-    def __append_to_file(self, file, x, y):
-        # if y < DrawingMachine.Plotter.MAX_Y:
-        #    raise DrawingOutOfBoundsException(y)
-        # if x > DrawingMachine.Plotter.MAX_X:
-        #    raise DrawingOutOfBoundsException(x)
-        file.write(f"G01 X{x:.2f} Y{y:.2f} F{self.feedrate_xy}\n")
+    def write(self, out: typing.TextIO) -> typing.Tuple[int, float]:
+        """
+        streams the program into any writable, formatted in chunks of paths.
+        feedrate and unchanged axes are only written when they change, and the
+        pen stays down when a path starts where the previous one ended
+
+        :return: number of lines and estimated job time in seconds, ignoring
+        acceleration
+        """
+        self.__templates = self.__build_templates()
+        self.__xy = np.zeros(2)
+        self.__z = self.z_up
+        self.__feed = self.feedrate_xy
+        self.__lines = 2
+        self.__seconds = 0.0
+        out.write(f"G01 Z{self.z_up} F{self.feedrate_z}\n")
+        out.write(f"G01 X0.00 Y0.00 F{self.feedrate_xy}\n")
+
+        chunk = []
+        points = 0
+        for xy in self.__polylines():
+            chunk.append(xy)
+            points += len(xy)
+            if points >= self.CHUNK_POINTS:
+                out.write(self.__format(chunk))
+                chunk = []
+                points = 0
+        if chunk:
+            out.write(self.__format(chunk))
+
+        # park with the same elision rules as a travel to the origin
+        if self.__z != self.z_up:
+            out.write(f"G01 Z{self.z_up} F{self.feedrate_z}\n")
+            self.__seconds += abs(self.__z - self.z_up) / self.feedrate_z * 60.0
+            self.__lines += 1
+        out.write(f"G01 X0.00 Y0.00 F{self.feedrate_xy}\n")
+        self.__seconds += np.hypot(*self.__xy) / self.feedrate_xy * 60.0
+        self.__lines += 1
+
+        return self.__lines, float(self.__seconds)
+
+    def __polylines(self) -> typing.Iterator[np.ndarray]:
+        for p in self.paths:
+            if len(p) > 0:
+                yield self.__machine_xy(p.coords[:, :2])
+
+        for bb in self.bbs:
+            corners = [
+                [bb.x, bb.y],
+                [bb.x, bb.y2],
+                [bb.x2, bb.y2],
+                [bb.x2, bb.y],
+                [bb.x, bb.y],
+            ]
+            yield self.__machine_xy(np.array(corners, dtype=float))
+
+    def __machine_xy(self, xy: np.ndarray) -> np.ndarray:
+        # compare in output precision; adding 0.0 turns -0.0 into 0.0
+        xy = np.round(xy, 2) + 0.0
+        if self.invert_y:
+            xy[:, 1] = 0.0 - xy[:, 1]
+        return xy
+
+    def __build_templates(self) -> np.ndarray:
+        # indexed by kind * 8 + x changed + 2 * y changed + 4 * feed changed
+        templates = []
+        for kind in range(6):
+            for code in range(8):
+                if kind == self.__Z_UP or kind == self.__Z_DOWN:
+                    z = self.z_up if kind == self.__Z_UP else self.z_down
+                    line = f"G01 Z{z}"
+                    feed = self.feedrate_z
+                else:
+                    rapid = kind == self.__TRAVEL and self.travel_g0
+                    line = {self.__ARC_CW: "G02", self.__ARC_CCW: "G03"}.get(
+                        kind, "G00" if rapid else "G01"
+                    )
+                    line += " X%.2f" if code & 1 else ""
+                    line += " Y%.2f" if code & 2 else ""
+                    if kind >= self.__ARC_CW:
+                        # centre offsets need more digits than the endpoints
+                        # to keep both ends on the same radius
+                        line += " I%.4f J%.4f"
+                    feed = self.feedrate_xy
+                if code & 4:
+                    line += f" F{feed}"
+                templates.append(line + "\n")
+
+        return np.array(templates, dtype=object)
+
+    def __format(self, polylines: typing.List[np.ndarray]) -> str:
+        """
+        lays the chunk out as one row per program line, [z up, travel, z down]
+        before every path that does not continue the previous one followed by
+        a draw row per vertex, and formats the surviving rows in one go
+        """
+        lengths = np.array([len(xy) for xy in polylines])
+        xy = np.concatenate(polylines)
+        starts = np.cumsum(lengths) - lengths
+        draw = np.full(len(xy), self.__DRAW)
+        centre = np.zeros((len(xy), 2))
+        arc_length = np.zeros(len(xy))
+        if self.arc_tolerance is not None:
+            vertices = self.__fit_arcs(polylines, starts, draw, centre, arc_length)
+            xy, draw = xy[vertices], draw[vertices]
+            centre, arc_length = centre[vertices], arc_length[vertices]
+            lengths = np.add.reduceat(vertices, starts)
+            starts = np.cumsum(lengths) - lengths
+        ends = starts + lengths - 1
+
+        first = xy[starts]
+        previous = np.vstack([self.__xy[np.newaxis], xy[ends[:-1]]])
+        down = np.ones(len(polylines), dtype=bool)
+        down[0] = self.__z == self.z_down
+        lifted = ~(down & (first == previous).all(axis=1))
+
+        extra = 3 * lifted
+        rows = np.cumsum(lengths + extra) - lengths
+        kind = np.full(rows[-1] + lengths[-1], self.__DRAW)
+        pos = np.empty((len(kind), 2))
+        vertex_rows = np.repeat(rows - starts, lengths) + np.arange(len(xy))
+        pos[vertex_rows] = xy
+        kind[vertex_rows] = draw
+        arc_centre = np.zeros((len(kind), 2))
+        arc_centre[vertex_rows] = centre
+        distance = np.zeros(len(kind))
+        distance[vertex_rows] = arc_length
+        head = rows[lifted]
+        kind[head - 3] = self.__Z_UP
+        kind[head - 2] = self.__TRAVEL
+        kind[head - 1] = self.__Z_DOWN
+        pos[head - 3] = previous[lifted]
+        pos[head - 2] = first[lifted]
+        pos[head - 1] = first[lifted]
+
+        # z only changes on z rows, compare each against the one before
+        is_z = kind <= self.__Z_DOWN
+        z = np.where(kind[is_z] == self.__Z_UP, self.z_up, self.z_down)
+        dz = np.abs(np.diff(z, prepend=self.__z))
+
+        is_arc = kind >= self.__ARC_CW
+        before = np.vstack([self.__xy[np.newaxis], pos[:-1]])
+        step = pos - before
+        changed = (step != 0.0) & ~is_z[:, np.newaxis]
+        keep = changed.any(axis=1) | is_arc
+        keep[is_z] = dz != 0.0
+        values = np.column_stack([pos, arc_centre - before])
+        words = np.column_stack([changed, is_arc, is_arc])
+        distance = np.where(is_arc, distance, np.hypot(step[:, 0], step[:, 1]))
+
+        kind = kind[keep]
+        changed = changed[keep]
+        feeds = np.where(kind <= self.__Z_DOWN, self.feedrate_z, self.feedrate_xy)
+        has_feed = np.ones(len(kind), dtype=bool)
+        if self.travel_g0:
+            has_feed = kind != self.__TRAVEL
+        f = feeds[has_feed]
+        feed_changed = np.zeros(len(kind), dtype=bool)
+        feed_changed[has_feed] = f != np.concatenate([[self.__feed], f[:-1]])
+
+        codes = kind * 8 + changed[:, 0] + 2 * changed[:, 1] + 4 * feed_changed
+        fmt = "".join(self.__templates[codes].tolist())
+        text = fmt % tuple(values[keep][words[keep]].tolist())
+
+        self.__seconds += dz.sum() / self.feedrate_z * 60.0
+        self.__seconds += distance.sum() / self.feedrate_xy * 60.0
+        self.__lines += len(kind)
+        self.__xy = xy[-1].copy()
+        self.__z = self.z_down
+        if len(f):
+            self.__feed = f[-1]
+
+        return text
+
+    def __fit_arcs(
+        self,
+        polylines: typing.List[np.ndarray],
+        starts: np.ndarray,
+        draw: np.ndarray,
+        centre: np.ndarray,
+        arc_length: np.ndarray,
+    ) -> np.ndarray:
+        """
+        marks the end vertex of every fitted arc with its direction, centre and
+        length in place
+
+        :return: mask of the vertices left after dropping the arc interiors
+        """
+        vertices = np.ones(len(draw), dtype=bool)
+        for offset, xy in zip(starts.tolist(), polylines):
+            for start, end, cx, cy, sweep in _fit_arcs(xy, self.arc_tolerance):
+                first = offset + start + 1
+                last = offset + end
+                vertices[first:last] = False
+                r = np.hypot(xy[start, 0] - cx, xy[start, 1] - cy)
+                pieces = [(start, end, (cx, cy))]
+                if abs(sweep) >= 2.0 * np.pi - 1e-6:
+                    # a circle back onto its start is ambiguous, each half gets
+                    # a centre that puts both of its ends on the same radius
+                    middle = (start + end) // 2
+                    pieces = [
+                        (a, b, _circle_centres(xy[[a]], xy[[(a + b) // 2]], xy[[b]])[0])
+                        for a, b in [(start, middle), (middle, end)]
+                    ]
+                for _, e, c in pieces:
+                    i = offset + e
+                    vertices[i] = True
+                    draw[i] = self.__ARC_CCW if sweep > 0.0 else self.__ARC_CW
+                    centre[i] = c
+                    arc_length[i] = r * abs(sweep) / len(pieces)
+
+        return vertices
 
 
 class RealtimeRenderer:
@@ -233,69 +599,201 @@ class RealtimeRenderer:
 
 
 class HPGLRenderer:
+    # upper bound of coordinate pairs packed into a single PD command
+    MAX_PD_POINTS = 256
+
     def __init__(
         self,
         folder: pathlib.Path,
         layer_pen_mapping: dict = None,
         line_type_mapping: dict = None,
+        compact: bool = False,
+        arc_tolerance: typing.Optional[float] = None,
     ) -> None:
+        """
+        compact=True packs the vertices of a path into PD commands and only
+        emits pen, line type, velocity and force when they change. the
+        default keeps the verbose one-PA-per-vertex output
+
+        arc_tolerance in plotter units replaces runs of vertices on a circle
+        with AA arcs, and closed circles with CI. polygons are left as they are
+        """
         self.__save_path = folder
         self.__paths = PathCollection()
         self.__layer_pen_mapping = layer_pen_mapping
         self.__line_type_mapping = line_type_mapping
+        self.__compact = compact
+        self.__arc_tolerance = arc_tolerance
 
     def render(self, paths: "PathCollection") -> None:
         self.__paths += paths
         log.good(f"{__class__.__name__}: rendered {len(paths)} paths")
 
-    def save(self, filename: str) -> str:
+    def save(self, filename: str) -> pathlib.Path:
+        """
+        streams the program to <filename>.hpgl in the save folder
+        :return: the written file
+        """
         pathlib.Path(self.__save_path).mkdir(parents=True, exist_ok=True)
         fname = self.__save_path / (filename + ".hpgl")
 
-        _hpgl_string = ""
-
-        _hpgl_string += "SP1;\n"
-        _hpgl_string += "PA0,0\n"
-
-        first = True
-        for p in self.__paths:
-            if first:
-                _hpgl_string += "PU;\n"
-                first = False
-            x = p.start_pos().x
-            y = p.start_pos().y
-
-            _hpgl_string += f"SP{self.__get_pen_select(p.pen_select)};\n"
-            _hpgl_string += f"LT{self.__linetype_from_layer(p.line_type)};\n"
-            _hpgl_string += f"VS{self.__get_velocity(p.velocity)};\n"
-            _hpgl_string += f"FS{self.__get_pen_force(p.pen_force)};\n"
-
-            _hpgl_string += f"PA{int(x)},{int(y)};\n"
-            if p.is_polygon:
-                _hpgl_string += "PM0;"
-
-            _hpgl_string += "PD;\n"
-
-            for line in p.vertices:
-                x = line.x
-                y = line.y
-                _hpgl_string += f"PA{int(x)},{int(y)};\n"
+        with open(fname.as_posix(), "w") as file:
+            self.write(file)
 
-            _hpgl_string += "PU;\n"
+        log.good(f"Finished saving {fname}")
 
-            if p.is_polygon:
-                _hpgl_string += "PM2;"  # switch to PM2; to close and safe
-                _hpgl_string += "FP;"
+        return fname
 
-        _hpgl_string += "PA0,0\n"
-        _hpgl_string += "SP0;\n"
+    def write(self, out: typing.TextIO) -> None:
+        """
+        streams the program into any writable, one chunk per path
+        """
+        out.write("SP1;\nPA0,0\n")
 
-        with open(fname.as_posix(), "w") as file:
-            file.write(_hpgl_string)
+        state = None
+        first = True
+        for p in self.__paths:
+            if first and not self.__compact:
+                out.write("PU;\n")
+            first = False
+
+            xy = p.coords[:, :2].astype(np.int64).tolist()
+            if len(xy) == 0:
+                continue
+
+            _state = (
+                f"SP{self.__get_pen_select(p.pen_select)};\n",
+                f"LT{self.__linetype_from_layer(p.line_type)};\n",
+                f"VS{self.__get_velocity(p.velocity)};\n",
+                f"FS{self.__get_pen_force(p.pen_force)};\n",
+            )
+            arcs = []
+            if self.__arc_tolerance is not None and not p.is_polygon:
+                fitted = _fit_arcs(np.array(xy, dtype=float), self.__arc_tolerance)
+                arcs = [
+                    self.__arc_command(xy, arc, self.__arc_tolerance) for arc in fitted
+                ]
+            if self.__compact:
+                chunk = self.__compact_path(xy, p.is_polygon, _state, state, arcs)
+            else:
+                chunk = self.__verbose_path(xy, p.is_polygon, _state, arcs)
+            state = _state
+            out.write(chunk)
+
+        if self.__compact:
+            out.write("PU0,0;\nSP0;\n")
+        else:
+            out.write("PA0,0\nSP0;\n")
 
-        log.good(f"Finished saving {fname}")
+    @staticmethod
+    def __arc_command(xy: list, arc: tuple, tolerance: float) -> tuple:
+        """
+        :return: start and end vertex of a fitted arc, its command and centre.
+        CI for a closed circle, AA otherwise. the chord angle keeps the
+        plotter's own segments within tolerance
+        """
+        start, end, cx, cy, sweep = arc
+        r = float(np.hypot(xy[start][0] - cx, xy[start][1] - cy))
+        chord = np.degrees(2.0 * np.arccos(max(1.0 - tolerance / r, -1.0)))
+        chord = min(max(chord, 0.5), 180.0)
+        cx, cy = int(round(cx)), int(round(cy))
+        if abs(sweep) >= 2.0 * np.pi - 1e-6:
+            return start, end, f"CI{int(round(r))},{chord:.1f};\n", (cx, cy)
+
+        command = f"AA{cx},{cy},{np.degrees(sweep):.3f},{chord:.1f};\n"
+        return start, end, command, (cx, cy)
 
-        return _hpgl_string
+    @staticmethod
+    def __circle_centre(arcs: list) -> typing.Optional[tuple]:
+        """
+        :return: pen position for CI when the path is a single closed circle
+        """
+        if len(arcs) != 1 or not arcs[0][2].startswith("CI"):
+            return None
+
+        return arcs[0][3]
+
+    @classmethod
+    def __verbose_path(
+        cls, xy: list, is_polygon: bool, state: tuple, arcs: list
+    ) -> str:
+        parts = list(state)
+        centre = cls.__circle_centre(arcs)
+        if centre is not None:
+            parts.append(f"PA{centre[0]},{centre[1]};\n")
+            parts.append(arcs[0][2])
+            parts.append("PU;\n")
+            return "".join(parts)
+
+        parts.append(f"PA{xy[0][0]},{xy[0][1]};\n")
+        if is_polygon:
+            parts.append("PM0;")
+        parts.append("PD;\n")
+        first = 0
+        for start, end, command, _ in arcs:
+            stop = start + 1
+            parts.extend([f"PA{x},{y};\n" for x, y in xy[first:stop]])
+            parts.append(command)
+            first = end + 1
+        parts.extend([f"PA{x},{y};\n" for x, y in xy[first:]])
+        parts.append("PU;\n")
+        if is_polygon:
+            parts.append("PM2;")  # switch to PM2; to close and safe
+            parts.append("FP;")
+
+        return "".join(parts)
+
+    @classmethod
+    def __compact_path(
+        cls,
+        xy: list,
+        is_polygon: bool,
+        state: tuple,
+        previous: typing.Optional[tuple],
+        arcs: list,
+    ) -> str:
+        if previous is None:
+            parts = list(state)
+        else:
+            parts = [cmd for cmd, prev in zip(state, previous) if cmd != prev]
+        centre = cls.__circle_centre(arcs)
+        if centre is not None:
+            parts.append(f"PU{centre[0]},{centre[1]};\n")
+            parts.append(arcs[0][2])
+            return "".join(parts)
+
+        parts.append(f"PU{xy[0][0]},{xy[0][1]};\n")
+        if is_polygon:
+            parts.append("PM0;")
+
+        if len(xy) == 1:
+            parts.append("PD;\n")
+        first = 1
+        for start, end, command, _ in arcs:
+            stop = start + 1
+            parts.extend(cls.__pd_blocks(xy[first:stop]))
+            if start == 0:
+                parts.append("PD;\n")
+            parts.append(command)
+            first = end + 1
+        parts.extend(cls.__pd_blocks(xy[first:]))
+
+        if is_polygon:
+            parts.append("PU;")
+            parts.append("PM2;")  # switch to PM2; to close and safe
+            parts.append("FP;")
+
+        return "".join(parts)
+
+    @classmethod
+    def __pd_blocks(cls, drawn: list) -> typing.List[str]:
+        blocks = []
+        for i in range(0, len(drawn), cls.MAX_PD_POINTS):
+            stop = i + cls.MAX_PD_POINTS
+            block = drawn[i:stop]
+            blocks.append("PD" + ",".join([f"{x},{y}" for x, y in block]) + ";\n")
+
+        return blocks
 
     @staticmethod
     def __get_pen_select(pen_select: typing.Optional[int] = None) -> int:
@@ -338,23 +836,64 @@ class HPGLRenderer:
         return pen_force
 
 
+def _draw_polylines(
+    draw: ImageDraw.ImageDraw, xy: np.ndarray, offsets: np.ndarray, thickness: int
+) -> None:
+    """
+    one polyline per path, single points have no connection
+    """
+    for start, stop in zip(offsets[:-1].tolist(), offsets[1:].tolist()):
+        if stop - start > 1:
+            draw.line(xy=xy[start:stop].ravel().tolist(), fill="black", width=thickness)
+
+
+def _select_paths(
+    xy: np.ndarray, offsets: np.ndarray, selected: np.ndarray
+) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    :return: coordinates and offsets of only the selected paths
+    """
+    lengths = np.diff(offsets)[selected]
+    new_offsets = np.zeros(lengths.shape[0] + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    total = int(new_offsets[-1])
+    rows = np.repeat(offsets[:-1][selected] - new_offsets[:-1], lengths) + np.arange(
+        total
+    )
+    return xy[rows], new_offsets
+
+
+def _render_tile(job: tuple) -> None:
+    """
+    process pool worker for JpegRenderer.render_tiled, draws the paths of
+    one tile in tile coordinates and saves it
+    """
+    xy, offsets, size, thickness, fname = job
+    img = Image.new("RGB", size, "white")
+    _draw_polylines(ImageDraw.ImageDraw(img), xy, offsets, thickness)
+    img.save(fname, "PNG")
+
+
 class JpegRenderer:
     def __init__(self, folder: pathlib.Path):
         self.save_path = folder
         self.img = None
         self.img_draw = None
 
-    def render(self, paths, scale=1.0, frame=False, thickness=1):
-        if not isinstance(paths, PathCollection):
-            raise Exception("Only PathCollection allowed")
-
-        pathlib.Path(self.save_path).mkdir(parents=True, exist_ok=True)
-
-        if len(paths) == 0:
-            log.warn("Not creating image, empty paths")
-            return
+    # edge length in pixels of the tiles written by render_tiled
+    TILE_SIZE = 4096
 
-        bb = paths.bb()
+    @staticmethod
+    def __layout(
+        paths: PathCollection, scale: float
+    ) -> typing.Tuple[int, int, np.ndarray, np.ndarray]:
+        """
+        :return: image width and height, the scaled (M, 2) pixel coordinates
+        of all vertices and the offsets where each path starts in them
+        """
+        # detached copy, pack() or bb() would rebind the paths of the caller
+        packed = PackedPathCollection.from_paths(paths)
+        bb = packed.bb()
 
         abs_scaled_bb = (
             abs(bb.x * scale),
@@ -366,35 +905,177 @@ class JpegRenderer:
         image_width = int(abs_scaled_bb[0] + abs_scaled_bb[2]) + int(bb.x * scale)
         image_height = int(abs_scaled_bb[1] + abs_scaled_bb[3]) + int(bb.y * scale)
 
+        # offset paths when passed bb starts in negative space
+        offset = np.array(
+            [
+                abs_scaled_bb[0] if bb.x * scale < 0 else 0.0,
+                abs_scaled_bb[1] if bb.y * scale < 0 else 0.0,
+            ]
+        )
+
+        xy = (packed.points()[:, :2] + offset) * scale
+        offsets = np.zeros(len(packed) + 1, dtype=np.int64)
+        np.cumsum(packed.lengths(), out=offsets[1:])
+
+        return image_width, image_height, xy, offsets
+
+    def render(self, paths, scale=1.0, frame=False, thickness=1):
+        if not isinstance(paths, PathCollection):
+            raise Exception("Only PathCollection allowed")
+
+        pathlib.Path(self.save_path).mkdir(parents=True, exist_ok=True)
+
+        if len(paths) == 0:
+            log.warn("Not creating image, empty paths")
+            return
+
+        image_width, image_height, xy, offsets = self.__layout(paths, scale)
+
         log.good(f"Creating image with size=({image_width}, {image_height})")
-        assert image_width < 21000 and image_height < 21000, "keep resolution lower"
+        assert (
+            image_width < 21000 and image_height < 21000
+        ), "keep resolution lower or use render_tiled"
 
         self.img = Image.new("RGB", (image_width, image_height), "white")
         self.img_draw = ImageDraw.ImageDraw(self.img)
 
-        it = PathIterator(paths)
-
-        for conn in it.connections():
-            start = conn[0]
-            end = conn[1]
+        _draw_polylines(self.img_draw, xy, offsets, thickness)
 
-            # offset paths when passed bb starts in negative space
-            if bb.x * scale < 0:
-                start.x += abs_scaled_bb[0]
-                end.x += abs_scaled_bb[0]
+        if frame:
+            self.render_frame()
 
-            if bb.y * scale < 0:
-                start.y += abs_scaled_bb[1]
-                end.y += abs_scaled_bb[1]
+    def render_tiled(
+        self,
+        paths: PathCollection,
+        filename: str,
+        scale: float = 1.0,
+        thickness: int = 1,
+        tile_size: typing.Optional[int] = None,
+        workers: typing.Optional[int] = 1,
+    ) -> pathlib.Path:
+        """
+        renders images of any size as a pyramid of png tiles, without ever
+        holding more than a few tiles in memory. level 0 has the full
+        resolution, every further level halves it until one tile is left.
+        each tile only draws the paths whose bounding box touches it. with
+        workers > 1 (None: one per core) the level 0 tiles are rendered in a
+        process pool
+        :return: directory with tiles.json and <level>/<row>_<col>.png
+        """
+        if len(paths) == 0:
+            raise Exception("Not creating image, empty paths")
+
+        tile_size = self.TILE_SIZE if tile_size is None else tile_size
+        directory = pathlib.Path(self.save_path) / filename
+        (directory / "0").mkdir(parents=True, exist_ok=True)
+
+        t0 = time.time()
+        image_width, image_height, xy, offsets = self.__layout(paths, scale)
+        rows = -(-image_height // tile_size)
+        cols = -(-image_width // tile_size)
+        log.good(
+            f"Creating {rows}x{cols} tiles for image with size=({image_width}, {image_height})"
+        )
 
-            self.img_draw.line(
-                xy=(start.x * scale, start.y * scale, end.x * scale, end.y * scale),
-                fill="black",
-                width=thickness,
+        # pixel bounds of every path that has a line, grown by its width
+        lengths = np.diff(offsets)
+        nonempty = np.flatnonzero(lengths > 0)
+        lo = np.minimum.reduceat(xy, offsets[:-1][nonempty], axis=0) - thickness
+        hi = np.maximum.reduceat(xy, offsets[:-1][nonempty], axis=0) + thickness
+        lines = lengths[nonempty] > 1
+        drawable, lo, hi = nonempty[lines], lo[lines], hi[lines]
+
+        jobs = []
+        for row in range(rows):
+            for col in range(cols):
+                x, y = col * tile_size, row * tile_size
+                w = min(tile_size, image_width - x)
+                h = min(tile_size, image_height - y)
+                hits = drawable[
+                    (hi[:, 0] >= x)
+                    & (lo[:, 0] <= x + w)
+                    & (hi[:, 1] >= y)
+                    & (lo[:, 1] <= y + h)
+                ]
+                tile_xy, tile_offsets = _select_paths(xy, offsets, hits)
+                fname = directory / "0" / f"{row}_{col}.png"
+                # pillow truncates coordinates, flooring before moving them
+                # into the tile keeps the pixels of render() for the
+                # vertices that end up in negative tile coordinates
+                tile_xy = np.floor(tile_xy) - (x, y)
+                jobs.append((tile_xy, tile_offsets, (w, h), thickness, fname))
+
+        if workers == 1:
+            for job in jobs:
+                _render_tile(job)
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(_render_tile, jobs))
+
+        levels = self.__build_pyramid(directory, rows, cols, tile_size)
+
+        with open(directory / "tiles.json", "w") as file:
+            json.dump(
+                {
+                    "width": image_width,
+                    "height": image_height,
+                    "tile_size": tile_size,
+                    "levels": levels,
+                },
+                file,
             )
 
-        if frame:
-            self.render_frame()
+        elapsed = time.time() - t0
+        log.good(
+            f"Finished saving {len(jobs)} tiles and {len(levels) - 1} levels to {directory} "
+            f"in {round(elapsed * 1000)}ms"
+        )
+        return directory
+
+    @staticmethod
+    def __build_pyramid(
+        directory: pathlib.Path, rows: int, cols: int, tile_size: int
+    ) -> typing.List[typing.List[int]]:
+        """
+        merges 2x2 tiles of a level into one tile of the next one at half
+        the resolution
+        :return: rows and columns of every level
+        """
+        levels = [[rows, cols]]
+        level = 0
+        while rows > 1 or cols > 1:
+            next_rows, next_cols = -(-rows // 2), -(-cols // 2)
+            (directory / str(level + 1)).mkdir(exist_ok=True)
+            for row in range(next_rows):
+                for col in range(next_cols):
+                    parent = Image.new("RGB", (tile_size, tile_size), "white")
+                    width = height = 0
+                    for dy in range(2):
+                        for dx in range(2):
+                            r, c = 2 * row + dy, 2 * col + dx
+                            if r >= rows or c >= cols:
+                                continue
+                            # halve each child on its own, the parent never
+                            # grows beyond one tile
+                            child = directory / str(level) / f"{r}_{c}.png"
+                            with Image.open(child) as tile:
+                                size = (
+                                    max(1, tile.width // 2),
+                                    max(1, tile.height // 2),
+                                )
+                                half = tile.resize(size, Image.LANCZOS)
+                            x, y = dx * (tile_size // 2), dy * (tile_size // 2)
+                            parent.paste(half, (x, y))
+                            width = max(width, x + half.width)
+                            height = max(height, y + half.height)
+                    parent.crop((0, 0, width, height)).save(
+                        directory / str(level + 1) / f"{row}_{col}.png"
+                    )
+            rows, cols = next_rows, next_cols
+            levels.append([rows, cols])
+            level += 1
+
+        return levels
 
     def save(self, filename: str):
         fname = self.save_path / (filename + ".jpg")
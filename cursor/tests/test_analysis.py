@@ -17,7 +17,7 @@ def test_simple_histogram():
 
     dir = DataDirHandler().test_recordings()
     # single_file = dir / "1565088885.39372_compressed.json"
-    ll = Loader(directory=dir, limit_files=2)
+    ll = Loader(directory=dir, limit_files=2, cache=False)
     # ll.load_file(single_file)
 
     shannxs = []
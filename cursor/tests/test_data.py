@@ -1,4 +1,4 @@
-from cursor.data import DataDirHandler, JsonCompressor
+from cursor.data import DataDirHandler, JsonCompressor, DateHandler, UtcClock
 from cursor.path import PathCollection, Path
 
 
@@ -73,3 +73,14 @@ def test_json_decoder():
     res = compressor.json_unzip(eval(enc))
     assert len(res["mouse"]) == 1
     assert len(res["keys"]) == 0
+
+
+def test_utc_clock():
+    before = DateHandler.utc_timestamp()
+    clock = UtcClock()
+    first = clock.now()
+    second = clock.now()
+    after = DateHandler.utc_timestamp()
+
+    assert before <= first <= second
+    assert second - after < 1.0
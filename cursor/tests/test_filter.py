@@ -9,6 +9,11 @@ from cursor.filter import MinPointCountFilter
 from cursor.filter import MaxPointCountFilter
 from cursor.filter import Sorter
 from cursor.filter import DistanceFilter
+from cursor.filter import EntropyMinFilter
+from cursor.filter import AspectRatioFilter
+from cursor.filter import SimplifyFilter
+from cursor.filter import DistanceBetweenPointsFilter
+from cursor.filter import MinTravelDistanceFilter
 
 import pytest
 import random
@@ -127,7 +132,7 @@ def test_entropy_sort():
 def test_entropy_sort2():
     pcol = PathCollection()
     dir = DataDirHandler().test_recordings()
-    ll = Loader(directory=dir, limit_files=2)
+    ll = Loader(directory=dir, limit_files=2, cache=False)
     pcol = ll.all_paths()
     sorter = Sorter(param=Sorter.SHANNON_X, reverse=True)
     pcol.sort(sorter)
@@ -169,3 +174,95 @@ def test_distance_filter():
     pcol.filter(filter)
 
     assert len(pcol) == 1
+
+
+def test_min_travel_distance_filter():
+    random.seed(3)
+    pcol = PathCollection()
+    for _ in range(40):
+        p = Path()
+        for _ in range(random.randint(1, 10)):
+            p.add(random.randint(-10, 10), random.randint(-10, 10))
+        pcol.add(p)
+
+    paths = pcol.get_all()
+    expected = [p for p in paths if p.distance > 40]
+    assert 0 < len(expected) < len(paths)
+
+    f = MinTravelDistanceFilter(40)
+    kept = pcol.filtered(f).get_all()
+    assert len(kept) == len(expected)
+    for p1, p2 in zip(kept, expected):
+        assert (p1.coords == p2.coords).all()
+    pcol.filter(f)
+    assert pcol.get_all() == expected
+
+
+def test_filters_on_metrics_match_path_properties():
+    random.seed(7)
+    pcol = PathCollection()
+    for _ in range(50):
+        p = Path(layer=random.choice(["a", "b", "c"]))
+        for _ in range(random.randint(1, 30)):
+            p.add(random.randint(-10, 10), random.randint(-10, 10))
+        pcol.add(p)
+
+    paths = pcol.get_all()
+
+    for f in [
+        EntropyMinFilter(1.0, 1.0),
+        AspectRatioFilter(0.5, 2.0),
+        MinPointCountFilter(10),
+        DistanceFilter(100),
+        BoundingBoxFilter(BoundingBox(-5, -5, 5, 5)),
+    ]:
+        expected = list(paths)
+        f.filter(expected)
+
+        assert len(pcol.filtered(f)) == len(expected)
+
+        pc = PathCollection()
+        for p in paths:
+            pc.add(p)
+        pc.filter(f)
+        assert pc.get_all() == expected
+
+    for param in [Sorter.DISTANCE, Sorter.LAYER, Sorter.POINT_COUNT]:
+        for reverse in [False, True]:
+            sorter = Sorter(param=param, reverse=reverse)
+            expected = list(paths)
+            sorter.sort(expected)
+            assert pcol.sorted(sorter) == expected
+
+
+def test_simplify_filter():
+    pcol = PathCollection()
+    p = Path()
+    for i in range(10):
+        p.add(i, 0)
+    pcol.add(p)
+
+    simplified = pcol.filtered(SimplifyFilter(0.1))
+    assert len(simplified[0]) == 2
+    assert len(pcol[0]) == 10
+
+    pcol.filter(SimplifyFilter(0.1))
+    assert len(pcol[0]) == 2
+
+
+def test_distance_between_points_filter():
+    p = Path()
+    for x, y in [(1, 1), (2, 1), (12, 1), (12, 1.5), (13, 1.5)]:
+        p.add(x, y)
+
+    paths = [p]
+    DistanceBetweenPointsFilter(0.75, 5).filter(paths)
+    assert [(v.x, v.y) for v in paths[0]] == [(2, 1), (13, 1.5)]
+
+    p = Path()
+    for x, y in [(1, 1), (2, 1), (12, 1), (12, 1.5), (13, 1.5)]:
+        p.add(x, y)
+    pcol = PathCollection()
+    pcol.add(p)
+    pcol.filter(DistanceBetweenPointsFilter(0, 1))
+    assert [(v.x, v.y) for v in pcol[0]] == [(2, 1), (12, 1.5), (13, 1.5)]
@@ -1,12 +1,21 @@
 from cursor.loader import Loader
+from cursor.loader import Catalog
 from cursor.data import DataDirHandler
+from cursor.data import RecordingCache
+from cursor.data import SegmentedRecording
+from cursor.data import BinaryRecording
+from cursor.path import PathCollection
+from cursor.filter import MinPointCountFilter
 
+import os
+import shutil
+import datetime
 import pytest
 
 
 def test_loader_simple():
     dir = DataDirHandler().test_recordings()
-    ll = Loader(directory=dir)
+    ll = Loader(directory=dir, cache=False)
 
     rec = ll.all_collections()
     assert len(rec) == 2
@@ -14,21 +23,21 @@ def test_loader_simple():
 
 def test_loader_keys():
     dir = DataDirHandler().test_recordings()
-    ll = Loader(directory=dir)
+    ll = Loader(directory=dir, cache=False)
     rec = ll.keys()
     assert len(rec) == 3
 
 
 def test_loader_index_too_high_exception():
     dir = DataDirHandler().test_recordings()
-    ll = Loader(directory=dir)
+    ll = Loader(directory=dir, cache=False)
     with pytest.raises(IndexError):
         ll.single(100)
 
 
 def test_loader_single():
     dir = DataDirHandler().test_recordings()
-    ll = Loader(directory=dir)
+    ll = Loader(directory=dir, cache=False)
     path = ll.single(0)
     assert len(path) > 0
 
@@ -49,8 +58,247 @@ def test_loader_isfileandjson():
 
 def test_loader_limit_files():
     dir = DataDirHandler().test_recordings()
-    l1 = Loader(directory=dir)
-    l2 = Loader(directory=dir, limit_files=1)
+    l1 = Loader(directory=dir, cache=False)
+    l2 = Loader(directory=dir, limit_files=1, cache=False)
 
     assert len(l2) == 1
     assert len(l1) > len(l2)
+
+
+def test_loader_limit_files_converted(tmp_path):
+    dir = DataDirHandler().test_recordings()
+    Loader.convert(dir, tmp_path)
+
+    # the names of the json files still select the binary recordings
+    for name in ["1565089006.12941_compressed", "1565089006.12941_compressed.json"]:
+        ll = Loader(directory=tmp_path, limit_files=[name], cache=False)
+        assert len(ll) == 1
+        assert ll.single(0).timestamp() == 1565089006.12941
+
+
+def test_loader_binary_recordings(tmp_path):
+    dir = DataDirHandler().test_recordings()
+    written = Loader.convert(dir, tmp_path)
+    assert len(written) == 2
+
+    # already converted files are skipped
+    assert Loader.convert(dir, tmp_path) == []
+
+    l1 = Loader(directory=dir, cache=False)
+    l2 = Loader(directory=tmp_path, cache=False)
+    assert len(l2) == 2
+    assert sorted(l2.keys()) == sorted(l1.keys())
+
+    json_recordings = sorted(l1.all_collections(), key=lambda pc: pc.timestamp())
+    binary_recordings = sorted(l2.all_collections(), key=lambda pc: pc.timestamp())
+    for pc1, pc2 in zip(json_recordings, binary_recordings):
+        assert pc1.timestamp() == pc2.timestamp()
+        assert len(pc1) == len(pc2)
+        for p1, p2 in zip(pc1, pc2):
+            assert (p1.coords == p2.coords).all()
+
+    # paths are views into the memory map, changing them doesn't
+    # touch the file
+    pc = l2.single(0)
+    pc.translate(10, 10)
+    assert pc[0].coords[0, 0] > 10
+    l3 = Loader(directory=tmp_path, cache=False)
+    first = [r for r in l3.all_collections() if r.timestamp() == pc.timestamp()][0]
+    assert first[0].coords[0, 0] == pytest.approx(pc[0].coords[0, 0] - 10)
+
+
+def test_loader_parallel():
+    dir = DataDirHandler().test_recordings()
+    l1 = Loader(directory=dir, cache=False)
+    l2 = Loader(directory=dir, workers=2, cache=False)
+
+    assert len(l1) == len(l2)
+    assert l1.keys() == l2.keys()
+    for pc1, pc2 in zip(l1.all_collections(), l2.all_collections()):
+        assert pc1.timestamp() == pc2.timestamp()
+        assert len(pc1) == len(pc2)
+        for p1, p2 in zip(pc1, pc2):
+            assert (p1.coords == p2.coords).all()
+
+
+def test_loader_cache(tmp_path):
+    dir = DataDirHandler().test_recordings()
+    cache = RecordingCache(tmp_path)
+
+    l1 = Loader(directory=dir, cache=cache)
+    files = sorted(dir.iterdir())
+    cached = [cache.get(f) for f in files]
+    assert all(c is not None for c in cached)
+
+    # the second run reads the cached binary recordings
+    l2 = Loader(directory=dir, cache=cache)
+    assert l1.keys() == l2.keys()
+    for pc1, pc2 in zip(l1.all_collections(), l2.all_collections()):
+        assert pc1.timestamp() == pc2.timestamp()
+        assert len(pc1) == len(pc2)
+        for p1, p2 in zip(pc1, pc2):
+            assert (p1.coords == p2.coords).all()
+
+    l3 = Loader(directory=dir, cache=False)
+    assert len(l3) == len(l1)
+
+    # too small for both, the older entry has to go
+    cache.max_bytes = max(c.stat().st_size for c in cached)
+    os.utime(cached[0], ns=(0, 0))
+    cache.evict()
+    assert cache.get(files[0]) is None
+    assert cache.get(files[1]) is not None
+
+    Loader(directory=dir, cache=cache, rebuild_cache=True)
+    assert cache.get(files[0]) is not None
+
+
+def test_loader_stream(tmp_path):
+    dir = DataDirHandler().test_recordings()
+    ll = Loader(directory=dir, cache=False)
+
+    streamed = list(Loader.stream(dir, cache=RecordingCache(tmp_path)))
+    assert [len(pc) for pc in streamed] == [len(pc) for pc in ll.all_collections()]
+
+    paths = list(Loader.stream_paths(dir, cache=False))
+    assert len(paths) == len(ll.all_paths())
+
+    min_points = MinPointCountFilter(20)
+    filtered = list(Loader.stream_paths(dir, filters=[min_points], cache=False))
+    assert 0 < len(filtered) < len(paths)
+    assert all(len(p) >= 20 for p in filtered)
+
+
+def test_loader_all_paths():
+    dir = DataDirHandler().test_recordings()
+    ll = Loader(directory=dir, cache=False)
+    all_paths = ll.all_paths()
+
+    assert len(all_paths) == sum(len(pc) for pc in ll.all_collections())
+    assert all_paths[0] is ll.single(0)[0]
+
+
+def test_catalog(tmp_path):
+    dir = DataDirHandler().test_recordings()
+    first, second = sorted(dir.iterdir())
+    shutil.copy(first, tmp_path)
+
+    catalog = Catalog(tmp_path)
+    assert catalog.update(cache=False) == (1, 0)
+    assert catalog.update(cache=False) == (0, 0)
+
+    entry = catalog.entries()[0]
+    assert entry["paths"] == 18
+    assert entry["points"] > entry["paths"]
+    assert entry["duration"] > 0
+    assert entry["bbox"][2] <= 1.0
+
+    shutil.copy(second, tmp_path)
+    assert Catalog(tmp_path).update(cache=False) == (1, 0)
+
+    catalog = Catalog(tmp_path)
+    assert len(catalog) == 2
+    assert catalog.query(min_paths=10) == ["1565088885.39372"]
+    assert catalog.query(min_keys=1) == ["1565089006.12941"]
+    assert catalog.query(since=datetime.datetime.fromtimestamp(1565089000)) == [
+        "1565089006.12941"
+    ]
+    assert catalog.query(where=lambda e: e["paths"] < 0) == []
+
+    with pytest.raises(ValueError):
+        catalog.query(min_bbox=1)
+
+    ll = Loader(directory=tmp_path, limit_files=catalog.query(min_keys=1), cache=False)
+    assert len(ll) == 1
+    assert len(ll.keys()) == 3
+
+    os.remove(tmp_path / first.name)
+    assert catalog.update(cache=False) == (0, 1)
+
+
+def test_segmented_recording(tmp_path):
+    dir = DataDirHandler().test_recordings()
+    recs = Loader.read(dir / "1565089006.12941_compressed.json", cache=False)
+    paths = recs["mouse"].get_all()
+    keys = [tuple(k) for k in recs["keys"]]
+    ts = recs["mouse"].timestamp()
+
+    segments = SegmentedRecording(tmp_path / f"{ts}{SegmentedRecording.SUFFIX}")
+    segments.append(paths[:2], keys[:1], ts, [1920, 1080])
+    segments.append(paths[2:], [], ts, [1920, 1080])
+    segments.append([], keys[1:], ts, [1920, 1080])
+
+    # a chunk cut off by a crash is ignored
+    with open(segments.fname, "ab") as fp:
+        fp.write(b"\x40\x00\x00\x00\x00\x00\x00\x00broken")
+
+    merged = segments.read()
+    assert merged["mouse"].timestamp() == ts
+    assert merged["keys"] == keys
+    assert merged["resolution"] == [1920, 1080]
+    assert len(merged["mouse"]) == len(paths)
+    for p1, p2 in zip(paths, merged["mouse"]):
+        assert (p1.coords == p2.coords).all()
+
+    # the loader reads segment logs transparently
+    ll = Loader(directory=tmp_path, cache=False)
+    assert len(ll.all_paths()) == len(paths)
+    assert ll.keys() == keys
+
+    compacted = segments.compact()
+    assert not segments.fname.exists()
+    assert Loader.files(tmp_path) == [compacted]
+
+    ll = Loader(directory=tmp_path, cache=False)
+    assert len(ll.all_paths()) == len(paths)
+    assert ll.keys() == keys
+
+
+def test_segmented_recording_compact_appends(tmp_path):
+    dir = DataDirHandler().test_recordings()
+    recs = Loader.read(dir / "1565089006.12941_compressed.json", cache=False)
+    paths = recs["mouse"].get_all()
+    keys = [tuple(k) for k in recs["keys"]]
+    ts = recs["mouse"].timestamp()
+
+    segments = SegmentedRecording(tmp_path / f"{ts}{SegmentedRecording.SUFFIX}")
+    segments.append(paths[:2], keys[:1], ts, [1920, 1080])
+    compacted = segments.compact()
+
+    # a late save after the first compaction starts a new log for the tail
+    segments.append(paths[2:], keys[1:], ts, [1920, 1080])
+    assert segments.compact() == compacted
+    assert not segments.fname.exists()
+
+    ll = Loader(directory=tmp_path, cache=False)
+    assert len(ll.all_paths()) == len(paths)
+    assert ll.keys() == keys
+    for p1, p2 in zip(paths, ll.all_paths()):
+        assert (p1.coords == p2.coords).all()
+
+
+def test_segmented_recording_compact_onto_existing(tmp_path):
+    dir = DataDirHandler().test_recordings()
+    recs = Loader.read(dir / "1565089006.12941_compressed.json", cache=False)
+    paths = recs["mouse"].get_all()
+    keys = [tuple(k) for k in recs["keys"]]
+    ts = recs["mouse"].timestamp()
+
+    target = tmp_path / f"{ts}{BinaryRecording.SUFFIX}"
+    existing = PathCollection(ts)
+    for p in paths[:3]:
+        existing.add(p)
+    BinaryRecording().write(target, {"mouse": existing, "keys": keys[:2]})
+
+    # a mapped view of the old file is still open while compacting
+    mapped = BinaryRecording().read(target)
+
+    segments = SegmentedRecording(tmp_path / f"{ts}{SegmentedRecording.SUFFIX}")
+    segments.append(paths[3:], keys[2:], ts, [1920, 1080])
+    assert segments.compact() == target
+
+    merged = BinaryRecording().read(target)
+    assert len(merged["mouse"]) == len(paths)
+    assert len(merged["keys"]) == len(keys)
+    assert merged["resolution"] == [1920, 1080]
+    assert len(mapped["mouse"]) == 3
@@ -1,8 +1,11 @@
 from cursor.path import Path
 from cursor.path import TimedPosition
 from cursor.path import BoundingBox
+from cursor.path import PathCollection
 
 import pytest
+import numpy as np
+import math
 
 
 def test_path_empty_start():
@@ -440,3 +443,201 @@ def disabled_test_similarity():
 
     sim2 = p1.similarity(p3)
     assert sim2 >= 0.9
+
+
+def test_path_from_array():
+    arr = np.array([[0, 0], [10, 0], [10, 10]], dtype=float)
+    p = Path(arr)
+
+    assert len(p) == 3
+    assert p.coords.shape == (3, 3)
+    assert p[2].x == 10
+    assert p[2].y == 10
+    assert p[2].timestamp == 0
+
+    # the path keeps its own copy of the data
+    arr[0, 0] = 100
+    assert p[0].x == 0
+
+
+def test_path_coords_readonly():
+    p = Path()
+    p.add(1, 2, 3)
+
+    with pytest.raises(ValueError):
+        p.coords[0, 0] = 5
+
+    assert p.coords.tolist() == [[1.0, 2.0, 3.0]]
+
+
+def test_path_vertices_roundtrip():
+    p = Path()
+    for i in range(50):
+        p.add(i, i * 2, i * 3)
+
+    verts = p.vertices
+    assert len(verts) == 50
+    assert isinstance(verts[0], TimedPosition)
+
+    p2 = Path(verts)
+    assert np.array_equal(p.coords, p2.coords)
+
+    p2.vertices = verts[:10]
+    assert len(p2) == 10
+    assert p2[-1].y == 18
+
+
+def test_path_rot():
+    p = Path()
+    p.add(1, 0)
+    p.add(2, 0)
+
+    p.rot(math.pi / 2.0)
+
+    assert round(p[0].x, 6) == 0
+    assert round(p[0].y, 6) == 1
+    assert round(p[1].x, 6) == 0
+    assert round(p[1].y, 6) == 2
+
+
+def test_path_deferred_transform():
+    p = Path()
+    p.add(1, 1)
+    p.add(3, 2)
+
+    p.translate(1, 0)
+    p.scale(2, 3)
+    p.rot(math.pi, origin=(0, 0))
+
+    # nothing is applied yet, bb is derived from the pending transform
+    # as long as it can be
+    p2 = Path()
+    p2.add(1, 1)
+    p2.translate(5, 5)
+    p2.scale(2, -1)
+    bb = p2.bb()
+    assert p2._transform is not None
+    assert bb.x == 12
+    assert bb.y == -6
+
+    assert round(p[0].x, 6) == -4
+    assert round(p[0].y, 6) == -3
+    assert round(p[1].x, 6) == -8
+    assert round(p[1].y, 6) == -6
+    assert p._transform is None
+
+    # points added afterwards are not transformed
+    p2.add(0, 0)
+    assert p2[0].x == 12
+    assert p2[1].x == 0
+
+
+def test_path_cached_metrics():
+    p = Path()
+    p.add(0, 0)
+    p.add(3, 4)
+
+    assert p.distance == 5
+    assert p.distance is p.distance
+    version = p.version
+
+    p.add(3, 8)
+    assert p.version > version
+    assert p.distance == 9
+    assert p.bb().h == 8
+
+    p.translate(1, 0)
+    assert p.bb().x == 1
+
+    p.reverse()
+    assert p.start_pos().y == 8
+
+    p.vertices = [TimedPosition(0, 0), TimedPosition(0, 2)]
+    assert p.distance == 2
+    assert p.bb().w == 0
+
+
+def test_path_cached_metrics_through_collection():
+    p = Path()
+    p.add(0, 0)
+    p.add(1, 1)
+
+    pc = PathCollection()
+    pc.add(p)
+
+    assert p.bb().x2 == 1
+    version = p.version
+
+    pc.scale(10, 10)
+    assert p.version > version
+    assert p.bb().x2 == 10
+    assert p.distance == math.sqrt(200)
+
+    pc.fit((100, 100), padding_units=10)
+    assert p.bb().x2 == 90
+
+
+def test_path_simplify_rdp():
+    p = Path()
+    p.add(0, 0)
+    p.add(1, 0.1)
+    p.add(2, -0.1)
+    p.add(3, 5)
+    p.add(4, 6)
+    p.add(5, 7)
+
+    p.simplify(0.5)
+    assert [(v.x, v.y) for v in p] == [(0, 0), (2, -0.1), (3, 5), (5, 7)]
+
+    p.simplify(100)
+    assert [(v.x, v.y) for v in p] == [(0, 0), (5, 7)]
+
+
+def test_path_simplify_visvalingam():
+    p = Path()
+    p.add(0, 0)
+    p.add(1, 0.1)
+    p.add(2, 0)
+    p.add(3, 5)
+    p.add(4, 0)
+
+    # the triangle at x=1 spans 0.1, the one at x=3 spans 10
+    p.simplify(1, method="visvalingam")
+    assert [(v.x, v.y) for v in p] == [(0, 0), (2, 0), (3, 5), (4, 0)]
+
+    with pytest.raises(ValueError):
+        p.simplify(1, method="nope")
+
+
+def test_path_simplify_closed():
+    p = Path()
+    for x, y in [(0, 0), (10, 0), (10, 10), (0, 10), (0, 0)]:
+        p.add(x, y)
+
+    p.simplify(1)
+    assert len(p) == 5
+
+
+def test_path_resample_spacing():
+    p = Path()
+    p.add(0, 0, 0)
+    p.add(10, 0, 100)
+
+    p.resample(spacing=3)
+    assert [(v.x, v.y) for v in p] == [(0, 0), (3, 0), (6, 0), (9, 0), (10, 0)]
+    assert [v.timestamp for v in p] == [0, 30, 60, 90, 100]
+
+
+def test_path_resample_count():
+    p = Path()
+    p.add(0, 0)
+    p.add(4, 0)
+    p.add(4, 6)
+
+    p.resample(count=6)
+    assert [(v.x, v.y) for v in p] == [(0, 0), (2, 0), (4, 0), (4, 2), (4, 4), (4, 6)]
+
+    with pytest.raises(ValueError):
+        p.resample()
+    with pytest.raises(ValueError):
+        p.resample(spacing=1, count=2)
@@ -4,6 +4,8 @@ from cursor.path import BoundingBox
 
 import pytest
 import random
+import math
+import numpy as np
 
 
 def test_pathcollection_minmax():
@@ -352,3 +354,389 @@ def test_pathcollection_line_types():
 
     line_types = pc.get_all_line_types()
     assert line_types == [1, 2, 3, 4]
+
+
+def _packing_collection():
+    pcol = PathCollection()
+
+    p0 = Path(layer="a", pen_select=2)
+    p0.add(0, 0)
+    p0.add(10, 5)
+
+    p1 = Path(layer="b")
+    p1.add(-5, 20)
+    p1.add(3, 3)
+    p1.add(7, -1)
+
+    p2 = Path(layer="a")
+    p2.add(100, 100)
+    p2.add(110, 90)
+
+    pcol.add(p0)
+    pcol.add(p1)
+    pcol.add(p2)
+    return pcol
+
+
+def test_pathcollection_pack():
+    pcol = _packing_collection()
+    packed = pcol.pack()
+
+    assert len(packed) == 3
+    assert packed.offsets.tolist() == [0, 2, 5, 7]
+    assert packed.coords.shape == (7, 3)
+    assert packed.layer.tolist() == ["a", "b", "a"]
+    assert packed.pen_select.tolist() == [2, None, None]
+    assert packed.lengths().tolist() == [2, 3, 2]
+
+    bb = packed.bb()
+    assert bb.x == -5
+    assert bb.y == -1
+    assert bb.x2 == 110
+    assert bb.y2 == 100
+
+    unpacked = packed.unpack()
+    assert len(unpacked) == 3
+    assert unpacked[1].layer == "b"
+    assert unpacked[1][2].x == 7
+
+
+def test_pathcollection_pack_shares_buffer():
+    pcol = _packing_collection()
+    packed = pcol.pack()
+
+    pcol.translate(1, 2)
+    assert packed.coords[0, 0] == 1
+    assert packed.coords[0, 1] == 2
+    assert pcol[2][0].x == 101
+
+    # a path that reallocates is repacked on the next collection operation
+    pcol[0].add(-50, -50)
+    assert pcol.bb().x == -50
+    pcol.scale(2, 2)
+    assert pcol[0][2].x == -100
+    assert pcol[1][0].x == -8
+
+
+def test_packed_selection():
+    pcol = _packing_collection()
+    packed = pcol.pack()
+
+    layer_a = packed[packed.layer == "a"]
+    assert len(layer_a) == 2
+    assert layer_a.bb().x == 0
+    assert layer_a.bb().x2 == 110
+    assert layer_a.points().shape == (4, 3)
+
+    # selections share the buffer, nothing of layer b moves
+    layer_a.translate(1000, 0)
+    assert packed.coords[0, 0] == 1000
+    assert packed.coords[2, 0] == -5
+    assert pcol[2][1].x == 1110
+
+    reversed_order = packed[::-1]
+    assert reversed_order[0].layer == "a"
+    assert reversed_order[0][0].x == 1100
+    assert len(packed[1:]) == 2
+
+    bounds = packed.path_bounds()
+    assert bounds[1].tolist() == [-5, -1, 7, 20]
+
+
+def test_pathcollection_fit_cutoff_vectorized():
+    pcol = PathCollection()
+
+    inside = Path()
+    inside.add(40, 40)
+    inside.add(60, 60)
+    pcol.add(inside)
+
+    frame = Path()
+    frame.add(-100, -100)
+    frame.add(100, 100)
+    pcol.add(frame)
+
+    partly = Path()
+    partly.add(0, 0)
+    partly.add(85, 10)
+    pcol.add(partly)
+
+    pcol.fit((200, 200), xy_factor=(1, 1), padding_mm=0, cutoff_mm=10)
+
+    assert len(pcol) == 2
+    assert pcol[0] is inside
+    assert pcol[1] is partly
+    assert pcol[0][0].x == 140
+    assert pcol[0][1].y == 160
+
+
+def test_pathcollection_deferred_transform():
+    pcol = _packing_collection()
+    p0 = pcol[0]
+
+    p0.translate(1, 0)
+    pcol.scale(2, 2)
+    pcol.translate(0, 10)
+
+    # bb doesn't need to apply the transforms
+    bb = pcol.bb()
+    assert bb.x == -10
+    assert bb.y == 8
+    assert bb.x2 == 220
+    assert bb.y2 == 210
+
+    # path references see transforms of the collection
+    assert p0[0].x == 2
+    assert p0[0].y == 10
+    assert p0[1].x == 22
+
+    pcol.rot(math.pi / 2.0)
+    assert round(pcol[1][0].x) == -50
+    assert round(pcol[1][0].y) == -10
+
+
+def test_pathcollection_entropies():
+    random.seed(3)
+    pc = PathCollection()
+    for n in [1, 2, 7, 30, 4]:
+        p = Path()
+        for _ in range(n):
+            p.add(random.randint(-3, 3), random.randint(-3, 3))
+        pc.add(p)
+
+    expected = [
+        (p.copy().shannon_x, p.copy().shannon_y, p.copy().shannon_direction_changes)
+        for p in pc
+    ]
+
+    metrics = pc.entropies()
+    assert metrics.shape == (5, 3)
+    for row, exp, p in zip(metrics.tolist(), expected, pc):
+        assert row == pytest.approx(exp)
+        assert p.shannon_x == row[0]
+
+    # a selection only sees its own paths
+    sub = pc.pack()[[4, 3]]
+    assert sub.shannon_x().tolist() == pytest.approx([expected[4][0], expected[3][0]])
+
+
+def test_pathcollection_metrics():
+    pc = PathCollection()
+
+    p1 = Path(layer="a", pen_select=1)
+    p1.add(0, 0, 10)
+    p1.add(3, 4, 15)
+    p1.add(3, 8, 30)
+
+    p2 = Path(layer="b", pen_select=2)
+    p2.add(10, 10, 0)
+    p2.add(12, 10, 7)
+
+    pc.add(p1)
+    pc.add(p2)
+
+    m = pc.metrics()
+    assert m["count"].tolist() == [3, 2]
+    assert m["distance"].tolist() == [9.0, 2.0]
+    assert m["minx"].tolist() == [0.0, 10.0]
+    assert m["maxy"].tolist() == [8.0, 10.0]
+    assert m["aspect_ratio"].tolist() == [p1.aspect_ratio(), p2.aspect_ratio()]
+    assert m["centroid_x"].tolist() == [2.0, 11.0]
+    assert m["duration"].tolist() == [20.0, 7.0]
+    assert m["layer"].tolist() == ["a", "b"]
+    assert m["pen_select"].tolist() == [1, 2]
+    assert m["shannon_x"].tolist() == [p1.shannon_x, p2.shannon_x]
+    assert m["shannon_direction_changes"][0] == p1.shannon_direction_changes
+
+    only = pc.metrics(["count"])
+    assert only.dtype.names == ("count",)
+
+    with pytest.raises(ValueError):
+        pc.metrics(["nope"])
+
+
+def test_pathcollection_travel_distance():
+    pc = PathCollection()
+    p1 = Path()
+    p1.add(0, 0)
+    p1.add(1, 0)
+    p2 = Path()
+    p2.add(4, 4)
+    p2.add(5, 5)
+
+    pc.add(p1)
+    pc.add(p2)
+
+    assert pc.travel_distance() == 5.0
+
+
+def test_pathcollection_optimize_travel():
+    pc = PathCollection()
+    for x in [0, 3, 1, 4, 2]:
+        p = Path()
+        p.add(x * 10, 0)
+        p.add(x * 10 + 5, 0)
+        pc.add(p)
+
+    before, after = pc.optimize_travel()
+
+    assert before == 100.0
+    assert after == 20.0
+    assert pc.travel_distance() == after
+    assert [p.start_pos().x for p in pc] == [0, 10, 20, 30, 40]
+
+
+def test_pathcollection_optimize_travel_reverses_paths():
+    pc = PathCollection()
+    p1 = Path()
+    p1.add(0, 0)
+    p1.add(10, 0)
+    p2 = Path()
+    p2.add(0, 1)
+    p2.add(10, 1)
+    p3 = Path()
+    p3.add(0, 2)
+    p3.add(10, 2)
+    pc.add(p1)
+    pc.add(p2)
+    pc.add(p3)
+
+    _, after = pc.optimize_travel()
+    assert after == 2.0
+    assert pc[1].start_pos().x == 10
+
+    pc = PathCollection()
+    for p in [p1, p2, p3]:
+        q = Path()
+        q.add(0, p.start_pos().y)
+        q.add(10, p.start_pos().y)
+        pc.add(q)
+
+    _, after = pc.optimize_travel(reverse=False)
+    assert after == pytest.approx(2 * math.hypot(10, 1))
+    assert all(p.start_pos().x == 0 for p in pc)
+
+
+def test_pathcollection_optimize_travel_keeps_layers():
+    pc = PathCollection()
+    for i in range(6):
+        p = Path(layer="a" if i % 2 == 0 else "b")
+        p.add(i, 0)
+        p.add(i, 1)
+        pc.add(p)
+
+    pc.optimize_travel()
+
+    assert [p.layer for p in pc] == ["a", "a", "a", "b", "b", "b"]
+
+
+def test_pathcollection_merge():
+    pc = PathCollection()
+    p1 = Path()
+    p1.add(0, 0)
+    p1.add(1, 0)
+    p2 = Path()
+    p2.add(1, 0)
+    p2.add(2, 0)
+    # reversed, ends where p2 ends
+    p3 = Path()
+    p3.add(3, 0)
+    p3.add(2, 0)
+    # too far away
+    p4 = Path()
+    p4.add(10, 0)
+    p4.add(11, 0)
+
+    pc.add(p1)
+    pc.add(p2)
+    pc.add(p3)
+    pc.add(p4)
+
+    assert pc.merge() == 2
+    assert len(pc) == 2
+    assert [(v.x, v.y) for v in pc[0]] == [(0, 0), (1, 0), (2, 0), (3, 0)]
+    assert pc[1] is p4
+
+
+def test_pathcollection_merge_tolerance_and_direction():
+    pc = PathCollection()
+    p1 = Path()
+    p1.add(0, 0)
+    p1.add(1, 0)
+    p2 = Path()
+    p2.add(1.05, 0)
+    p2.add(2, 0)
+    p3 = Path()
+    p3.add(3, 0)
+    p3.add(2, 0)
+
+    pc.add(p1)
+    pc.add(p2)
+    pc.add(p3)
+
+    assert pc.merge(reverse=False) == 0
+    assert pc.merge(tolerance=0.1, reverse=False) == 1
+    assert [(v.x, v.y) for v in pc[0]] == [(0, 0), (1, 0), (1.05, 0), (2, 0)]
+    assert pc[1] is p3
+
+
+def test_pathcollection_merge_keeps_layers():
+    pc = PathCollection()
+    p1 = Path(layer="a")
+    p1.add(0, 0)
+    p1.add(1, 0)
+    p2 = Path(layer="b")
+    p2.add(1, 0)
+    p2.add(2, 0)
+    p3 = Path(layer="a")
+    p3.add(1, 0)
+    p3.add(1, 1)
+
+    pc.add(p1)
+    pc.add(p2)
+    pc.add(p3)
+
+    assert pc.merge() == 1
+    assert [p.layer for p in pc] == ["a", "b"]
+    assert len(pc[0]) == 3
+    assert pc[1] is p2
+
+
+def test_pathcollection_simplify_matches_path():
+    random.seed(3)
+    pc = PathCollection()
+    paths = []
+    for i in range(20):
+        p = Path()
+        for j in range(random.randint(1, 60)):
+            p.add(j, math.sin(j / 3) * 10 + random.random())
+        pc.add(p)
+        paths.append(p.copy())
+
+    pc.simplify(1.5)
+    for p, expected in zip(pc, paths):
+        expected.simplify(1.5)
+        assert p.coords.tolist() == expected.coords.tolist()
+
+    pc.simplify(1.5, method="visvalingam")
+    assert all(len(p) >= min(len(e), 2) for p, e in zip(pc, paths))
+
+
+def test_pathcollection_resample_matches_path():
+    random.seed(5)
+    pc = PathCollection()
+    paths = []
+    for i in range(10):
+        p = Path()
+        for j in range(random.randint(1, 30)):
+            p.add(random.random() * 100, random.random() * 100, j)
+        pc.add(p)
+        paths.append(p.copy())
+
+    pc.resample(spacing=7.5)
+    for p, expected in zip(pc, paths):
+        expected.resample(spacing=7.5)
+        assert np.allclose(p.coords, expected.coords)
+
+    pc.resample(count=12)
+    assert all(len(p) == 12 for p in pc)
@@ -1,3 +1,11 @@
+import io
+import math
+import json
+from xml.etree import ElementTree
+
+import numpy as np
+from PIL import Image
+
 from cursor.loader import Loader
 from cursor.device import Paper
 from cursor.device import PaperSize
@@ -72,9 +80,24 @@ def test_svgrenderer():
     r.save("test1")
 
 
+def test_svgrenderer_keeps_paths():
+    pc = PathCollection()
+    p1 = Path()
+    p1.add(0, 0)
+    p1.add(10, 0)
+    pc.add(p1)
+
+    r = SvgRenderer(DataDirHandler().test_svgs())
+    r.render(pc)
+    r.save("test_keeps_paths")
+
+    assert p1._packed is None
+    assert p1.coords[:, :2].tolist() == [[0.0, 0.0], [10.0, 0.0]]
+
+
 def test_gcoderenderer():
     path = DataDirHandler().test_recordings()
-    loader = Loader(directory=path)
+    loader = Loader(directory=path, cache=False)
 
     rec = loader.all_paths()
 
@@ -85,7 +108,7 @@ def test_gcoderenderer():
 
 def test_jpegrenderer():
     path = DataDirHandler().test_recordings()
-    loader = Loader(directory=path)
+    loader = Loader(directory=path, cache=False)
 
     rec = loader.all_paths()
 
@@ -100,6 +123,20 @@ def test_jpegrenderer():
     r.save("test1")
 
 
+def test_jpegrenderer_keeps_paths():
+    pc = PathCollection()
+    p1 = Path()
+    p1.add(0, 0)
+    p1.add(10, 0)
+    pc.add(p1)
+
+    r = JpegRenderer(DataDirHandler().test_images())
+    r.render(pc)
+
+    assert p1._packed is None
+    assert p1.coords[:, :2].tolist() == [[0.0, 0.0], [10.0, 0.0]]
+
+
 def test_hpglrenderer():
     pc = PathCollection()
     p1 = Path()
@@ -115,7 +152,7 @@ def test_hpglrenderer():
 
     r = HPGLRenderer(DataDirHandler().test_hpgls())
     r.render(pc)
-    hpgl_data = r.save("test1")
+    hpgl_data = r.save("test1").read_text()
 
     expected_result = (
         "SP1;\n"
@@ -147,7 +184,7 @@ def test_hpglrenderer():
 
 def test_jpegrenderer_fail():
     path = DataDirHandler().test_recordings()
-    loader = Loader(directory=path)
+    loader = Loader(directory=path, cache=False)
 
     jpeg_r = JpegRenderer(DataDirHandler().test_images())
     gcode_r = GCodeRenderer(DataDirHandler().test_gcodes())
@@ -276,7 +313,7 @@ def test_reorder_custom():
 
 def test_ascii_renderer():
     path = DataDirHandler().test_recordings()
-    loader = Loader(directory=path)
+    loader = Loader(directory=path, cache=False)
 
     rec = loader.all_paths()
 
@@ -294,7 +331,7 @@ def test_ascii_renderer():
 
 def disabled_test_pdf_renderer():
     path = DataDirHandler().test_recordings()
-    loader = Loader(directory=path)
+    loader = Loader(directory=path, cache=False)
 
     rec = loader.all_paths()
 
@@ -332,3 +369,255 @@ def disabled_test_pdf_renderer():
 
     out = DataDirHandler().test_data_dir / "simple_demo.pdf"
     pdf.output(out)
+
+
+def test_hpglrenderer_compact():
+    pc = PathCollection()
+    p1 = Path()
+    p1.add(-10, -10)
+    p1.add(10, -10)
+    p1.add(10.7, 5.2)
+
+    p2 = Path(pen_velocity=40)
+    p2.add(10, 10)
+
+    p3 = Path(pen_velocity=40)
+    p3.add(0, 0)
+    p3.add(5, 5)
+
+    pc.add(p1)
+    pc.add(p2)
+    pc.add(p3)
+
+    r = HPGLRenderer(DataDirHandler().test_hpgls(), compact=True)
+    r.render(pc)
+    hpgl_data = r.save("test_compact").read_text()
+
+    expected_result = (
+        "SP1;\n"
+        "PA0,0\n"
+        "SP1;\n"
+        "LT;\n"
+        "VS110;\n"
+        "FS16;\n"
+        "PU-10,-10;\n"
+        "PD10,-10,10,5;\n"
+        "VS40;\n"
+        "PU10,10;\n"
+        "PD;\n"
+        "PU0,0;\n"
+        "PD5,5;\n"
+        "PU0,0;\n"
+        "SP0;\n"
+    )
+    assert hpgl_data == expected_result
+
+
+def test_hpglrenderer_write_stream():
+    pc = PathCollection()
+    p = Path()
+    for i in range(HPGLRenderer.MAX_PD_POINTS + 2):
+        p.add(i, i)
+    pc.add(p)
+
+    r = HPGLRenderer(DataDirHandler().test_hpgls(), compact=True)
+    r.render(pc)
+    out = io.StringIO()
+    r.write(out)
+
+    pd_commands = [cmd for cmd in out.getvalue().split("\n") if cmd.startswith("PD")]
+    assert len(pd_commands) == 2
+    assert (
+        pd_commands[1]
+        == f"PD{HPGLRenderer.MAX_PD_POINTS + 1},{HPGLRenderer.MAX_PD_POINTS + 1};"
+    )
+
+
+def test_jpegrenderer_tiled_matches_render():
+    pc = PathCollection()
+    p1 = Path()
+    p1.add(-20, -10)
+    p1.add(150, 90)
+    p1.add(30, 170)
+    p2 = Path()
+    p2.add(100, 10)
+    p2.add(110, 160)
+    pc.add(p1)
+    pc.add(p2)
+
+    r = JpegRenderer(DataDirHandler().test_images())
+    r.render(pc, scale=1.5, thickness=1)
+    expected = np.asarray(r.img)
+
+    for workers in [1, 2]:
+        directory = r.render_tiled(
+            pc, "test_tiled", scale=1.5, thickness=1, tile_size=64, workers=workers
+        )
+        with open(directory / "tiles.json") as file:
+            info = json.load(file)
+        assert (info["width"], info["height"]) == r.img.size
+        assert info["levels"][0] == [5, 4]
+        assert info["levels"][-1] == [1, 1]
+
+        stitched = np.zeros_like(expected)
+        for row in range(5):
+            for col in range(4):
+                tile = np.asarray(Image.open(directory / "0" / f"{row}_{col}.png"))
+                y, x = row * 64, col * 64
+                y2, x2 = y + tile.shape[0], x + tile.shape[1]
+                stitched[y:y2, x:x2] = tile
+        assert np.array_equal(stitched, expected)
+
+        top = Image.open(directory / str(len(info["levels"]) - 1) / "0_0.png")
+        assert max(top.size) <= 64
+
+
+def test_svgrenderer_polylines_by_layer():
+    pc = PathCollection()
+    p1 = Path(layer="a")
+    p1.add(0, 0)
+    p1.add(1, 0.5)
+    p1.add(2, 0)
+    p2 = Path(layer="b", pen_select=2)
+    p2.add(0, 1)
+    p2.add(1, 1)
+    p3 = Path(layer="a")
+    p3.add(5, 5)
+    p3.add(6, 6)
+
+    pc.add(p1)
+    pc.add(p2)
+    pc.add(p3)
+
+    r = SvgRenderer(DataDirHandler().test_svgs())
+    r.render(pc)
+    out = io.StringIO()
+    r.write(out)
+
+    root = ElementTree.fromstring(out.getvalue())
+    ns = {"svg": "http://www.w3.org/2000/svg"}
+    groups = root.findall("svg:g", ns)
+    label = "{http://www.inkscape.org/namespaces/inkscape}label"
+    assert [g.get(label) for g in groups] == ["a", "b pen2"]
+
+    polylines = [
+        [p.get("points") for p in g.findall("svg:polyline", ns)] for g in groups
+    ]
+    assert polylines == [["0,0 1,0.5 2,0", "5,5 6,6"], ["0,1 1,1"]]
+    assert all(g.get("fill") == "none" for g in groups)
+
+
+def test_gcoderenderer_modal_elision():
+    pc = PathCollection()
+    p0 = Path()
+    p0.add(0, 0)
+    p0.add(10, 0)
+    p0.add(10, 0)
+    p0.add(10, 5)
+    p1 = Path()
+    p1.add(10, 5)
+    p1.add(20, 5)
+    p2 = Path()
+    p2.add(30, 30)
+    p2.add(30, 40)
+    pc.add(p0)
+    pc.add(p1)
+    pc.add(p2)
+
+    r = GCodeRenderer(
+        DataDirHandler().test_gcodes(), feedrate_xy=600, feedrate_z=60, z_down=1.0
+    )
+    r.render(pc)
+    out = io.StringIO()
+    lines, seconds = r.write(out)
+    program = out.getvalue().splitlines()
+
+    assert program == [
+        "G01 Z0.0 F60",
+        "G01 X0.00 Y0.00 F600",
+        "G01 Z1.0 F60",
+        "G01 X10.00 F600",
+        "G01 Y-5.00",
+        "G01 X20.00",
+        "G01 Z0.0 F60",
+        "G01 X30.00 Y-30.00 F600",
+        "G01 Z1.0 F60",
+        "G01 Y-40.00 F600",
+        "G01 Z0.0 F60",
+        "G01 X0.00 Y0.00 F600",
+    ]
+    assert lines == len(program)
+    # 4 z moves of 1 unit at 60/min, then 35 units drawn and two travels at 600/min
+    travel = np.hypot(10, 25) + np.hypot(30, 40)
+    assert seconds == pytest.approx(4.0 + (35 + travel) / 600 * 60)
+
+    r = GCodeRenderer(DataDirHandler().test_gcodes(), travel_g0=True)
+    r.render(pc)
+    out = io.StringIO()
+    r.write(out)
+    assert "G00 X30.00 Y-30.00\n" in out.getvalue()
+
+
+def _arc_paths(scale: float) -> PathCollection:
+    pc = PathCollection()
+    ring = Path()
+    for i in range(65):
+        t = 2 * math.pi * i / 64
+        ring.add((100 + 40 * math.cos(t)) * scale, (100 + 40 * math.sin(t)) * scale)
+    quarter = Path()
+    for i in range(17):
+        t = math.pi / 2 * i / 16
+        quarter.add(20 * math.sin(t) * scale, (20 - 20 * math.cos(t)) * scale)
+    quarter.add(20 * scale, 40 * scale)
+    pc.add(ring)
+    pc.add(quarter)
+
+    return pc
+
+
+def test_gcoderenderer_arcs():
+    r = GCodeRenderer(DataDirHandler().test_gcodes(), arc_tolerance=0.05)
+    r.render(_arc_paths(1.0))
+    out = io.StringIO()
+    lines, _ = r.write(out)
+
+    assert out.getvalue().splitlines() == [
+        "G01 Z0.0 F1000",
+        "G01 X0.00 Y0.00 F2000",
+        "G01 X140.00 Y-100.00",
+        "G01 Z3.5 F1000",
+        "G02 X60.00 I-40.0000 J0.0000 F2000",
+        "G02 X140.00 I40.0000 J0.0000",
+        "G01 Z0.0 F1000",
+        "G01 X0.00 Y0.00 F2000",
+        "G01 Z3.5 F1000",
+        "G02 X20.00 Y-20.00 I-0.0073 J-20.0073 F2000",
+        "G01 Y-40.00",
+        "G01 Z0.0 F1000",
+        "G01 X0.00 Y0.00 F2000",
+    ]
+    assert lines == 13
+
+
+def test_hpglrenderer_arcs():
+    r = HPGLRenderer(DataDirHandler().test_hpgls(), compact=True, arc_tolerance=2.0)
+    r.render(_arc_paths(10.0))
+    out = io.StringIO()
+    r.write(out)
+
+    assert out.getvalue() == (
+        "SP1;\n"
+        "PA0,0\n"
+        "SP1;\n"
+        "LT;\n"
+        "VS110;\n"
+        "FS16;\n"
+        "PU1000,1000;\n"
+        "CI400,11.5;\n"
+        "PU0,0;\n"
+        "PD;\n"
+        "AA0,200,90.156,16.2;\n"
+        "PD200,400;\n"
+        "PU0,0;\n"
+        "SP0;\n"
+    )
@@ -0,0 +1,120 @@
+from cursor.path import Path
+from cursor.path import PathCollection
+from cursor.path import BoundingBox
+from cursor.path import SegmentIndex
+
+import math
+import random
+import time
+
+import pytest
+
+
+def _line(x1, y1, x2, y2):
+    p = Path()
+    p.add(x1, y1)
+    p.add(x2, y2)
+    return p
+
+
+def test_segmentindex_intersects():
+    pc = PathCollection()
+    pc.add(_line(0, 0, 10, 10))
+    pc.add(_line(20, 0, 30, 0))
+
+    index = pc.segment_index(cell_size=2.0)
+    assert len(index) == 2
+
+    crossing = _line(0, 10, 10, 0)
+    assert index.intersects(crossing)
+    assert index.intersections(crossing) == [pc[0]]
+    assert not index.intersects(_line(0, 1, 0, 9))
+
+    index.add(crossing)
+    assert index.intersects(_line(2, 7, 2, 9.5))
+
+
+def test_segmentindex_matches_path_intersect():
+    random.seed(7)
+    paths = []
+    for _ in range(40):
+        p = Path()
+        for _ in range(5):
+            p.add(random.random() * 100, random.random() * 100)
+        paths.append(p)
+
+    index = SegmentIndex()
+    accepted = []
+    for p in paths:
+        expected = any(a.intersect(p)[0] for a in accepted)
+        assert index.intersects(p) == expected
+        if not expected:
+            accepted.append(p)
+            index.add(p)
+
+
+def test_segmentindex_query_bbox():
+    a = _line(0, 0, 10, 0)
+    b = _line(0, 5, 0, 5.5)
+    c = _line(-5, 20, 20, 20)
+    index = SegmentIndex.from_paths([a, b, c], cell_size=1.0)
+
+    assert index.query_bbox(BoundingBox(-1, -1, 1, 1)) == [a]
+    assert index.query_bbox(BoundingBox(-1, 4, 1, 10)) == [b]
+    # crosses the box without a vertex inside
+    assert index.query_bbox(BoundingBox(5, 15, 8, 25)) == [c]
+    assert index.query_bbox(BoundingBox(30, 30, 40, 40)) == []
+
+
+def test_segmentindex_nearest():
+    a = _line(0, 0, 10, 0)
+    b = _line(0, 50, 10, 50)
+    index = SegmentIndex.from_paths([a, b], cell_size=1.0)
+
+    p, d = index.nearest((5, 3))
+    assert p is a
+    assert d == 3.0
+
+    p, d = index.nearest((100, 50))
+    assert p is b
+    assert d == 90.0
+
+    assert SegmentIndex().nearest((0, 0)) is None
+
+
+def test_segmentindex_nearest_far_away():
+    index = SegmentIndex(cell_size=1.0)
+    index.add(_line(0, 0, 1, 0))
+
+    # only the new ring of cells is searched each step, 300 rings are cheap
+    start = time.time()
+    path, distance = index.nearest((300.5, 0.5))
+    assert time.time() - start < 1.0
+    assert distance == pytest.approx(math.hypot(299.5, 0.5))
+
+    index.add(_line(0, 5, 0, 6))
+    path, distance = index.nearest((-3, 5.5))
+    assert distance == pytest.approx(3.0)
+    assert path is index.nearest((0, 5.2))[0]
+
+
+def test_segmentindex_regrid():
+    seed = Path()
+    seed.add(10, 10)
+    index = SegmentIndex()
+    index.add(seed)
+    assert index.cell_size == 1.0
+
+    # one long diagonal would otherwise cover millions of cells of size 1
+    diagonal = _line(0, 0, 3000, 3000)
+    index.add(diagonal)
+    assert index.cell_size > 1000.0
+    assert index.intersections(_line(0, 3000, 3000, 0)) == [diagonal]
+    assert index.nearest((10, 11))[1] == pytest.approx(math.sqrt(0.5))
+
+    # an explicit cell size is kept
+    index = SegmentIndex(cell_size=1.0)
+    index.add(seed)
+    index.add(_line(0, 0, 30, 30))
+    assert index.cell_size == 1.0
+    assert index.intersects(_line(0, 30, 30, 0))
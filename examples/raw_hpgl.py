@@ -18,4 +18,4 @@ if __name__ == "__main__":
     hpgl_folder = data.DataDirHandler().hpgl("example_raw_hpgl")
     hpgl_renderer = renderer.HPGLRenderer(hpgl_folder)
     hpgl_renderer.render(pc)
-    hpgl_str = hpgl_renderer.save("example_raw_hpgl")
+    hpgl_file = hpgl_renderer.save("example_raw_hpgl")
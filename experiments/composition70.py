@@ -39,11 +39,11 @@ if __name__ == "__main__":
             if bbs[_bb].inside(p):
                 offset = offsets[_bb]
                 p.rot(offset, bbs[_bb].center())
-                paths[_bb].vertices.append(p)
+                paths[_bb].add(p.x, p.y, p.timestamp)
                 break
 
-        raender.vertices.append(p)
-        raender.vertices.append(p)
+        raender.add(p.x, p.y, p.timestamp)
+        raender.add(p.x, p.y, p.timestamp)
 
     pc_final = path.PathCollection()
     # pc_final.add(raender)
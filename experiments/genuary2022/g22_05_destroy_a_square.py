@@ -72,7 +72,9 @@ def new_constellation():
     idx = 0
     for pa in pc_temp:
         pa_copy = pa.copy()
-        pa_copy.vertices[1] = pc_temp[indices[idx]].vertices[1]
+        vertices = pa_copy.vertices
+        vertices[1] = pc_temp[indices[idx]][1]
+        pa_copy.vertices = vertices
         pc.add(pa_copy)
 
         idx += 1
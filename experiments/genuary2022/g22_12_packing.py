@@ -10,14 +10,6 @@ import time
 from alive_progress import alive_bar
 
 
-def intersects_any(pc, pa):
-
-    for p in pc:
-        if p.intersect(pa)[0]:
-            return True
-    return False
-
-
 if __name__ == "__main__":
     recordings = data.DataDirHandler().recordings()
     _loader = loader.Loader(directory=recordings, limit_files=2)
@@ -27,6 +19,7 @@ if __name__ == "__main__":
     first = pc.random()
 
     pc_final.add(first)
+    index = pc_final.segment_index()
 
     size = len(pc)
     c = 0
@@ -37,10 +30,11 @@ if __name__ == "__main__":
             print(f"{c}/{size} - {len(pc_final)}")
             # bar()
             pa.translate(random.random(), random.random())
-            if not intersects_any(pc_final, pa):
+            if not index.intersects(pa):
                 pa.pen_select = 1
                 pa.velocity = 10
                 pc_final.add(pa)
+                index.add(pa)
             c += 1
 
     sorter = filter.Sorter(reverse=True, param=filter.Sorter.DISTANCE)
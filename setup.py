@@ -29,6 +29,7 @@ setup(
     entry_points={
         "console_scripts": [
             "cursor_recorder = cursor.recorder:main",
+            "cursor_convert = cursor.loader:main",
             "composition57 = experiments.composition57:main",
         ]
     },